@@ -0,0 +1,128 @@
+import logging
+import re
+from typing import Sequence
+
+from app.ai.llm import LLMClient, LLMMessage
+from app.ai.rag import RetrievedChunk
+from app.core.config import settings
+from app.models.chat import ChatMessages, ChatRole
+from app.utils.text_processing import count_tokens
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = (
+    "Update the running summary of a conversation between a user and an assistant. "
+    "Keep facts, decisions, names and open questions; drop pleasantries. "
+    "Reply with the updated summary only."
+)
+
+_FIRST_SENTENCE_RE = re.compile(r"(.+?[.!?])(\s|$)", re.DOTALL)
+
+
+def _format_chunk(index: int, chunk: RetrievedChunk) -> str:
+    page = f" (page {chunk.page_number})" if chunk.page_number else ""
+    return f"[{index}] {chunk.document_title}{page}:\n{chunk.content}"
+
+
+def build_prompt(
+    *,
+    system_prompt: str,
+    question: str,
+    summary: str | None,
+    history: Sequence[ChatMessages],
+    chunks: Sequence[RetrievedChunk],
+    budget: int,
+) -> list[LLMMessage]:
+    """
+    Pack a prompt into ``budget`` tokens. The system prompt, the question and
+    the rolling summary always go in; the budget is then spent on the last
+    exchange, retrieved chunks in rank order, and older turns newest first.
+    Turns are kept contiguous: once one does not fit, older ones are dropped.
+    """
+    remaining = budget - count_tokens(system_prompt) - count_tokens(question)
+    summary_message = None
+    if summary:
+        summary_message = LLMMessage(ChatRole.system.value, f"Summary of the earlier conversation:\n{summary}")
+        remaining -= count_tokens(summary_message.content)
+
+    costs = [count_tokens(message.content) for message in history]
+    kept_from = len(history)
+
+    def take_turns(limit: int | None) -> None:
+        nonlocal kept_from, remaining
+        while kept_from > 0 and (limit is None or len(history) - kept_from < limit):
+            if costs[kept_from - 1] > remaining:
+                return
+            kept_from -= 1
+            remaining -= costs[kept_from]
+
+    take_turns(2)
+    context = []
+    for chunk in chunks:
+        text = _format_chunk(len(context) + 1, chunk)
+        cost = count_tokens(text)
+        if cost > remaining:
+            break
+        context.append(text)
+        remaining -= cost
+    take_turns(None)
+
+    messages = [LLMMessage(ChatRole.system.value, system_prompt)]
+    if context:
+        messages.append(LLMMessage(
+            ChatRole.system.value, "Context from the user's documents:\n\n" + "\n\n".join(context)
+        ))
+    if summary_message:
+        messages.append(summary_message)
+    messages.extend(LLMMessage(message.role.value, message.content) for message in history[kept_from:])
+    messages.append(LLMMessage(ChatRole.user.value, question))
+    return messages
+
+
+def _trim_to_tokens(text: str, max_tokens: int) -> str:
+    # Keeps the end: the most recent turns matter most
+    words = text.split()
+    while words and count_tokens(" ".join(words)) > max_tokens:
+        words = words[max(1, len(words) // 10):]
+    return " ".join(words)
+
+
+def extractive_summary(previous: str | None, messages: Sequence[ChatMessages], max_tokens: int) -> str:
+    """
+    Fallback summary without an LLM: the first sentence of each turn
+    """
+    lines = [previous] if previous else []
+    for message in messages:
+        match = _FIRST_SENTENCE_RE.match(message.content.strip())
+        lines.append(f"{message.role.value}: {match.group(1) if match else message.content.strip()}")
+    return _trim_to_tokens("\n".join(lines), max_tokens)
+
+
+async def fold_into_summary(
+    previous: str | None,
+    messages: Sequence[ChatMessages],
+    *,
+    client: LLMClient,
+    model: str,
+    max_tokens: int | None = None,
+) -> str:
+    """
+    Return ``previous`` extended with ``messages``. Only the new messages are
+    sent, so the cost does not grow with the length of the session.
+    """
+    max_tokens = max_tokens or settings.CHAT_SUMMARY_MAX_TOKENS
+    transcript = "\n".join(f"{message.role.value}: {message.content}" for message in messages)
+    prompt = [
+        LLMMessage(ChatRole.system.value, SUMMARY_PROMPT),
+        LLMMessage(ChatRole.user.value, f"Current summary:\n{previous or '(none)'}\n\nNew messages:\n{transcript}"),
+    ]
+    try:
+        parts = [
+            delta.text
+            async for delta in client.stream(prompt, model=model, temperature=0.0, max_tokens=max_tokens)
+        ]
+    except Exception as exc:
+        logger.warning("Summarising chat history failed, using an extractive summary: %s", exc)
+        return extractive_summary(previous, messages, max_tokens)
+    summary = "".join(parts).strip()
+    return _trim_to_tokens(summary, max_tokens) if summary else extractive_summary(previous, messages, max_tokens)
@@ -0,0 +1,333 @@
+import hashlib
+import re
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.utils.text_processing import hash_content
+
+
+class Embedder(ABC):
+    """
+    Base class for embedding backends. Subclasses turn a batch of texts into
+    a float32 matrix of shape (len(texts), dim).
+    """
+
+    model_name: str
+    dim: int
+
+    @abstractmethod
+    def embed(self, texts: Sequence[str]) -> np.ndarray: ...
+
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class HashingEmbedder(Embedder):
+    """
+    Deterministic, dependency-free embedder using the hashing trick over
+    word unigrams and bigrams. Good enough for offline tests and local
+    development; similar texts land near each other.
+    """
+
+    def __init__(self, model_name: str = "hashing", dim: int | None = None):
+        self.model_name = model_name
+        self.dim = dim or settings.HASHING_EMBEDDING_DIM
+
+    def _bucket(self, token: str) -> tuple[int, float]:
+        digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+        return digest % self.dim, 1.0 if (digest >> 63) else -1.0
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = _TOKEN_RE.findall(text.lower())
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                index, sign = self._bucket(feature)
+                vectors[row, index] += sign
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+class OpenAIEmbedder(Embedder):
+    """
+    Embedder for the OpenAI ``text-embedding-*`` models. The ``openai``
+    package is only imported when this embedder is first used.
+    """
+
+    _dims = {"text-embedding-ada-002": 1536, "text-embedding-3-small": 1536, "text-embedding-3-large": 3072}
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.dim = self._dims.get(model_name, 1536)
+        self._client = None
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        if self._client is None:
+            from openai import OpenAI
+
+            self._client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        response = self._client.embeddings.create(model=self.model_name, input=list(texts))
+        return np.asarray([item.embedding for item in response.data], dtype=np.float32)
+
+
+EmbedderFactory = Callable[[str], Embedder]
+
+_embedder_factories: dict[str, EmbedderFactory] = {
+    "hashing": HashingEmbedder,
+    "text-embedding-": OpenAIEmbedder,
+}
+
+
+def register_embedder(prefix: str, factory: EmbedderFactory) -> None:
+    """
+    Register a factory for every model name starting with ``prefix``.
+    The longest matching prefix wins.
+    """
+    _embedder_factories[prefix] = factory
+
+
+def create_embedder(model_name: str) -> Embedder:
+    matches = [prefix for prefix in _embedder_factories if model_name.startswith(prefix)]
+    if not matches:
+        raise ValueError(f"No embedder registered for model '{model_name}'")
+    return _embedder_factories[max(matches, key=len)](model_name)
+
+
+class EmbeddingCache:
+    """
+    Persistent (model, content_hash) -> vector cache.
+
+    A bounded in-memory LRU sits in front of a SQLite file. The file is
+    trimmed back to ``max_entries`` by evicting the least recently used rows;
+    recency updates for disk hits are written in bulk with the next store.
+    Eviction removes an extra ``max_entries // 20`` rows, so the file is
+    only counted again after that many new entries, not on every store.
+    """
+
+    def __init__(
+        self,
+        path: Path | None = None,
+        max_entries: int | None = None,
+        memory_entries: int | None = None,
+    ):
+        self.path = Path(path or settings.EMBEDDING_CACHE_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries or settings.EMBEDDING_CACHE_MAX_ENTRIES
+        self.memory_entries = memory_entries or settings.EMBEDDING_CACHE_MEMORY_ENTRIES
+        self._memory: OrderedDict[tuple[str, str], np.ndarray] = OrderedDict()
+        self._touched: dict[tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, content_hash TEXT NOT NULL, vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL, PRIMARY KEY (model, content_hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        # Upper bound on the rows in the file: replaced rows are counted as new
+        (self._rows,) = self._conn.execute("SELECT count(*) FROM embeddings").fetchone()
+
+    def _remember(self, key: tuple[str, str], vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, model: str, content_hashes: Sequence[str]) -> dict[str, np.ndarray]:
+        found: dict[str, np.ndarray] = {}
+        now = time.time()
+        with self._lock:
+            missing = []
+            for content_hash in content_hashes:
+                key = (model, content_hash)
+                vector = self._memory.get(key)
+                if vector is None:
+                    missing.append(content_hash)
+                else:
+                    self._memory.move_to_end(key)
+                    self._touched[key] = now
+                    found[content_hash] = vector
+            # SQLite caps bound parameters, so look misses up in slices
+            for start in range(0, len(missing), 500):
+                part = missing[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT content_hash, vector FROM embeddings WHERE model = ? "
+                    f"AND content_hash IN ({','.join('?' * len(part))})",
+                    (model, *part),
+                ).fetchall()
+                for content_hash, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    key = (model, content_hash)
+                    self._remember(key, vector)
+                    self._touched[key] = now
+                    found[content_hash] = vector
+            if len(self._touched) >= self.memory_entries:
+                self._flush_touched()
+                self._conn.commit()
+        return found
+
+    def _flush_touched(self) -> None:
+        self._conn.executemany(
+            "UPDATE embeddings SET last_used = ? WHERE model = ? AND content_hash = ?",
+            [(used, key[0], key[1]) for key, used in self._touched.items()],
+        )
+        self._touched.clear()
+
+    def put_many(self, model: str, items: dict[str, np.ndarray]) -> None:
+        now = time.time()
+        with self._lock:
+            for content_hash, vector in items.items():
+                self._remember((model, content_hash), np.asarray(vector, dtype=np.float32))
+            self._flush_touched()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, content_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                [
+                    (model, content_hash, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                    for content_hash, vector in items.items()
+                ],
+            )
+            self._rows += len(items)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        if self._rows <= self.max_entries:
+            return
+        (self._rows,) = self._conn.execute("SELECT count(*) FROM embeddings").fetchone()
+        overflow = self._rows - self.max_entries
+        if overflow > 0:
+            overflow += self.max_entries // 20
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN "
+                "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                (overflow,),
+            )
+            self._rows = max(self._rows - overflow, 0)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+@dataclass
+class EmbeddingStats:
+    hits: int = 0
+    misses: int = 0
+    batches: int = 0
+    texts_embedded: int = 0
+    embed_seconds: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @property
+    def texts_per_second(self) -> float:
+        return self.texts_embedded / self.embed_seconds if self.embed_seconds else 0.0
+
+
+class BatchEmbedder:
+    """
+    Embeds texts in fixed-size batches, skipping any text whose
+    (content_hash, model) pair is already in the cache.
+    """
+
+    def __init__(self, embedder: Embedder, cache: EmbeddingCache, batch_size: int | None = None):
+        self.embedder = embedder
+        self.cache = cache
+        self.batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+        self.stats = EmbeddingStats()
+        self._stats_lock = threading.Lock()
+
+    @property
+    def model_name(self) -> str:
+        return self.embedder.model_name
+
+    def embed(self, texts: Sequence[str], content_hashes: Sequence[str] | None = None) -> np.ndarray:
+        if content_hashes is None:
+            content_hashes = [hash_content(text) for text in texts]
+        if not texts:
+            return np.empty((0, self.embedder.dim), dtype=np.float32)
+
+        cached = self.cache.get_many(self.model_name, list(dict.fromkeys(content_hashes)))
+        # Identical chunks within one call are embedded once
+        pending: dict[str, str] = {}
+        for text, content_hash in zip(texts, content_hashes):
+            if content_hash not in cached:
+                pending.setdefault(content_hash, text)
+
+        computed: dict[str, np.ndarray] = {}
+        pending_items = list(pending.items())
+        batches = 0
+        started = time.perf_counter()
+        for start in range(0, len(pending_items), self.batch_size):
+            batch = pending_items[start:start + self.batch_size]
+            vectors = self.embedder.embed([text for _, text in batch])
+            computed.update({content_hash: vector for (content_hash, _), vector in zip(batch, vectors)})
+            batches += 1
+        elapsed = time.perf_counter() - started
+        if computed:
+            self.cache.put_many(self.model_name, computed)
+
+        misses = sum(1 for content_hash in content_hashes if content_hash not in cached)
+        with self._stats_lock:
+            self.stats.hits += len(texts) - misses
+            self.stats.misses += misses
+            self.stats.batches += batches
+            self.stats.texts_embedded += len(computed)
+            self.stats.embed_seconds += elapsed
+
+        return np.stack([
+            cached[content_hash] if content_hash in cached else computed[content_hash]
+            for content_hash in content_hashes
+        ]).astype(np.float32, copy=False)
+
+
+_embedding_cache: EmbeddingCache | None = None
+_batch_embedders: dict[str, BatchEmbedder] = {}
+_embedders_lock = threading.Lock()
+
+
+def get_batch_embedder(model_name: str) -> BatchEmbedder:
+    """
+    Shared embedder for ``UserSettings.embedding_model``; all models share one cache.
+    """
+    global _embedding_cache
+    embedder = _batch_embedders.get(model_name)
+    if embedder is None:
+        with _embedders_lock:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache()
+            embedder = _batch_embedders.get(model_name)
+            if embedder is None:
+                embedder = BatchEmbedder(create_embedder(model_name), _embedding_cache)
+                _batch_embedders[model_name] = embedder
+    return embedder
+
+
+def embedding_stats() -> dict[str, dict[str, float]]:
+    return {
+        model_name: {
+            "hits": embedder.stats.hits,
+            "misses": embedder.stats.misses,
+            "hit_rate": embedder.stats.hit_rate,
+            "batches": embedder.stats.batches,
+            "texts_embedded": embedder.stats.texts_embedded,
+            "texts_per_second": embedder.stats.texts_per_second,
+        }
+        for model_name, embedder in _batch_embedders.items()
+    }
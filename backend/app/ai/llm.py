@@ -0,0 +1,218 @@
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Sequence
+
+from app.core.config import settings
+from app.models.user import LlmProvider
+from app.utils.text_processing import count_tokens
+
+
+class LLMError(Exception):
+    """
+    Raised when a provider is misconfigured or fails mid-request
+    """
+
+
+@dataclass
+class LLMMessage:
+    role: str
+    content: str
+
+
+@dataclass
+class LLMDelta:
+    text: str = ""
+    # Set on the last delta when the provider reports usage
+    completion_tokens: int | None = None
+
+
+class LLMClient(ABC):
+    """
+    Base class for chat-completion backends. ``stream`` yields the answer
+    as it is generated so callers can forward tokens immediately.
+    """
+
+    provider: str
+
+    @abstractmethod
+    def stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+    ) -> AsyncIterator[LLMDelta]: ...
+
+
+class FakeLLMClient(LLMClient):
+    """
+    Deterministic local provider for tests and offline development. Replies
+    with a fixed template around the last user message, one word per delta.
+    """
+
+    provider = "fake"
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+
+    async def stream(self, messages, *, model, temperature, max_tokens):
+        question = next((m.content for m in reversed(messages) if m.role == "user"), "")
+        context = sum(1 for m in messages if m.role == "system")
+        reply = f"[{model}] Answer to: {question} (with {context} context messages)"
+        words = reply.split()[:max_tokens]
+        for index, word in enumerate(words):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield LLMDelta(text=word if index == 0 else f" {word}")
+        yield LLMDelta(completion_tokens=count_tokens(" ".join(words)))
+
+
+class OllamaClient(LLMClient):
+    """
+    Streams from a local Ollama server's /api/chat endpoint (NDJSON).
+    ``httpx`` is only imported when this client is first used.
+    """
+
+    provider = LlmProvider.ollama.value
+
+    def __init__(self, base_url: str | None = None):
+        self.base_url = base_url or settings.OLLAMA_BASE_URL
+        self._client = None
+
+    async def stream(self, messages, *, model, temperature, max_tokens):
+        if self._client is None:
+            import httpx
+
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=settings.LLM_REQUEST_TIMEOUT)
+        body = {
+            "model": model,
+            "messages": [{"role": m.role, "content": m.content} for m in messages],
+            "stream": True,
+            "options": {"temperature": temperature, "num_predict": max_tokens},
+        }
+        async with self._client.stream("POST", "/api/chat", json=body) as response:
+            if response.status_code >= 400:
+                await response.aread()
+                raise LLMError(f"Ollama returned {response.status_code}: {response.text}")
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if "error" in event:
+                    raise LLMError(event["error"])
+                text = event.get("message", {}).get("content", "")
+                if event.get("done"):
+                    yield LLMDelta(text=text, completion_tokens=event.get("eval_count"))
+                elif text:
+                    yield LLMDelta(text=text)
+
+
+class OpenAICompatibleClient(LLMClient):
+    """
+    Chat completions over the OpenAI API or any endpoint compatible with it
+    (Gemini, Hugging Face router, self-hosted servers). The ``openai``
+    package is only imported when this client is first used.
+    """
+
+    def __init__(self, provider: str, api_key: str | None, base_url: str | None = None):
+        self.provider = provider
+        self.api_key = api_key
+        self.base_url = base_url
+        self._client = None
+
+    async def stream(self, messages, *, model, temperature, max_tokens):
+        if self._client is None:
+            if not self.api_key:
+                raise LLMError(f"No API key configured for provider '{self.provider}'")
+            from openai import AsyncOpenAI
+
+            self._client = AsyncOpenAI(
+                api_key=self.api_key, base_url=self.base_url, timeout=settings.LLM_REQUEST_TIMEOUT
+            )
+        response = await self._client.chat.completions.create(
+            model=model,
+            messages=[{"role": m.role, "content": m.content} for m in messages],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield LLMDelta(text=chunk.choices[0].delta.content)
+            if chunk.usage is not None:
+                yield LLMDelta(completion_tokens=chunk.usage.completion_tokens)
+
+
+class AnthropicClient(LLMClient):
+    """
+    Streams from the Anthropic Messages API. The ``anthropic`` package is
+    only imported when this client is first used.
+    """
+
+    provider = LlmProvider.anthropic.value
+
+    def __init__(self, api_key: str | None = None):
+        self.api_key = api_key or settings.ANTHROPIC_API_KEY
+        self._client = None
+
+    async def stream(self, messages, *, model, temperature, max_tokens):
+        if self._client is None:
+            if not self.api_key:
+                raise LLMError("No API key configured for provider 'anthropic'")
+            from anthropic import AsyncAnthropic
+
+            self._client = AsyncAnthropic(api_key=self.api_key, timeout=settings.LLM_REQUEST_TIMEOUT)
+        system = "\n\n".join(m.content for m in messages if m.role == "system")
+        async with self._client.messages.stream(
+            model=model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            system=system or None,
+            messages=[{"role": m.role, "content": m.content} for m in messages if m.role != "system"],
+        ) as response:
+            async for text in response.text_stream:
+                yield LLMDelta(text=text)
+            final = await response.get_final_message()
+        yield LLMDelta(completion_tokens=final.usage.output_tokens)
+
+
+LLMClientFactory = Callable[[], LLMClient]
+
+_llm_factories: dict[str, LLMClientFactory] = {
+    "fake": FakeLLMClient,
+    LlmProvider.ollama.value: OllamaClient,
+    LlmProvider.anthropic.value: AnthropicClient,
+    LlmProvider.openai.value: lambda: OpenAICompatibleClient("openai", settings.OPENAI_API_KEY),
+    LlmProvider.gemini.value: lambda: OpenAICompatibleClient(
+        "gemini", settings.GEMINI_API_KEY, "https://generativelanguage.googleapis.com/v1beta/openai/"
+    ),
+    LlmProvider.huggingface.value: lambda: OpenAICompatibleClient(
+        "huggingface", settings.HUGGINGFACE_API_KEY, "https://router.huggingface.co/v1"
+    ),
+    LlmProvider.custom.value: lambda: OpenAICompatibleClient(
+        "custom", settings.LLM_CUSTOM_API_KEY or "unused", settings.LLM_CUSTOM_BASE_URL
+    ),
+}
+_clients: dict[str, LLMClient] = {}
+
+
+def register_llm_provider(name: str, factory: LLMClientFactory) -> None:
+    _llm_factories[name] = factory
+    _clients.pop(name, None)
+
+
+def get_llm_client(provider: str | LlmProvider) -> LLMClient:
+    """
+    Shared client for ``provider``, so connection pools are reused across
+    requests. ``LLM_PROVIDER_OVERRIDE`` replaces the user's choice.
+    """
+    name = settings.LLM_PROVIDER_OVERRIDE or getattr(provider, "value", provider)
+    if name not in _clients:
+        if name not in _llm_factories:
+            raise LLMError(f"No LLM client registered for provider '{name}'")
+        _clients[name] = _llm_factories[name]()
+    return _clients[name]
@@ -0,0 +1,346 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field, replace
+from itertools import count
+
+import numpy as np
+from sqlmodel import Session, col, func, select, text
+
+from app.ai.embeddings import get_batch_embedder
+from app.ai.vectorstore import get_vector_store
+from app.core.config import settings
+from app.core.database import engine
+from app.models.document import Document, DocumentChunks
+from app.models.user import UserSettings
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=settings.RAG_MAX_THREADS, thread_name_prefix="rag")
+
+
+@dataclass
+class RetrievedChunk:
+    chunk_id: int
+    document_id: int
+    document_title: str
+    vector_id: str
+    content: str
+    page_number: int | None
+    section_title: str | None
+    score: float
+    vector_score: float | None = None
+    text_rank: float | None = None
+
+
+@dataclass
+class RetrievalResult:
+    chunks: list[RetrievedChunk]
+    # Branches that missed the latency budget or failed
+    degraded: list[str] = field(default_factory=list)
+    elapsed_ms: float = 0.0
+
+
+def _chunk_tsvector():
+    # Must match ix_document_chunks_content_search for the GIN index to be used
+    return func.to_tsvector(text("'english'"), DocumentChunks.content)
+
+
+def _text_search(user_id: int, query: str, limit: int, timeout_ms: int) -> list[tuple[str, float]]:
+    tsquery = func.websearch_to_tsquery(text("'english'"), query)
+    # Normalisation 1 divides by log(document length), which gives BM25-like length damping
+    rank = func.ts_rank(_chunk_tsvector(), tsquery, 1).label("rank")
+    statement = (
+        select(DocumentChunks.vector_id, rank)
+        .join(Document, col(Document.id) == DocumentChunks.document_id)
+        .where(
+            Document.user_id == user_id,
+            col(Document.is_deleted).is_(False),
+            _chunk_tsvector().op("@@")(tsquery),
+        )
+        .order_by(rank.desc())
+        .limit(limit)
+    )
+    with Session(engine) as session:
+        # Give up server-side too, not just stop waiting for the answer
+        session.exec(text(f"SET LOCAL statement_timeout = {int(timeout_ms)}"))
+        return [(vector_id, float(score)) for vector_id, score in session.exec(statement).all()]
+
+
+def embed_query(embedding_model: str, query: str) -> np.ndarray:
+    # Goes through the embedding cache, so embedding the same question twice is cheap
+    return get_batch_embedder(embedding_model).embed([query])[0]
+
+
+def _vector_search(
+    user_id: int, query: str, embedding_model: str, limit: int, threshold: float
+) -> list[tuple[str, float]]:
+    query_vector = embed_query(embedding_model, query)
+    results = get_vector_store().search(user_id, query_vector, limit, threshold=threshold)
+    return [(result.vector_id, result.score) for result in results]
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int | None = None) -> dict[str, float]:
+    """
+    Fuse ranked id lists: score(d) = sum over lists of 1 / (k + rank(d)).
+    """
+    k = k or settings.RAG_RRF_K
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return scores
+
+
+def _load_chunks(session: Session, user_id: int, vector_ids: list[str]) -> dict[str, tuple]:
+    if not vector_ids:
+        return {}
+    statement = (
+        select(DocumentChunks, Document.title)
+        .join(Document, col(Document.id) == DocumentChunks.document_id)
+        .where(
+            col(DocumentChunks.vector_id).in_(vector_ids),
+            Document.user_id == user_id,
+            col(Document.is_deleted).is_(False),
+        )
+    )
+    return {chunk.vector_id: (chunk, title) for chunk, title in session.exec(statement).all()}
+
+
+def hybrid_search(
+    *,
+    session: Session,
+    user_id: int,
+    query: str,
+    user_settings: UserSettings | None = None,
+    budget_ms: int | None = None,
+) -> RetrievalResult:
+    """
+    Retrieve chunks for ``query`` by running a full-text (ts_rank over the GIN
+    index) and a vector top-k search in parallel, fused with reciprocal rank
+    fusion. Both branches share one latency budget; a branch that misses it
+    or fails is dropped and the other one's results are used alone.
+
+    Honours ``UserSettings.top_k_results`` and, for the vector branch,
+    ``UserSettings.similarity_threshold``.
+    """
+    started = time.perf_counter()
+    user_settings = user_settings or session.get(UserSettings, user_id) or UserSettings(user_id=user_id)
+    budget_ms = budget_ms or settings.RAG_LATENCY_BUDGET_MS
+    top_k = user_settings.top_k_results
+    limit = top_k * settings.RAG_CANDIDATE_MULTIPLIER
+
+    # Each branch runs in a copy of the caller's context, so its queries
+    # count towards the request's metrics
+    branches = {
+        "text": _executor.submit(contextvars.copy_context().run, _text_search, user_id, query, limit, budget_ms),
+        "vector": _executor.submit(
+            contextvars.copy_context().run, _vector_search, user_id, query, user_settings.embedding_model, limit,
+            user_settings.similarity_threshold,
+        ),
+    }
+    wait(branches.values(), timeout=budget_ms / 1000)
+
+    rankings: dict[str, list[tuple[str, float]]] = {}
+    degraded = []
+    for name, future in branches.items():
+        if not future.done():
+            future.cancel()
+            degraded.append(name)
+            logger.warning("Retrieval branch %s missed the %s ms budget", name, budget_ms)
+        elif future.exception() is not None:
+            degraded.append(name)
+            logger.warning("Retrieval branch %s failed: %s", name, future.exception())
+        else:
+            rankings[name] = future.result()
+
+    fused = reciprocal_rank_fusion([[vector_id for vector_id, _ in hits] for hits in rankings.values()])
+    ranked = sorted(fused, key=fused.get, reverse=True)
+    vector_scores = dict(rankings.get("vector", []))
+    text_ranks = dict(rankings.get("text", []))
+    # Every candidate is loaded, so hits dropped below still leave top_k results
+    loaded = _load_chunks(session, user_id, ranked)
+
+    chunks = []
+    for vector_id in ranked:
+        if len(chunks) == top_k:
+            break
+        if vector_id not in loaded:
+            # Vector of a deleted chunk or of a document in the trash
+            continue
+        chunk, title = loaded[vector_id]
+        chunks.append(RetrievedChunk(
+            chunk_id=chunk.id,
+            document_id=chunk.document_id,
+            document_title=title,
+            vector_id=vector_id,
+            content=chunk.content,
+            page_number=chunk.page_number,
+            section_title=chunk.section_title,
+            score=fused[vector_id],
+            vector_score=vector_scores.get(vector_id),
+            text_rank=text_ranks.get(vector_id),
+        ))
+    return RetrievalResult(
+        chunks=chunks,
+        degraded=degraded,
+        elapsed_ms=(time.perf_counter() - started) * 1000,
+    )
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: str
+    sources: dict
+    model_used: str | None = None
+    similarity: float = 1.0
+
+
+@dataclass
+class _AnswerEntry:
+    vector: np.ndarray
+    variant: str
+    corpus_version: int
+    answer: CachedAnswer
+    size: int
+
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def answer_variant(user_settings: UserSettings) -> str:
+    """
+    Settings that change an answer; a cached answer is only reused under the same ones
+    """
+    return ":".join(str(value) for value in (
+        user_settings.llm_provider, user_settings.llm_model, user_settings.embedding_model,
+        user_settings.top_k_results, user_settings.similarity_threshold,
+    ))
+
+
+class SemanticAnswerCache:
+    """
+    Per-user cache of chat answers keyed by the question's embedding. A new
+    question reuses an answer when its cosine similarity to a cached question
+    reaches ``threshold`` and both were answered against the same corpus
+    version (``users.corpus_version``) and the same ``answer_variant``.
+    The key ignores conversation history, so only questions asked without
+    any may be stored or looked up.
+
+    Entries from older corpus versions are dropped on the user's next lookup.
+    Eviction is LRU, bounded per user by entry count and globally by bytes.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int | None = None,
+        max_entries_per_user: int | None = None,
+        threshold: float | None = None,
+    ):
+        self.max_bytes = max_bytes or settings.ANSWER_CACHE_MAX_BYTES
+        self.max_entries_per_user = max_entries_per_user or settings.ANSWER_CACHE_MAX_ENTRIES_PER_USER
+        self.threshold = threshold or settings.ANSWER_CACHE_THRESHOLD
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self._bytes = 0
+        self._ids = count()
+        # Per-user entries in LRU order, plus one global LRU for the byte budget
+        self._users: dict[int, OrderedDict[int, _AnswerEntry]] = {}
+        self._lru: OrderedDict[tuple[int, int], None] = OrderedDict()
+        self._matrices: dict[int, tuple[list[int], np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def _remove(self, user_id: int, entry_id: int) -> None:
+        entry = self._users[user_id].pop(entry_id)
+        self._lru.pop((user_id, entry_id), None)
+        self._bytes -= entry.size
+        self._matrices.pop(user_id, None)
+        if not self._users[user_id]:
+            del self._users[user_id]
+
+    def _purge_stale(self, user_id: int, corpus_version: int) -> None:
+        entries = self._users.get(user_id, {})
+        for entry_id in [i for i, entry in entries.items() if entry.corpus_version != corpus_version]:
+            self._remove(user_id, entry_id)
+            self.stale += 1
+
+    def _matrix(self, user_id: int) -> tuple[list[int], np.ndarray]:
+        if user_id not in self._matrices:
+            entries = self._users[user_id]
+            self._matrices[user_id] = (list(entries), np.stack([entry.vector for entry in entries.values()]))
+        return self._matrices[user_id]
+
+    def lookup(
+        self, user_id: int, vector: np.ndarray, *, variant: str, corpus_version: int
+    ) -> CachedAnswer | None:
+        with self._lock:
+            self._purge_stale(user_id, corpus_version)
+            if user_id in self._users:
+                entry_ids, matrix = self._matrix(user_id)
+                scores = matrix @ _unit(vector)
+                for row in np.argsort(-scores):
+                    if scores[row] < self.threshold:
+                        break
+                    entry = self._users[user_id][entry_ids[row]]
+                    if entry.variant != variant:
+                        continue
+                    self._users[user_id].move_to_end(entry_ids[row])
+                    self._lru.move_to_end((user_id, entry_ids[row]))
+                    self.hits += 1
+                    return replace(entry.answer, similarity=float(scores[row]))
+            self.misses += 1
+            return None
+
+    def store(
+        self, user_id: int, vector: np.ndarray, answer: CachedAnswer, *, variant: str, corpus_version: int
+    ) -> None:
+        size = vector.nbytes + len(answer.question) + len(answer.answer) + len(json.dumps(answer.sources))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._purge_stale(user_id, corpus_version)
+            entry_id = next(self._ids)
+            self._users.setdefault(user_id, OrderedDict())[entry_id] = _AnswerEntry(
+                vector=_unit(vector), variant=variant,
+                corpus_version=corpus_version, answer=answer, size=size,
+            )
+            self._lru[(user_id, entry_id)] = None
+            self._bytes += size
+            self._matrices.pop(user_id, None)
+            while len(self._users[user_id]) > self.max_entries_per_user:
+                self._remove(user_id, next(iter(self._users[user_id])))
+                self.evictions += 1
+            while self._bytes > self.max_bytes:
+                self._remove(*next(iter(self._lru)))
+                self.evictions += 1
+
+    def clear(self, user_id: int | None = None) -> None:
+        with self._lock:
+            for uid in [user_id] if user_id is not None else list(self._users):
+                for entry_id in list(self._users.get(uid, {})):
+                    self._remove(uid, entry_id)
+
+    def stats(self) -> dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "stale_dropped": self.stale,
+            "evictions": self.evictions,
+            "entries": len(self._lru),
+            "bytes": self._bytes,
+        }
+
+
+answer_cache = SemanticAnswerCache()
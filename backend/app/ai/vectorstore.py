@@ -0,0 +1,374 @@
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+
+from app.core.config import settings
+
+
+@dataclass
+class VectorSearchResult:
+    vector_id: str
+    score: float
+
+
+class _IVFIndex:
+    """
+    Coarse inverted-file index: spherical k-means centroids plus one list
+    assignment per row. Assignments are kept in step with the shard on every
+    mutation, so only the centroids ever need retraining.
+    """
+
+    def __init__(self, nlist: int, nprobe: int):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.centroids: np.ndarray | None = None
+        self.assignments = np.empty(0, dtype=np.int32)
+        self.trained_size = 0
+
+    def needs_training(self, size: int) -> bool:
+        return self.centroids is None or size > 4 * self.trained_size
+
+    def train(self, vectors: np.ndarray, iterations: int = 10) -> None:
+        n = len(vectors)
+        rng = np.random.default_rng(0)
+        k = min(self.nlist, max(1, int(np.sqrt(n))))
+        # ~64 points per centroid is plenty for coarse quantisation
+        sample_size = min(n, 64 * k)
+        sample = vectors if sample_size == n else vectors[np.sort(rng.choice(n, sample_size, replace=False))]
+        centroids = np.array(sample[rng.choice(len(sample), k, replace=False)], dtype=np.float32)
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(labels, kind="stable")
+            filled, starts = np.unique(labels[order], return_index=True)
+            sums = np.add.reduceat(sample[order], starts, axis=0)
+            centroids[filled] = _normalize(sums)
+        self.centroids = centroids
+        self.trained_size = n
+        self.assignments = self.assign(vectors)
+
+    def assign(self, vectors: np.ndarray, batch_size: int = 16_384) -> np.ndarray:
+        labels = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), batch_size):
+            block = vectors[start:start + batch_size]
+            labels[start:start + len(block)] = np.argmax(block @ self.centroids.T, axis=1)
+        return labels
+
+    def candidate_rows(self, query: np.ndarray, size: int) -> np.ndarray:
+        nprobe = min(self.nprobe, len(self.centroids))
+        probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.flatnonzero(np.isin(self.assignments[:size], probe))
+
+
+class VectorShard:
+    """
+    One user's vectors: a float32 memory-mapped matrix (``<name>.f32``) and a
+    JSON sidecar (``<name>.json``) holding the row -> vector_id mapping.
+
+    Rows are L2-normalised on write so that the dot product is the cosine
+    similarity. Deletes swap the last row into the freed slot, which keeps the
+    matrix contiguous and deletes O(1).
+
+    Several processes (API workers, ingestion workers) may share a shard:
+    writers serialise on a ``flock`` and every access reloads the shard if
+    the sidecar was replaced by another process.
+    """
+
+    def __init__(self, directory: Path, name: str):
+        self.vectors_path = directory / f"{name}.f32"
+        self.meta_path = directory / f"{name}.json"
+        self.lock_path = directory / f"{name}.lock"
+        self.dim: int | None = None
+        self.ids: list[str] = []
+        self.rows: dict[str, int] = {}
+        self._capacity = 0
+        self._matrix: np.ndarray | None = None
+        self._ivf: _IVFIndex | None = None
+        self._stamp: tuple[int, int] | None = None
+        self._lock = threading.RLock()
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _meta_stamp(self) -> tuple[int, int] | None:
+        try:
+            stat = os.stat(self.meta_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_ino
+
+    def _load(self) -> None:
+        self._stamp = self._meta_stamp()
+        if self._stamp is None:
+            return
+        meta = json.loads(self.meta_path.read_text())
+        self.dim = meta["dim"]
+        self.ids = meta["ids"]
+        self.rows = {vector_id: row for row, vector_id in enumerate(self.ids)}
+        self._capacity = meta["capacity"]
+        if self._capacity:
+            self._matrix = np.memmap(
+                self.vectors_path, dtype=np.float32, mode="r+", shape=(self._capacity, self.dim)
+            )
+
+    def _refresh(self) -> None:
+        if self._meta_stamp() == self._stamp:
+            return
+        self._matrix = None
+        self._ivf = None
+        self.dim, self.ids, self.rows, self._capacity = None, [], {}, 0
+        self._load()
+
+    @contextmanager
+    def _write_lock(self):
+        with self._lock, open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _save(self) -> None:
+        if self._matrix is not None:
+            self._matrix.flush()
+        tmp_path = self.meta_path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps({"dim": self.dim, "capacity": self._capacity, "ids": self.ids}))
+        os.replace(tmp_path, self.meta_path)
+        self._stamp = self._meta_stamp()
+
+    def _reserve(self, size: int) -> None:
+        if size <= self._capacity:
+            return
+        capacity = max(size, self._capacity * 2, 1024)
+        if self._matrix is not None:
+            self._matrix.flush()
+            self._matrix = None
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(capacity * self.dim * 4)
+        self._matrix = np.memmap(
+            self.vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim)
+        )
+        self._capacity = capacity
+
+    def _check_dim(self, vectors: np.ndarray) -> None:
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of dimension {self.dim}, got {vectors.shape[1]}")
+
+    def upsert(self, vector_ids: Sequence[str], vectors: np.ndarray) -> None:
+        with self._write_lock():
+            self._upsert(vector_ids, vectors)
+
+    def add(self, vector_ids: Sequence[str], vectors: np.ndarray) -> None:
+        with self._write_lock():
+            existing = [vector_id for vector_id in vector_ids if vector_id in self.rows]
+            if existing:
+                raise KeyError(f"Vector ids already present: {existing[:5]}")
+            self._upsert(vector_ids, vectors)
+
+    def _upsert(self, vector_ids: Sequence[str], vectors: np.ndarray) -> None:
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32).reshape(len(vector_ids), -1))
+        self._check_dim(vectors)
+        # Later duplicates in the same batch win, as with sequential upserts
+        latest = {vector_id: i for i, vector_id in enumerate(vector_ids)}
+        new_ids = [vector_id for vector_id in latest if vector_id not in self.rows]
+        start = len(self.ids)
+        self._reserve(start + len(new_ids))
+        for offset, vector_id in enumerate(new_ids):
+            self.rows[vector_id] = start + offset
+        self.ids.extend(new_ids)
+
+        targets = np.fromiter((self.rows[v] for v in latest), dtype=np.int64, count=len(latest))
+        sources = np.fromiter(latest.values(), dtype=np.int64, count=len(latest))
+        self._matrix[targets] = vectors[sources]
+        if self._ivf is not None and self._ivf.centroids is not None:
+            if len(self._ivf.assignments) < self._capacity:
+                self._ivf.assignments = np.resize(self._ivf.assignments, self._capacity)
+            self._ivf.assignments[targets] = self._ivf.assign(vectors[sources])
+        self._save()
+
+    def delete(self, vector_ids: Sequence[str]) -> int:
+        removed = 0
+        with self._write_lock():
+            for vector_id in vector_ids:
+                row = self.rows.pop(vector_id, None)
+                if row is None:
+                    continue
+                last = len(self.ids) - 1
+                if row != last:
+                    moved_id = self.ids[last]
+                    self._matrix[row] = self._matrix[last]
+                    self.ids[row] = moved_id
+                    self.rows[moved_id] = row
+                    if self._ivf is not None and self._ivf.centroids is not None:
+                        self._ivf.assignments[row] = self._ivf.assignments[last]
+                self.ids.pop()
+                removed += 1
+            if removed:
+                self._save()
+        return removed
+
+    def search(
+        self,
+        query: np.ndarray,
+        top_k: int,
+        threshold: float | None = None,
+        mode: str | None = None,
+    ) -> list[VectorSearchResult]:
+        query = _normalize(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        with self._lock:
+            self._refresh()
+            size = len(self.ids)
+            if not size or top_k <= 0:
+                return []
+            if query.shape[0] != self.dim:
+                raise ValueError(f"Expected query of dimension {self.dim}, got {query.shape[0]}")
+            matrix = self._matrix[:size]
+            mode = mode or settings.VECTOR_SEARCH_MODE
+            if mode == "ivf" and size >= settings.VECTOR_IVF_MIN_VECTORS:
+                rows = self._ivf_index(matrix).candidate_rows(query, size)
+                scores = matrix[rows] @ query
+            else:
+                rows = None
+                scores = matrix @ query
+
+            k = min(top_k, len(scores))
+            if not k:
+                return []
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            if threshold is not None:
+                best = best[scores[best] >= threshold]
+            return [
+                VectorSearchResult(
+                    vector_id=self.ids[row if rows is None else rows[row]],
+                    score=float(scores[row]),
+                )
+                for row in best
+            ]
+
+    def snapshot(self) -> tuple[list[str], np.ndarray]:
+        """
+        Copy of all vector ids and their (normalised) rows, for batch jobs
+        """
+        with self._lock:
+            self._refresh()
+            size = len(self.ids)
+            if not size:
+                return [], np.zeros((0, self.dim or 0), dtype=np.float32)
+            return list(self.ids), np.array(self._matrix[:size])
+
+    def _ivf_index(self, matrix: np.ndarray) -> _IVFIndex:
+        if self._ivf is None:
+            self._ivf = _IVFIndex(settings.VECTOR_IVF_NLIST, settings.VECTOR_IVF_NPROBE)
+        if self._ivf.needs_training(len(matrix)):
+            self._ivf.train(matrix)
+            self._ivf.assignments = np.resize(self._ivf.assignments, self._capacity)
+        return self._ivf
+
+    def close(self) -> None:
+        with self._lock:
+            if self._matrix is not None:
+                self._matrix.flush()
+            self._matrix = None
+
+
+class VectorStore:
+    """
+    Local vector index with one shard per user. Shards are opened lazily on
+    first access, so creating the store costs nothing until it is queried.
+    """
+
+    def __init__(self, directory: Path | None = None):
+        self.directory = Path(directory or settings.VECTOR_STORE_DIR)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._shards: dict[int, VectorShard] = {}
+        self._lock = threading.Lock()
+
+    def shard(self, user_id: int) -> VectorShard:
+        shard = self._shards.get(user_id)
+        if shard is None:
+            with self._lock:
+                shard = self._shards.get(user_id)
+                if shard is None:
+                    shard = VectorShard(self.directory, f"user_{user_id}")
+                    self._shards[user_id] = shard
+        return shard
+
+    def add(self, user_id: int, vector_ids: Sequence[str], vectors: np.ndarray) -> None:
+        self.shard(user_id).add(vector_ids, vectors)
+
+    def upsert(self, user_id: int, vector_ids: Sequence[str], vectors: np.ndarray) -> None:
+        self.shard(user_id).upsert(vector_ids, vectors)
+
+    def delete(self, user_id: int, vector_ids: Sequence[str]) -> int:
+        return self.shard(user_id).delete(vector_ids)
+
+    def search(
+        self,
+        user_id: int,
+        query: np.ndarray,
+        top_k: int,
+        threshold: float | None = None,
+        mode: str | None = None,
+    ) -> list[VectorSearchResult]:
+        return self.shard(user_id).search(query, top_k, threshold=threshold, mode=mode)
+
+    def drop_user(self, user_id: int) -> None:
+        with self._lock:
+            shard = self._shards.pop(user_id, None)
+            if shard is not None:
+                shard.close()
+            for path in (
+                self.directory / f"user_{user_id}.f32",
+                self.directory / f"user_{user_id}.json",
+                self.directory / f"user_{user_id}.lock",
+            ):
+                path.unlink(missing_ok=True)
+
+    def close(self) -> None:
+        with self._lock:
+            for shard in self._shards.values():
+                shard.close()
+            self._shards.clear()
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+_vector_store: VectorStore | None = None
+_note_vector_store: VectorStore | None = None
+_vector_store_lock = threading.Lock()
+
+
+def get_vector_store() -> VectorStore:
+    global _vector_store
+    if _vector_store is None:
+        with _vector_store_lock:
+            if _vector_store is None:
+                _vector_store = VectorStore()
+    return _vector_store
+
+
+def get_note_vector_store() -> VectorStore:
+    """
+    Note embeddings, kept apart from document chunks so chunk retrieval never sees them
+    """
+    global _note_vector_store
+    if _note_vector_store is None:
+        with _vector_store_lock:
+            if _note_vector_store is None:
+                _note_vector_store = VectorStore(settings.VECTOR_STORE_DIR / "notes")
+    return _note_vector_store
@@ -1,4 +1,5 @@
-from collections.abc import Generator
+import time
+from collections.abc import AsyncGenerator, Generator
 from typing import Annotated
 import jwt
 from fastapi import Depends, HTTPException, status
@@ -6,24 +7,37 @@ from fastapi.security import OAuth2PasswordBearer
 from jwt.exceptions import InvalidTokenError
 from pydantic import ValidationError
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core import security
+from app.core.auth_cache import token_cache, user_cache
 from app.core.config import settings
-from app.core.database import engine
+from app.core.database import async_session_maker, engine
 from app.models.user import User, TokenPayload
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/access-token"
 )
 
-def get_db() -> Generator[Session, None, None]:
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    async with async_session_maker() as session:
+        yield session
+
+def get_sync_db() -> Generator[Session, None, None]:
+    """
+    For routes that call the sync services shared with the ingestion worker
+    """
     with Session(engine) as session:
         yield session
     
-SessionDep = Annotated[Session, Depends(get_db)]
+SessionDep = Annotated[AsyncSession, Depends(get_db)]
+SyncSessionDep = Annotated[Session, Depends(get_sync_db)]
 TokenDep = Annotated[str, Depends(reusable_oauth2)]
 
-def get_current_user(session: SessionDep, token: TokenDep) -> User:
+def _decode_token(token: str) -> TokenPayload:
+    token_data = token_cache.get(token)
+    if token_data is not None:
+        return token_data
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[security.ALGORIGTM]
@@ -34,14 +48,41 @@ def get_current_user(session: SessionDep, token: TokenDep) -> User:
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials"
         )
-    user = session.get(User, token_data.sub)
+    # Never serve a cached payload past the token's own expiry
+    ttl = min(settings.AUTH_CACHE_TTL, payload.get("exp", 0) - time.time())
+    token_cache.set(token, token_data, ttl=ttl)
+    return token_data
+
+def _check_user(user: User | None) -> User:
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive User")
     return user
+
+async def get_current_user(session: SessionDep, token: TokenDep) -> User:
+    """
+    Resolve the bearer token to a detached snapshot of the user, reusing a
+    cached copy for up to AUTH_CACHE_TTL seconds. Routes that modify the
+    user must depend on FreshCurrentUser instead.
+    """
+    user_id = int(_decode_token(token).sub)
+    snapshot = user_cache.get(user_id)
+    if snapshot is not None:
+        return User(**snapshot)
+    user = _check_user(await session.get(User, user_id))
+    user_cache.set(user_id, user.model_dump())
+    return user
+
+async def get_current_user_fresh(session: SessionDep, token: TokenDep) -> User:
+    """
+    Always load the user row in this request's session, bypassing the cache
+    """
+    user_id = int(_decode_token(token).sub)
+    return _check_user(await session.get(User, user_id))
     
 CurrentUser = Annotated[User, Depends(get_current_user)]
+FreshCurrentUser = Annotated[User, Depends(get_current_user_fresh)]
 
 def get_current_active_superuser(current_user: CurrentUser) -> User:
     if not current_user.is_superuser:
@@ -1,7 +1,13 @@
 from fastapi import APIRouter
-from app.core.config import settings
+from app.api.routes import admin, auth, chat, documents, folders, graph, notes, search, user
 
 router = APIRouter()
-
-if settings.ENVIRONMENT == "local":
-    router.include_router(router)
\ No newline at end of file
+router.include_router(auth.router)
+router.include_router(user.router)
+router.include_router(documents.router)
+router.include_router(chat.router)
+router.include_router(notes.router)
+router.include_router(folders.router)
+router.include_router(search.router)
+router.include_router(graph.router)
+router.include_router(admin.router)
@@ -0,0 +1,31 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from app.api.deps import get_current_active_superuser
+from app.ai.rag import answer_cache
+from app.core.auth_cache import auth_cache_stats
+from app.core.metrics import metrics
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    dependencies=[Depends(get_current_active_superuser)],
+)
+
+
+@router.get(path="/cache-stats")
+def read_cache_stats() -> Any:
+    """
+    Hit rates of the in-process caches
+    """
+    return {"auth": auth_cache_stats(), "answers": answer_cache.stats()}
+
+
+@router.get(path="/metrics", response_class=PlainTextResponse)
+def read_metrics() -> Any:
+    """
+    Request latency, query counts and database time in Prometheus text format
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,81 @@
+from typing import Any
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from app.api.deps import CurrentUser, SessionDep
+from app.models.chat import ChatSession
+from app.models.user import ActivityAction, EntityType
+from app.schemas.chat import (
+    ChatMessageCreate, ChatMessagePublic, ChatSessionCreate, ChatSessionPublic, ChatSessionsPublic,
+)
+from app.services import chat_service
+from app.services.activity_service import activity_log
+from app.utils.pagination import InvalidCursorError
+
+router = APIRouter(prefix="/chat", tags=["chat"])
+
+
+async def _get_owned_session(session: SessionDep, current_user: CurrentUser, session_id: int) -> ChatSession:
+    chat_session = await chat_service.get_chat_session(
+        session=session, user_id=current_user.id, chat_session_id=session_id
+    )
+    if not chat_session:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    return chat_session
+
+
+@router.post(path="/sessions", response_model=ChatSessionPublic)
+async def create_chat_session(session: SessionDep, current_user: CurrentUser, chat_in: ChatSessionCreate) -> Any:
+    """
+    Start a new chat session
+    """
+    chat_session = await chat_service.create_chat_session(session=session, user_id=current_user.id, chat_in=chat_in)
+    activity_log.log(
+        user_id=current_user.id, action=ActivityAction.created, entity_type=EntityType.chat, entity_id=chat_session.id,
+    )
+    return chat_session
+
+
+@router.get(path="/sessions", response_model=ChatSessionsPublic)
+async def read_chat_sessions(
+    session: SessionDep,
+    current_user: CurrentUser,
+    cursor: str | None = None,
+    limit: int = Query(default=50, ge=1, le=200),
+) -> Any:
+    """
+    List chat sessions, most recently active first
+    """
+    try:
+        page = await chat_service.list_chat_sessions(
+            session=session, user_id=current_user.id, limit=limit, cursor=cursor
+        )
+    except InvalidCursorError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return ChatSessionsPublic(data=page.items, next_cursor=page.next_cursor)
+
+
+@router.get(path="/sessions/{session_id}/messages", response_model=list[ChatMessagePublic])
+async def read_chat_messages(session: SessionDep, current_user: CurrentUser, session_id: int, limit: int = 50) -> Any:
+    """
+    Get the latest messages of a chat session, oldest first
+    """
+    await _get_owned_session(session, current_user, session_id)
+    return await chat_service.list_messages(session=session, chat_session_id=session_id, limit=limit)
+
+
+@router.post(path="/sessions/{session_id}/messages")
+async def send_chat_message(
+    session: SessionDep, current_user: CurrentUser, session_id: int, message_in: ChatMessageCreate
+) -> StreamingResponse:
+    """
+    Send a message and stream the assistant's reply as Server-Sent Events
+    """
+    await _get_owned_session(session, current_user, session_id)
+    return StreamingResponse(
+        chat_service.stream_reply(user_id=current_user.id, chat_session_id=session_id, content=message_in.content),
+        media_type="text/event-stream",
+        # Stop reverse proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,73 @@
+from typing import Any
+
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile, status
+
+from app.api.deps import CurrentUser, SyncSessionDep
+from app.models.document import Document, DocumentStatus
+from app.models.user import ActivityAction, EntityType
+from app.schemas.document import DocumentJobStatus, DocumentPublic
+from app.services import document_service
+from app.services.access_service import access_tracker
+from app.services.activity_service import activity_log
+from app.utils.file_processing import FileTooLargeError, UnsupportedFileTypeError
+
+router = APIRouter(prefix="/documents", tags=["documents"])
+
+
+def _get_owned_document(session: SyncSessionDep, current_user: CurrentUser, document_id: int) -> Document:
+    document = session.get(Document, document_id)
+    if not document or document.user_id != current_user.id or document.is_deleted:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return document
+
+
+@router.post(
+    path="/",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=DocumentPublic,
+)
+def upload_document(
+    session: SyncSessionDep,
+    current_user: CurrentUser,
+    file: UploadFile = File(...),
+    title: str | None = Form(default=None),
+) -> Any:
+    """
+    Upload a document. It is queued for processing and handled by the ingestion worker.
+    """
+    try:
+        document = document_service.create_document(
+            session=session,
+            user_id=current_user.id,
+            file_name=file.filename or "upload",
+            source=file.file,
+            title=title,
+        )
+    except UnsupportedFileTypeError as exc:
+        raise HTTPException(status_code=415, detail=str(exc))
+    except FileTooLargeError as exc:
+        raise HTTPException(status_code=413, detail=str(exc))
+    activity_log.log(
+        user_id=current_user.id, action=ActivityAction.created, entity_type=EntityType.document, entity_id=document.id,
+    )
+    return document
+
+
+@router.get(path="/{document_id}/status", response_model=DocumentJobStatus)
+def read_document_status(session: SyncSessionDep, current_user: CurrentUser, document_id: int) -> Any:
+    """
+    Get the processing status of an uploaded document
+    """
+    document = _get_owned_document(session, current_user, document_id)
+    access_tracker.touch("document", document_id)
+    return DocumentJobStatus(
+        document_id=document.id,
+        status=document.status,
+        queued=document.status == DocumentStatus.processing and document.processing_started_at is None,
+        attempts=document.processing_attempts,
+        processing_error=document.processing_error,
+        processing_started_at=document.processing_started_at,
+        processing_completed_at=document.processing_completed_at,
+        page_count=document.page_count,
+        chunk_count=document.chunk_count,
+    )
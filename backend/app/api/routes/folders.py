@@ -0,0 +1,67 @@
+from typing import Any
+
+from fastapi import APIRouter, HTTPException
+
+from app.api.deps import CurrentUser, SessionDep
+from app.schemas.folder import FolderArchive, FolderMove, FolderSubtreeResult, FolderTreePublic
+from app.services import folder_service
+from app.services.folder_service import folder_tree_cache
+
+router = APIRouter(prefix="/folders", tags=["folders"])
+
+
+def _subtree_result(counts: tuple[int, int] | None) -> FolderSubtreeResult:
+    if counts is None:
+        raise HTTPException(status_code=404, detail="Folder not found")
+    folders, notes = counts
+    return FolderSubtreeResult(folders=folders, notes=notes)
+
+
+@router.get(path="/tree", response_model=FolderTreePublic)
+async def read_folder_tree(session: SessionDep, current_user: CurrentUser) -> Any:
+    """
+    Every folder depth-first in display order, with its path from the root and note counts
+    """
+    tree = await folder_tree_cache.get(session=session, user_id=current_user.id)
+    with folder_tree_cache.lock:
+        return FolderTreePublic(data=tree.nodes())
+
+
+@router.post(path="/{folder_id}/move", response_model=FolderTreePublic)
+async def move_folder(session: SessionDep, current_user: CurrentUser, folder_id: int, move_in: FolderMove) -> Any:
+    """
+    Move a folder and everything in it under another folder, or to the top level
+    """
+    try:
+        moved = await folder_service.move_folder(
+            session=session, user_id=current_user.id, folder_id=folder_id, parent_id=move_in.parent_folder_id
+        )
+    except folder_service.FolderMoveError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    if not moved:
+        raise HTTPException(status_code=404, detail="Folder not found")
+    tree = await folder_tree_cache.get(session=session, user_id=current_user.id)
+    with folder_tree_cache.lock:
+        return FolderTreePublic(data=tree.nodes(folder_id) if folder_id in tree else [])
+
+
+@router.post(path="/{folder_id}/archive", response_model=FolderSubtreeResult)
+async def archive_folder(
+    session: SessionDep, current_user: CurrentUser, folder_id: int, archive_in: FolderArchive
+) -> Any:
+    """
+    Archive a folder with its subfolders and notes, or restore them with archived=false
+    """
+    return _subtree_result(await folder_service.archive_folder(
+        session=session, user_id=current_user.id, folder_id=folder_id, archived=archive_in.archived
+    ))
+
+
+@router.delete(path="/{folder_id}", response_model=FolderSubtreeResult)
+async def delete_folder(session: SessionDep, current_user: CurrentUser, folder_id: int) -> Any:
+    """
+    Move a folder with its subfolders and notes to the trash
+    """
+    return _subtree_result(
+        await folder_service.delete_folder(session=session, user_id=current_user.id, folder_id=folder_id)
+    )
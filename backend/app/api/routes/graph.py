@@ -0,0 +1,60 @@
+from typing import Any
+
+from fastapi import APIRouter, HTTPException, Query
+
+from app.api.deps import CurrentUser, SessionDep
+from app.core.config import settings
+from app.schemas.graph import GraphPath, GraphPublic
+from app.services.graph_service import UserGraph, graph_cache
+
+router = APIRouter(prefix="/graph", tags=["graph"])
+
+
+def _note_index(graph: UserGraph, note_id: int) -> int:
+    index = graph.index.get(("note", note_id))
+    if index is None or not graph.alive[index]:
+        raise HTTPException(status_code=404, detail="Note not found")
+    return index
+
+
+@router.get(path="/", response_model=GraphPublic)
+async def read_graph(session: SessionDep, current_user: CurrentUser) -> Any:
+    """
+    The whole knowledge graph: notes, linked documents and every edge between them
+    """
+    graph = await graph_cache.get(session=session, user_id=current_user.id)
+    with graph_cache.lock:
+        return graph.whole()
+
+
+@router.get(path="/notes/{note_id}/neighborhood", response_model=GraphPublic)
+async def read_neighborhood(
+    session: SessionDep, current_user: CurrentUser, note_id: int, depth: int = Query(default=1, ge=1, le=5)
+) -> Any:
+    """
+    Nodes within ``depth`` hops of a note
+    """
+    graph = await graph_cache.get(session=session, user_id=current_user.id)
+    with graph_cache.lock:
+        distances = graph.k_hop(_note_index(graph, note_id), depth, settings.GRAPH_MAX_NEIGHBORHOOD)
+        return graph.subgraph(distances, distance=distances)
+
+
+@router.get(path="/path", response_model=GraphPath)
+async def read_shortest_path(
+    session: SessionDep, current_user: CurrentUser, source_note_id: int, target_note_id: int
+) -> Any:
+    """
+    Shortest chain of links between two notes
+    """
+    graph = await graph_cache.get(session=session, user_id=current_user.id)
+    with graph_cache.lock:
+        path = graph.shortest_path(
+            _note_index(graph, source_note_id), _note_index(graph, target_note_id), settings.GRAPH_MAX_PATH_DEPTH
+        )
+        if path is None:
+            return GraphPath(found=False)
+        return GraphPath(
+            found=True,
+            nodes=[graph.node_payload(u, distance=hop) for hop, u in enumerate(path)],
+        )
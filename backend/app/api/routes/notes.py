@@ -0,0 +1,178 @@
+from typing import Any
+
+from fastapi import APIRouter, HTTPException, Query
+
+from app.api.deps import CurrentUser, SessionDep
+from app.models.note import Notes
+from app.models.user import ActivityAction, EntityType
+from app.schemas.note import (
+    BulkNoteArchive, BulkNoteIds, BulkNoteMove, BulkNoteOutcome, BulkNoteResults, BulkNoteTag,
+    NoteDetail, NotePublic, NotesPublic, NoteUpdate, NoteVersionContent, NoteVersionPublic, NoteVersionsPublic,
+)
+from app.services import note_service, version_service
+from app.services.access_service import access_tracker
+from app.services.activity_service import activity_log
+from app.utils.pagination import InvalidCursorError
+
+router = APIRouter(prefix="/notes", tags=["notes"])
+
+
+async def _get_owned_note(session: SessionDep, current_user: CurrentUser, note_id: int) -> Notes:
+    note = await session.get(Notes, note_id)
+    if not note or note.user_id != current_user.id or note.is_deleted:
+        raise HTTPException(status_code=404, detail="Note not found")
+    return note
+
+
+def _bulk_results(outcomes: dict[int, note_service.BulkOutcome]) -> BulkNoteResults:
+    return BulkNoteResults(
+        data=[BulkNoteOutcome(id=note_id, status=outcome) for note_id, outcome in outcomes.items()],
+        updated=sum(outcome == "updated" for outcome in outcomes.values()),
+    )
+
+
+@router.get(path="/", response_model=NotesPublic)
+async def read_notes(
+    session: SessionDep,
+    current_user: CurrentUser,
+    folder_id: int | None = None,
+    archived: bool = False,
+    cursor: str | None = None,
+    limit: int = Query(default=50, ge=1, le=200),
+) -> Any:
+    """
+    List notes newest first, without their content
+    """
+    try:
+        page = await note_service.list_notes(
+            session=session, user_id=current_user.id, folder_id=folder_id, archived=archived,
+            limit=limit, cursor=cursor,
+        )
+    except InvalidCursorError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return NotesPublic(data=page.items, next_cursor=page.next_cursor)
+
+
+@router.get(path="/{note_id}", response_model=NoteDetail)
+async def read_note(session: SessionDep, current_user: CurrentUser, note_id: int) -> Any:
+    """
+    A note with its folder, tags, links and collaborators
+    """
+    notes = await note_service.get_notes(session=session, user_id=current_user.id, note_ids=[note_id])
+    if not notes:
+        raise HTTPException(status_code=404, detail="Note not found")
+    access_tracker.touch("note", note_id)
+    return notes[0]
+
+
+@router.post(path="/bulk/move", response_model=BulkNoteResults)
+async def bulk_move_notes(session: SessionDep, current_user: CurrentUser, bulk_in: BulkNoteMove) -> Any:
+    """
+    Move notes into a folder, or to the top level when folder_id is null
+    """
+    try:
+        outcomes = await note_service.move_notes(
+            session=session, user_id=current_user.id, note_ids=bulk_in.note_ids, folder_id=bulk_in.folder_id
+        )
+    except note_service.BulkTargetNotFoundError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+    return _bulk_results(outcomes)
+
+
+@router.post(path="/bulk/tag", response_model=BulkNoteResults)
+async def bulk_tag_notes(session: SessionDep, current_user: CurrentUser, bulk_in: BulkNoteTag) -> Any:
+    """
+    Add tags to notes
+    """
+    try:
+        outcomes = await note_service.tag_notes(
+            session=session, user_id=current_user.id, note_ids=bulk_in.note_ids, tag_ids=bulk_in.tag_ids
+        )
+    except note_service.BulkTargetNotFoundError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+    return _bulk_results(outcomes)
+
+
+@router.post(path="/bulk/untag", response_model=BulkNoteResults)
+async def bulk_untag_notes(session: SessionDep, current_user: CurrentUser, bulk_in: BulkNoteTag) -> Any:
+    """
+    Remove tags from notes
+    """
+    try:
+        outcomes = await note_service.untag_notes(
+            session=session, user_id=current_user.id, note_ids=bulk_in.note_ids, tag_ids=bulk_in.tag_ids
+        )
+    except note_service.BulkTargetNotFoundError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+    return _bulk_results(outcomes)
+
+
+@router.post(path="/bulk/archive", response_model=BulkNoteResults)
+async def bulk_archive_notes(session: SessionDep, current_user: CurrentUser, bulk_in: BulkNoteArchive) -> Any:
+    """
+    Archive notes, or restore them with archived=false
+    """
+    outcomes = await note_service.archive_notes(
+        session=session, user_id=current_user.id, note_ids=bulk_in.note_ids, archived=bulk_in.archived
+    )
+    return _bulk_results(outcomes)
+
+
+@router.post(path="/bulk/delete", response_model=BulkNoteResults)
+async def bulk_delete_notes(session: SessionDep, current_user: CurrentUser, bulk_in: BulkNoteIds) -> Any:
+    """
+    Move notes to the trash
+    """
+    outcomes = await note_service.delete_notes(session=session, user_id=current_user.id, note_ids=bulk_in.note_ids)
+    return _bulk_results(outcomes)
+
+
+@router.patch(path="/{note_id}", response_model=NotePublic)
+async def update_note(session: SessionDep, current_user: CurrentUser, note_id: int, note_in: NoteUpdate) -> Any:
+    """
+    Edit a note. Meant for autosave: rapid edits are coalesced into one version.
+    """
+    note = await _get_owned_note(session, current_user, note_id)
+    if note.is_locked and note.locked_by != current_user.id:
+        raise HTTPException(status_code=423, detail="Note is locked")
+    await version_service.save_note(
+        session=session,
+        note=note,
+        title=note_in.title if note_in.title is not None else note.title,
+        content=note_in.content if note_in.content is not None else note.content,
+        edited_by=current_user.id,
+    )
+    activity_log.log(
+        user_id=current_user.id, action=ActivityAction.updated, entity_type=EntityType.note, entity_id=note_id,
+        details={"version": note.version},
+    )
+    return note
+
+
+@router.get(path="/{note_id}/versions", response_model=NoteVersionsPublic)
+async def read_note_versions(session: SessionDep, current_user: CurrentUser, note_id: int) -> Any:
+    """
+    History of a note, oldest first
+    """
+    await _get_owned_note(session, current_user, note_id)
+    access_tracker.touch("note", note_id)
+    versions = await version_service.list_versions(session=session, note_id=note_id)
+    return NoteVersionsPublic(data=[NoteVersionPublic.model_validate(row) for row, _ in versions])
+
+
+@router.get(path="/{note_id}/versions/{version}", response_model=NoteVersionContent)
+async def read_note_version(session: SessionDep, current_user: CurrentUser, note_id: int, version: int) -> Any:
+    """
+    A past version of a note with its content
+    """
+    await _get_owned_note(session, current_user, note_id)
+    found = await version_service.get_version(session=session, note_id=note_id, version=version)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Version not found")
+    row, content = found
+    access_tracker.touch("note", note_id)
+    activity_log.log(
+        user_id=current_user.id, action=ActivityAction.viewed, entity_type=EntityType.note, entity_id=note_id,
+        details={"version": version},
+    )
+    return NoteVersionContent.model_validate(row, update={"content": content})
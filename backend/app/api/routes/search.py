@@ -0,0 +1,53 @@
+from typing import Any, Literal
+
+from fastapi import APIRouter, Query
+
+from app.api.deps import CurrentUser, SessionDep
+from app.schemas.search import SearchEntity, SearchResults, SuggestionsPublic
+from app.services import search_service
+from app.services.suggest_service import suggest_cache
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+
+@router.get(path="/", response_model=SearchResults)
+async def search(
+    session: SessionDep,
+    current_user: CurrentUser,
+    q: str = Query(min_length=1, max_length=500),
+    types: list[SearchEntity] = Query(default=["note", "document", "chat"]),
+    tags: list[str] = Query(default=[]),
+    folder_id: int | None = None,
+    is_archived: bool | None = None,
+    is_favorite: bool | None = None,
+    limit: int = Query(default=20, ge=1, le=100),
+) -> Any:
+    """
+    Search notes, documents and chats at once. Filters only apply to the
+    entities that have them; entities lacking a requested filter are skipped.
+    """
+    filters = search_service.SearchFilters(
+        tags=tuple(tags), folder_id=folder_id, is_archived=is_archived, is_favorite=is_favorite
+    )
+    return await search_service.search(
+        session=session, user_id=current_user.id, query=q, entities=list(dict.fromkeys(types)),
+        filters=filters, limit=limit,
+    )
+
+
+@router.get(path="/suggest", response_model=SuggestionsPublic)
+async def suggest(
+    session: SessionDep,
+    current_user: CurrentUser,
+    q: str = Query(min_length=1, max_length=200),
+    types: list[Literal["note", "tag", "document"]] = Query(default=[]),
+    limit: int = Query(default=10, ge=1, le=50),
+) -> Any:
+    """
+    Search-as-you-type suggestions from note titles, tags and document titles.
+    Served from memory; only the first call for a user reads the database.
+    """
+    suggestions = await suggest_cache.suggest(
+        session=session, user_id=current_user.id, query=q, limit=limit, kinds=set(types) or None
+    )
+    return SuggestionsPublic(data=suggestions)
@@ -1,12 +1,14 @@
 from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import col, delete, func, select
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlmodel import select
 
-from backend.app import crud
-from app.api.deps import CurrentUser, SessionDep, get_current_active_superuser
+from app import crud
+from app.api.deps import CurrentUser, FreshCurrentUser, SessionDep, get_current_active_superuser
+from app.core.auth_cache import invalidate_user
 from app.core.config import settings
-from app.core.security import get_password_hash, verify_password
+from app.core.security import get_password_hash_async, verify_password_async
+from app.utils.pagination import CountMode, InvalidCursorError, count_rows, fetch_page
 from app.models.user import (
         Message, UpdatePassword, User, UserPublic,
         UserCreate, UserRegister, UserUpdateMe, UsersPublic,
@@ -20,35 +22,43 @@ router = APIRouter(prefix="/users", tags=["users"])
     dependencies=[Depends(get_current_active_superuser)],
     response_model=UsersPublic
 )
-def read_users(session: SessionDep, skip: int = 0, limit: int = 100) -> Any:
-    """
-    Retrieve Users
-    """
-    count_statement = select(func.count()).select_from(User)
-    count = session.exec(count_statement).one()
-
-    statement = select(User).order_by(User.created_at.desc()).offset(skip).limit(limit)
-    users = session.exec(statement).all()
+async def read_users(
+    session: SessionDep,
+    cursor: str | None = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+    count: CountMode = "approximate",
+) -> Any:
+    """
+    Retrieve Users, newest first. Pass ``next_cursor`` back as ``cursor`` for the next page.
+    """
+    statement = select(User)
+    try:
+        page = await fetch_page(
+            session, statement, sort_column=User.created_at, id_column=User.id, limit=limit, cursor=cursor
+        )
+    except InvalidCursorError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    total = await count_rows(session, statement, User, count)
 
-    return UsersPublic(data=users, count=count)
+    return UsersPublic(data=page.items, count=total, next_cursor=page.next_cursor)
 
 @router.post(
     path="/", 
     dependencies=[Depends(get_current_active_superuser)],
     response_model=UserPublic
 )
-def create_user(*, session: SessionDep, user_in: UserCreate) -> Any:
+async def create_user(*, session: SessionDep, user_in: UserCreate) -> Any:
     """
         Create new user
     """
-    user = crud.get_user_by_email(session=session, email=user_in.email)
+    user = await crud.get_user_by_email(session=session, email=user_in.email)
     if user:
         raise HTTPException(
             status_code=400,
             detail="The user with this email already exists in the system.",
         )
 
-    user = crud.create_user(session=session, user_create=user_in)
+    user = await crud.create_user(session=session, user_create=user_in)
 
     return user
 
@@ -56,32 +66,33 @@ def create_user(*, session: SessionDep, user_in: UserCreate) -> Any:
     path="/me",
     response_model=UserPublic
 )
-def update_user_me(*, session: SessionDep, user_in: UserUpdateMe, current_user: CurrentUser) -> Any:
+async def update_user_me(*, session: SessionDep, user_in: UserUpdateMe, current_user: FreshCurrentUser) -> Any:
     """
     Update own user
     """
     if user_in.email:
-        existing_user = crud.get_user_by_email(session=session, email=user_in.email)
+        existing_user = await crud.get_user_by_email(session=session, email=user_in.email)
         if existing_user and existing_user.id != current_user.id:
             raise HTTPException(
                 status_code=409, 
                 detail="User with this email already exists",
             )
-    user_data - user_in.model_dump(exclude_unset=True)
+    user_data = user_in.model_dump(exclude_unset=True)
     current_user.sqlmodel_update(user_data)
     session.add(current_user)
-    session.commit()
-    session.refresh(current_user)
+    await session.commit()
+    invalidate_user(current_user.id)
+    await session.refresh(current_user)
     return current_user
 
 @router.patch(
     path="/me/password", response_model=Message
 )
-def update_password_me(*, session: SessionDep, body: UpdatePassword, current_user: CurrentUser) -> Any:
+async def update_password_me(*, session: SessionDep, body: UpdatePassword, current_user: FreshCurrentUser) -> Any:
     """
     Update current user password
     """
-    verified, _ = verify_password(body.current_password, current_user.hashed_password)
+    verified, _ = await verify_password_async(body.current_password, current_user.hashed_password)
     if not verified:
         raise HTTPException(status_code=400, detail="Incorrect Password")
     if body.current_password == body.new_password:
@@ -89,17 +100,18 @@ def update_password_me(*, session: SessionDep, body: UpdatePassword, current_use
             status_code=400, 
             detail="New password cannot be same as old password",
         )
-    hashed_password = get_password_hash(body.new_password)
+    hashed_password = await get_password_hash_async(body.new_password)
     current_user.hashed_password = hashed_password
     session.add(current_user)
-    session.commit()
+    await session.commit()
+    invalidate_user(current_user.id)
     return Message(message="Password updated successfully")
 
 @router.get(
     path="/me",
     response_model=UserPublic
 )
-def read_user_me(current_user: CurrentUser) -> Any:
+async def read_user_me(current_user: CurrentUser) -> Any:
     """
     Get current user.
     """
@@ -109,7 +121,7 @@ def read_user_me(current_user: CurrentUser) -> Any:
     path="/me",
     response_model=Message
 )
-def delete_user_me(session: SessionDep, current_user: CurrentUser) -> Any:
+async def delete_user_me(session: SessionDep, current_user: FreshCurrentUser) -> Any:
     """
     Delete the current user
     """
@@ -118,35 +130,36 @@ def delete_user_me(session: SessionDep, current_user: CurrentUser) -> Any:
             status_code=403,
             detail="Superuser is not allowed to delete themself",
         )
-    session.delete(current_user)
-    session.commit()
+    await session.delete(current_user)
+    await session.commit()
+    invalidate_user(current_user.id)
     return Message(message="User Deleted Successfully")
 
 @router.post(
-    path="/signup"
+    path="/signup",
     response_model=UserPublic
 )
-def register_user(session: SessionDep, user_in: UserRegister) -> Any:
+async def register_user(session: SessionDep, user_in: UserRegister) -> Any:
     """
     Register a new user
     """
-    user = crud.get_user_by_email(session=session, email=user_in.email)
+    user = await crud.get_user_by_email(session=session, email=user_in.email)
     if user:
         raise HTTPException(
-            status_code=400. 
+            status_code=400,
             detail="The user with this email already exists",
         )
     user_create = UserCreate.model_validate(user_in)
-    user = crud.create_user(session=session, user_create=user_create)
+    user = await crud.create_user(session=session, user_create=user_create)
     return user
 
 @router.get(path="/{user_id}", response_model=UserPublic)
-def read_user_by_id(user_id: int, session: SessionDep, current_user: CurrentUser) -> Any:
+async def read_user_by_id(user_id: int, session: SessionDep, current_user: CurrentUser) -> Any:
     """
     Get a specific user by id
     """
-    user = session.get(User, user_id)
-    if user == current_user:
+    user = await session.get(User, user_id)
+    if user and user.id == current_user.id:
         return user
     if not current_user.is_superuser:
         raise HTTPException(
@@ -165,43 +178,42 @@ def read_user_by_id(user_id: int, session: SessionDep, current_user: CurrentUser
     dependencies=[Depends(get_current_active_superuser)],
     response_model=UserPublic,
 )
-def update_user(*, session: SessionDep, user_id: int, user_in: UserUpdate) -> Any:
+async def update_user(*, session: SessionDep, user_id: int, user_in: UserUpdate) -> Any:
     """
     Update a user.
     """
-    db_user = session.get(User, user_id)
+    db_user = await session.get(User, user_id)
     if not db_user:
         raise HTTPException(
             status_code=404,
             detail="The user with this id does not exist",
         )
     if user_in.email:
-        existing_user = crud.get_user_by_email(session=session, email=user_in.email)
+        existing_user = await crud.get_user_by_email(session=session, email=user_in.email)
         if existing_user and existing_user.id != user_id:
             raise HTTPException(
                 status_code=409, detail="User with this email already exists"
             )
 
-    db_user = crud.update_user(session=session, db_user=db_user, user_in=user_in)
+    db_user = await crud.update_user(session=session, db_user=db_user, user_in=user_in)
     return db_user
 
 
 @router.delete(path="/{user_id}", dependencies=[Depends(get_current_active_superuser)])
-def delete_user(
-    session: SessionDep, current_user: CurrentUser, user_id: uuid.UUID
+async def delete_user(
+    session: SessionDep, current_user: CurrentUser, user_id: int
 ) -> Message:
     """
     Delete a user.
     """
-    user = session.get(User, user_id)
+    user = await session.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    if user == current_user:
+    if user.id == current_user.id:
         raise HTTPException(
             status_code=403, detail="Super users are not allowed to delete themselves"
         )
-    statement = delete(Item).where(col(Item.owner_id) == user_id)
-    session.exec(statement)  # type: ignore
-    session.delete(user)
-    session.commit()
+    await session.delete(user)
+    await session.commit()
+    invalidate_user(user_id)
     return Message(message="User deleted successfully")
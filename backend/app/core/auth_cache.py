@@ -0,0 +1,24 @@
+from typing import Any
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.user import TokenPayload
+
+# Decoded JWT payloads by raw token
+token_cache: TTLCache[str, TokenPayload] = TTLCache(
+    maxsize=settings.AUTH_CACHE_MAX_ENTRIES, ttl=settings.AUTH_CACHE_TTL
+)
+# Column snapshots of active users by id. Invalidation is per process, so
+# AUTH_CACHE_TTL also bounds how stale another worker's copy can get.
+user_cache: TTLCache[int, dict[str, Any]] = TTLCache(
+    maxsize=settings.AUTH_CACHE_MAX_ENTRIES, ttl=settings.AUTH_CACHE_TTL
+)
+
+
+def invalidate_user(user_id: int | None) -> None:
+    if user_id is not None:
+        user_cache.pop(user_id)
+
+
+def auth_cache_stats() -> dict[str, dict[str, float]]:
+    return {"tokens": token_cache.stats(), "users": user_cache.stats()}
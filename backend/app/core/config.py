@@ -13,6 +13,7 @@ import os
 import secrets
 import warnings
 from pathlib import Path
+from sqlalchemy.engine import make_url
 
 def parse_cors(v: Any) -> list[str] | str:
     if isinstance(v, str) and not v.startswith("["):
@@ -35,6 +36,14 @@ class Settings(BaseSettings):
     SECRET_KEY: str = secrets.token_urlsafe(32)
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8  # 8 Days
     ENVIRONMENT: Literal["local", "staging", "production"] = "local"
+    AUTH_CACHE_TTL: int = 30  # seconds a decoded token / user snapshot is reused
+    AUTH_CACHE_MAX_ENTRIES: int = 10_000
+    # Argon2id cost parameters; existing hashes are rehashed on next login
+    ARGON2_TIME_COST: int = 3
+    ARGON2_MEMORY_COST: int = 65536  # KiB
+    ARGON2_PARALLELISM: int = 4
+    PASSWORD_HASH_WORKERS: int = os.cpu_count() or 2
+    PASSWORD_HASH_QUEUE_SIZE: int = 64  # hashes waiting beyond the running ones before 429
    
     # CORS Info
     FRONTEND_HOST: str = "http://localhost:5173"
@@ -76,6 +85,11 @@ class Settings(BaseSettings):
             path=self.POSTGRES_DB,
         )
     DATABASE_URL: Optional[str] = None
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 30
+    DB_POOL_TIMEOUT: int = 30  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # seconds; stay under server/proxy idle timeouts
+    DB_ECHO: bool = False  # log every statement; use the slow-query log instead outside debugging
     
     SMTP_TLS: bool = True
     SMTP_SSL: bool = False
@@ -123,12 +137,119 @@ class Settings(BaseSettings):
         
     # File Storage
     UPLOAD_DIR: Path = Path("./uploads")
-    MAX_FILE_SIZE: int = 1024 * 1024 * 10  # 10 MB
+    MAX_FILE_SIZE: int = 1024 * 1024 * 50  # 50 MB, uploads are streamed to disk
     ALLOWED_EXTENSIONS: List[str] = [".pdf", ".md", ".docx", ".txt"]
-    
+
+    # Vector Store
+    VECTOR_STORE_DIR: Path = Path("./vectorstore")
+    VECTOR_SEARCH_MODE: Literal["exact", "ivf"] = "exact"
+    VECTOR_IVF_MIN_VECTORS: int = 20_000  # below this, exact search is used anyway
+    VECTOR_IVF_NLIST: int = 256
+    VECTOR_IVF_NPROBE: int = 16
+
+    # Embeddings
+    EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_CACHE_PATH: Path = Path("./vectorstore/embedding_cache.sqlite3")
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 500_000
+    EMBEDDING_CACHE_MEMORY_ENTRIES: int = 20_000
+    HASHING_EMBEDDING_DIM: int = 384
+    INGEST_BATCH_SIZE: int = 64  # chunks embedded and written per transaction
+    OPENAI_API_KEY: str | None = None
+
+    # Retrieval
+    RAG_LATENCY_BUDGET_MS: int = 400  # shared by the full-text and vector branches
+    RAG_CANDIDATE_MULTIPLIER: int = 4  # each branch fetches top_k * this many candidates
+    RAG_RRF_K: int = 60
+    RAG_MAX_THREADS: int = 16
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_THRESHOLD: float = 0.95  # cosine similarity for a question to count as a repeat
+    ANSWER_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    ANSWER_CACHE_MAX_ENTRIES_PER_USER: int = 512
+
+    # Ingestion Worker
+    INGEST_WORKERS: int = os.cpu_count() or 2
+    INGEST_MAX_ATTEMPTS: int = 3
+    INGEST_PER_USER_CONCURRENCY: int = 2
+    INGEST_POLL_INTERVAL: float = 1.0  # seconds
+    INGEST_JOB_TIMEOUT: int = 60 * 30  # seconds before a running job is considered abandoned
+
+    # LLM
+    LLM_PROVIDER_OVERRIDE: str | None = None  # e.g. "fake" to answer every chat locally
+    LLM_REQUEST_TIMEOUT: float = 120.0  # seconds
+    OLLAMA_BASE_URL: str = "http://localhost:11434"
+    ANTHROPIC_API_KEY: str | None = None
+    GEMINI_API_KEY: str | None = None
+    HUGGINGFACE_API_KEY: str | None = None
+    LLM_CUSTOM_BASE_URL: str | None = None  # any OpenAI-compatible endpoint
+    LLM_CUSTOM_API_KEY: str | None = None
+    CHAT_HISTORY_MESSAGES: int = 20  # newest turns always kept verbatim
+    CHAT_SUMMARY_BATCH: int = 10  # older turns folded into the rolling summary this many at a time
+    CHAT_SUMMARY_MAX_TOKENS: int = 300
+    CHAT_CONTEXT_WINDOW_TOKENS: int = 8192  # model context; the reply's max_tokens is reserved from it
+
+    # Search
+    SEARCH_BRANCH_TIMEOUT_MS: int = 250  # per entity; a slower branch is dropped from the results
+    SEARCH_FILTER_FIRST_MAX_ROWS: int = 1000  # filters matching fewer rows skip the GIN index
+    SEARCH_PLAN_CACHE_TTL: int = 60  # seconds a filter's row estimate is reused
+    SEARCH_RANK_CANDIDATES: int = 5000  # newest matches ranked per entity; bounds latency for very common terms
+    SEARCH_RECENT_WINDOW_ROWS: int = 20_000  # notes a term expected to match more than SEARCH_RANK_CANDIDATES is matched among
+    SEARCH_HEADLINE_MAX_CHARS: int = 20_000  # ts_headline only reads this much of each hit
+
+    # Autocomplete
+    SUGGEST_CACHE_MAX_USERS: int = 512
+    SUGGEST_CACHE_TTL: int = 300  # seconds; picks up writes made by other processes
+    SUGGEST_SCAN_LIMIT: int = 256  # prefix matches considered for ranking
+    SUGGEST_FUZZY_MIN_LENGTH: int = 3  # shorter queries are matched exactly
+
+    # Knowledge Graph
+    GRAPH_CACHE_MAX_USERS: int = 256
+    GRAPH_CACHE_TTL: int = 300  # seconds; picks up writes made by other processes
+    GRAPH_MAX_NEIGHBORHOOD: int = 500  # nodes returned by a k-hop query
+    GRAPH_MAX_PATH_DEPTH: int = 12
+
+    # Auto-linking
+    AUTO_LINK_ENABLED: bool = True
+    AUTO_LINK_THRESHOLD: float = 0.8  # cosine similarity for proposing a related link
+    AUTO_LINK_MAX_PER_NOTE: int = 5
+    AUTO_LINK_INTERVAL: float = 60.0  # seconds between scans for edited notes
+    AUTO_LINK_FULL_RESCORE_FRACTION: float = 0.25  # above this share of edited notes, rescore everything
+    AUTO_LINK_BLOCK_ROWS: int = 512  # rows per similarity block; memory is rows * notes * 4 bytes
+
+    # Note History
+    NOTE_VERSION_SNAPSHOT_INTERVAL: int = 20  # full copy every N versions bounds reconstruction
+    NOTE_AUTOSAVE_WINDOW: int = 120  # seconds; edits by the same user within it extend one version
+
+    # Activity Log
+    ACTIVITY_LOG_BATCH_SIZE: int = 500  # buffered events that trigger a flush
+    ACTIVITY_LOG_FLUSH_INTERVAL: float = 2.0  # seconds; upper bound on how long an event waits
+    ACTIVITY_LOG_MAX_BUFFER: int = 50_000  # events kept while the database is unreachable
+    ACTIVITY_LOG_RETENTION_DAYS: int = 180  # older monthly partitions are dropped
+    ACTIVITY_LOG_PARTITIONS_AHEAD: int = 2  # months created in advance
+
+    # Access Tracking
+    ACCESS_TRACKING_FLUSH_INTERVAL: float = 30.0  # seconds; how stale last_accessed_at may be
+    ACCESS_TRACKING_MAX_PENDING: int = 100_000  # touched entities that trigger an early flush
+
+    # Folder Tree
+    FOLDER_TREE_CACHE_MAX_USERS: int = 1024
+    FOLDER_TREE_CACHE_TTL: int = 300  # seconds; picks up writes made by other processes
+
+    # Pagination
+    PAGINATION_COUNT_CACHE_TTL: int = 60  # seconds a cached list total is reused
+
     # Rate Limiting
     RATE_LIMIT_WINDOW: int = 60  # seconds
     RATE_LIMIT_MAX_REQUESTS: int = 100
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_STORE: Literal["memory", "postgres"] = "memory"  # postgres shares limits across workers
+    # Requests to these routes count as this many requests
+    RATE_LIMIT_CHAT_COST: int = 5
+    RATE_LIMIT_UPLOAD_COST: int = 10
+    RATE_LIMIT_SEARCH_COST: int = 2
+
+    # Monitoring
+    SLOW_QUERY_THRESHOLD_MS: int = 200  # statements slower than this are logged with their SQL
+    N_PLUS_ONE_THRESHOLD: int = 10  # one statement shape repeated this often in a request is logged
 
     # Logging
     LOG_LEVEL: str = "INFO"
@@ -141,9 +262,15 @@ class Settings(BaseSettings):
         else:
             return f"postgresql+psycopg2://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
 
+    def get_async_database_url(self) -> str:
+        if self.DATABASE_URL:
+            return make_url(self.DATABASE_URL).set(drivername="postgresql+psycopg").render_as_string(hide_password=False)
+        return str(self.SQLMODEL_DATABASE_URL)
+
 settings = Settings() # type: ignore
 
 # Create necessary directories
 os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+os.makedirs(settings.VECTOR_STORE_DIR, exist_ok=True)
 os.makedirs(settings.LOG_FILE.parent, exist_ok=True)
 
@@ -1,11 +1,31 @@
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlmodel import SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.core.config import settings
+from app.core.metrics import instrument_engine
 from app.models.user import User, UserSettings, UserCreate
 from app.models.document import Document, DocumentChunks
 from app.models.chat import ChatMessages, ChatSession
 from app.models.note import Notes, NoteFolders, NoteTags, NoteTagRelations, NoteTemplates, NoteCollaborators, NoteLinks
 
-engine = create_engine(settings.get_database_url(), echo=True)
+_pool_options = dict(
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+)
+
+# Sync engine for the ingestion worker and services that run outside the event loop
+engine = create_engine(settings.get_database_url(), echo=settings.DB_ECHO, **_pool_options)
+
+# Async engine used by the API request path
+async_engine = create_async_engine(settings.get_async_database_url(), **_pool_options)
+async_session_maker = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
     
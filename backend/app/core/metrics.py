@@ -0,0 +1,266 @@
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+# Literals and bind placeholders (psycopg %(name)s, asyncpg $n), so queries
+# differing only in their parameters have the same shape
+_SHAPE_RE = re.compile(r"%\(\w+\)s|\$\d+|'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SHAPE_LIST_RE = re.compile(r"\?(?:\s*,\s*\?)+")
+
+
+def statement_shape(statement: str) -> str:
+    shape = _SHAPE_RE.sub("?", statement)
+    # Expanded IN lists of any length collapse to one placeholder
+    return " ".join(_SHAPE_LIST_RE.sub("?", shape).split())
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram per label set, as Prometheus expects
+    """
+
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...]):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        # labels -> per-bucket counts (last slot is +Inf), sum
+        self._series: dict[tuple[tuple[str, str], ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        counts, total = self._series.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+        counts[bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(key, le=str(bound))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(key)} {total[0]:.6f}")
+            lines.append(f"{self.name}_count{_labels(key)} {cumulative}")
+        return lines
+
+
+class CounterMetric:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._series: Counter[tuple[tuple[str, str], ...]] = Counter()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        self._series[tuple(sorted(labels.items()))] += amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{_labels(key)} {value:g}" for key, value in sorted(self._series.items()))
+        return lines
+
+
+def _labels(key: tuple[tuple[str, str], ...], **extra: str) -> str:
+    pairs = [*key, *extra.items()]
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class MetricsRegistry:
+    """
+    Process-wide request and database metrics, rendered in the Prometheus
+    text exposition format. Each worker process keeps its own.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.request_seconds = Histogram(
+            "http_request_duration_seconds", "Request latency by route", LATENCY_BUCKETS
+        )
+        self.request_queries = Histogram(
+            "http_request_db_queries", "Database queries issued per request", QUERY_COUNT_BUCKETS
+        )
+        self.request_db_seconds = Histogram(
+            "http_request_db_seconds", "Time spent in the database per request", LATENCY_BUCKETS
+        )
+        self.n_plus_one = CounterMetric(
+            "http_request_n_plus_one_total", "Requests repeating one statement shape N_PLUS_ONE_THRESHOLD times"
+        )
+        self.queries = CounterMetric("db_queries_total", "Database queries, inside requests or not")
+        self.query_seconds = CounterMetric("db_query_seconds_total", "Time spent executing database queries")
+        self.slow_queries = CounterMetric("db_slow_queries_total", "Queries slower than SLOW_QUERY_THRESHOLD_MS")
+
+    def render(self) -> str:
+        with self.lock:
+            metrics = (
+                self.request_seconds, self.request_queries, self.request_db_seconds,
+                self.n_plus_one, self.queries, self.query_seconds, self.slow_queries,
+            )
+            return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+@dataclass
+class RequestStats:
+    """
+    Queries issued on behalf of one request, from any thread or task it
+    spawns. Threads only see it when started in a copy of the request's
+    context (``contextvars.copy_context().run``); ``asyncio.to_thread``
+    copies it already.
+    """
+
+    queries: int = 0
+    db_seconds: float = 0.0
+    shapes: Counter[str] = field(default_factory=Counter)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def add(self, queries: int, db_seconds: float, shapes: Counter[str]) -> None:
+        with self.lock:
+            self.queries += queries
+            self.db_seconds += db_seconds
+            self.shapes.update(shapes)
+
+
+_request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    A block issued more statements than its query budget allows
+    """
+
+
+@contextmanager
+def query_budget(max_queries: int) -> Iterator[RequestStats]:
+    """
+    Count the statements issued inside the block, including those of
+    requests it makes through a TestClient, and raise QueryBudgetExceeded if
+    there are more than ``max_queries``. Guards endpoints and loaders
+    against N+1 regressions:
+
+        with query_budget(3):
+            client.get("/api/v1/notes/", headers=headers)
+    """
+    stats = RequestStats()
+    token = _request_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _request_stats.reset(token)
+    with stats.lock:
+        if stats.queries > max_queries:
+            repeated = ", ".join(f"{count} x {shape[:200]}" for shape, count in stats.shapes.most_common(3))
+            raise QueryBudgetExceeded(f"{stats.queries} queries, budget {max_queries}: {repeated}")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = conn.info["query_started"].pop()
+    elapsed = time.perf_counter() - started
+    with metrics.lock:
+        metrics.queries.inc()
+        metrics.query_seconds.inc(elapsed)
+        if elapsed * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+            metrics.slow_queries.inc()
+    if elapsed * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+        logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, " ".join(statement.split())[:2000])
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.add(1, elapsed, Counter((statement_shape(statement),)))
+
+
+def _handle_error(exception_context) -> None:
+    # A failed statement never reaches after_cursor_execute
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Time every statement run through ``engine`` (for an async engine, pass
+    its ``sync_engine``)
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+class MetricsMiddleware:
+    """
+    Records latency, query count and database time per route, and flags
+    requests that repeat one statement shape (an N+1 pattern). Pure ASGI, so
+    it adds no task hop and streamed responses are timed to their end.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        # An enclosing query_budget still sees the request's queries
+        outer = _request_stats.get()
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_stats.reset(token)
+            if outer is not None:
+                with stats.lock:
+                    outer.add(stats.queries, stats.db_seconds, stats.shapes)
+            self._record(scope, status, elapsed, stats)
+
+    @staticmethod
+    def _record(scope: Scope, status: int, elapsed: float, stats: RequestStats) -> None:
+        # The route template, not the raw path, so ids do not explode the label space
+        route = getattr(scope.get("route"), "path", None) or "unmatched"
+        labels = {"method": scope["method"], "route": route}
+        # A retrieval branch that missed its budget may still be running
+        with stats.lock:
+            queries, db_seconds = stats.queries, stats.db_seconds
+            repeated = [(shape, count) for shape, count in stats.shapes.items() if count >= settings.N_PLUS_ONE_THRESHOLD]
+        with metrics.lock:
+            metrics.request_seconds.observe(elapsed, status=str(status), **labels)
+            metrics.request_queries.observe(queries, **labels)
+            metrics.request_db_seconds.observe(db_seconds, **labels)
+            if repeated:
+                metrics.n_plus_one.inc(**labels)
+        for shape, count in repeated:
+            logger.warning("Possible N+1 in %s %s: %d x %s", scope["method"], route, count, shape[:500])
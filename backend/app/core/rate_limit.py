@@ -0,0 +1,188 @@
+import json
+import math
+import re
+import threading
+import time
+from typing import Protocol
+
+import jwt
+from jwt.exceptions import InvalidTokenError
+from sqlalchemy import Column, Float, MetaData, String, Table, func, literal, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core import security
+from app.core.auth_cache import token_cache
+from app.core.config import settings
+
+
+class RateLimitStore(Protocol):
+    """
+    Keeps one theoretical arrival time (GCRA) per client key. ``acquire``
+    spends ``cost`` requests and returns 0 when allowed, otherwise the
+    seconds until it would be.
+    """
+
+    async def acquire(self, key: str, cost: int, interval: float, window: float) -> float: ...
+
+
+def _gcra(tat: float | None, now: float, cost: int, interval: float, window: float) -> tuple[float, float]:
+    # Each request pushes the arrival time ``interval`` further; a client may
+    # run at most ``window`` ahead of now, i.e. MAX_REQUESTS per window
+    new_tat = max(tat or now, now) + cost * interval
+    excess = new_tat - now - window
+    return new_tat, max(excess, 0.0)
+
+
+class MemoryRateLimitStore:
+    """
+    Per-process store: one float per active client. Limits are per uvicorn
+    worker, so N workers allow up to N times the configured rate.
+    """
+
+    def __init__(self, sweep_every: int = 10_000):
+        self._tats: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._sweep_every = sweep_every
+        self._calls = 0
+
+    async def acquire(self, key: str, cost: int, interval: float, window: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            new_tat, retry_after = _gcra(self._tats.get(key), now, cost, interval, window)
+            if not retry_after:
+                self._tats[key] = new_tat
+            self._calls += 1
+            if self._calls % self._sweep_every == 0:
+                # Clients whose arrival time has passed are back to a full allowance
+                self._tats = {k: tat for k, tat in self._tats.items() if tat > now}
+        return retry_after
+
+
+rate_limits_table = Table(
+    "rate_limits",
+    MetaData(),
+    Column("key", String(128), primary_key=True),
+    Column("tat", Float, nullable=False),
+    prefixes=["UNLOGGED"],
+)
+
+
+class PostgresRateLimitStore:
+    """
+    Shared store for several workers or hosts: one UNLOGGED row per client,
+    updated with a single conditional upsert on the database clock. Costs a
+    round trip per request; rows whose arrival time has passed are swept
+    every ``sweep_every`` calls.
+    """
+
+    def __init__(self, engine: AsyncEngine, sweep_every: int = 10_000):
+        self.engine = engine
+        self._created = False
+        self._sweep_every = sweep_every
+        self._calls = 0
+
+    async def acquire(self, key: str, cost: int, interval: float, window: float) -> float:
+        table = rate_limits_table
+        now = func.extract("epoch", func.clock_timestamp())
+        increment = literal(cost * interval)
+        arrival = func.greatest(table.c.tat, now) + increment
+        statement = (
+            insert(table)
+            .values(key=key, tat=now + increment)
+            .on_conflict_do_update(
+                index_elements=[table.c.key],
+                set_={"tat": arrival},
+                where=arrival - now <= window,
+            )
+            .returning(table.c.tat)
+        )
+        async with self.engine.begin() as connection:
+            if not self._created:
+                await connection.run_sync(table.metadata.create_all)
+                self._created = True
+            self._calls += 1
+            if self._calls % self._sweep_every == 0:
+                await connection.execute(table.delete().where(table.c.tat < now))
+            if (await connection.execute(statement)).first() is not None:
+                return 0.0
+            # Rejected: report when the client is allowed again
+            excess = select(func.greatest(table.c.tat, now) + increment - now - window).where(table.c.key == key)
+            return max(float((await connection.execute(excess)).scalar_one()), 0.0)
+
+
+def _route_costs() -> list[tuple[str, re.Pattern[str], int]]:
+    api = re.escape(settings.API_V1_STR)
+    return [
+        ("POST", re.compile(rf"^{api}/chat/sessions/[^/]+/messages/?$"), settings.RATE_LIMIT_CHAT_COST),
+        ("POST", re.compile(rf"^{api}/documents/?$"), settings.RATE_LIMIT_UPLOAD_COST),
+        ("GET", re.compile(rf"^{api}/search(/.*)?$"), settings.RATE_LIMIT_SEARCH_COST),
+    ]
+
+
+class RateLimitMiddleware:
+    """
+    Limits each client to RATE_LIMIT_MAX_REQUESTS per RATE_LIMIT_WINDOW,
+    with chat, upload and search requests counting as several. Clients are
+    keyed by user id when they send a valid bearer token, by IP otherwise.
+    Only API routes are limited.
+    """
+
+    def __init__(self, app: ASGIApp, store: RateLimitStore | None = None):
+        self.app = app
+        self.store = store or MemoryRateLimitStore()
+        self.costs = _route_costs()
+        self.window = float(settings.RATE_LIMIT_WINDOW)
+        self.interval = self.window / settings.RATE_LIMIT_MAX_REQUESTS
+
+    def _cost(self, method: str, path: str) -> int:
+        for cost_method, pattern, cost in self.costs:
+            if method == cost_method and pattern.match(path):
+                return cost
+        return 1
+
+    @staticmethod
+    def _client_key(scope: Scope) -> str:
+        for name, value in scope["headers"]:
+            if name == b"authorization" and value[:7].lower() == b"bearer ":
+                user_id = _token_subject(value[7:].decode("latin-1"))
+                if user_id is not None:
+                    return f"user:{user_id}"
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        path = scope.get("path", "")
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or not path.startswith(settings.API_V1_STR):
+            await self.app(scope, receive, send)
+            return
+        retry_after = await self.store.acquire(
+            self._client_key(scope), self._cost(scope["method"], path), self.interval, self.window
+        )
+        if not retry_after:
+            await self.app(scope, receive, send)
+            return
+        body = json.dumps({"detail": "Rate limit exceeded, retry later"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(math.ceil(retry_after)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def _token_subject(token: str) -> str | None:
+    # Shares the decoded-token cache with get_current_user; a bad token is
+    # limited by IP and rejected later by the route
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload.sub
+    try:
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[security.ALGORIGTM]).get("sub")
+    except InvalidTokenError:
+        return None
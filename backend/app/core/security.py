@@ -1,5 +1,8 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from typing import Any, Callable, TypeVar
 
 import jwt
 from pwdlib import PasswordHash
@@ -7,14 +10,35 @@ from pwdlib.hashers.argon2 import Argon2Hasher
 from pwdlib.hashers.bcrypt import BcryptHasher
 from app.core.config import settings
 
+T = TypeVar("T")
+
 password_hash = PasswordHash(
     (
-        Argon2Hasher(),
+        Argon2Hasher(
+            time_cost=settings.ARGON2_TIME_COST,
+            memory_cost=settings.ARGON2_MEMORY_COST,
+            parallelism=settings.ARGON2_PARALLELISM,
+        ),
         BcryptHasher(),
     )
 )
 ALGORIGTM = "HS256"
 
+# argon2-cffi releases the GIL while hashing, so threads use every core
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+_hash_slots = threading.BoundedSemaphore(
+    settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE_SIZE
+)
+
+
+class PasswordHashingBusyError(Exception):
+    """
+    Raised when the hashing queue is full; the API answers 429
+    """
+
+
 def create_access_token(subject: str | Any, expires_delta: timedelta) -> str:
     expire = datetime.now(timezone.utc) + expires_delta
     to_encode = {"exp": expire, "sub": str(subject)}
@@ -25,4 +49,24 @@ def verify_password(plain_password: str, hashed_password: str) -> tuple[bool, st
     return password_hash.verify_and_update(plain_password, hashed_password)
     
 def get_password_hash(password: str) -> str:
-    return password_hash.hash(password)
\ No newline at end of file
+    return password_hash.hash(password)
+
+async def _run_hashing(fn: Callable[..., T], *args: Any) -> T:
+    if not _hash_slots.acquire(blocking=False):
+        raise PasswordHashingBusyError("Too many password hashes in progress")
+    future = _hash_executor.submit(fn, *args)
+    # Released when the hash finishes, even if the request was cancelled meanwhile
+    future.add_done_callback(lambda _: _hash_slots.release())
+    return await asyncio.wrap_future(future)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """
+    verify_password on the hashing executor; raises PasswordHashingBusyError when saturated
+    """
+    return await _run_hashing(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    get_password_hash on the hashing executor; raises PasswordHashingBusyError when saturated
+    """
+    return await _run_hashing(get_password_hash, password)
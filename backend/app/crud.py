@@ -1,50 +1,54 @@
 from typing import Any
-from sqlmodel import Session, select
-from app.core.security import get_password_hash, verify_password
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.auth_cache import invalidate_user
+from app.core.security import get_password_hash, get_password_hash_async, verify_password_async
 from app.models.user import User, UserCreate, UserUpdate
 
-def create_user(*, session: Session, user_create: UserCreate) -> User:
+async def create_user(*, session: AsyncSession, user_create: UserCreate) -> User:
     db_obj = User.model_validate(
-        user_create, update={"hashed_password": get_password_hash(user_create.password)}
+        user_create, update={"hashed_password": await get_password_hash_async(user_create.password)}
     )
     session.add(db_obj)
-    session.commit()
-    session.refresh(db_obj)
+    await session.commit()
+    await session.refresh(db_obj)
     return db_obj
     
-def update_user(*, session: Session, db_user: User, user_in: UserUpdate) -> Any:
+async def update_user(*, session: AsyncSession, db_user: User, user_in: UserUpdate) -> Any:
     user_data = user_in.model_dump(exclude_unset=True)
     extra_data= {}
     if "password" in user_data:
         password = user_data["password"]
-        hashed_password = get_password_hash(password)
+        hashed_password = await get_password_hash_async(password)
         extra_data["hashed_password"] = hashed_password
     db_user.sqlmodel_update(user_data, update=extra_data)
     session.add(db_user)
-    session.commit()
-    session.refresh(db_user)
+    await session.commit()
+    invalidate_user(db_user.id)
+    await session.refresh(db_user)
     return db_user
     
-def get_user_by_email(*, session: Session, email: str) -> User | None:
+async def get_user_by_email(*, session: AsyncSession, email: str) -> User | None:
     statement = select(User).where(User.email==email)
-    session_user = session.exec(statement).first()
+    session_user = (await session.exec(statement)).first()
     return session_user
     
-DUMMY_HASH = "$argon2id$v=19$m=65536,t=3,p=4$MjQyZWE1MzBjYjJlZTI0Yw$YTU4NGM5ZTZmYjE2NzZlZjY0ZWY3ZGRkY2U2OWFjNjk"
+# Hashed with the configured Argon2 parameters so an unknown email costs the same as a wrong password
+DUMMY_HASH = get_password_hash("dummy-password-for-timing")
 
-def authenticate(*, session: Session, email: str, password: str) -> User | None:
-    db_user = get_user_by_email(session=session, email=email)
+async def authenticate(*, session: AsyncSession, email: str, password: str) -> User | None:
+    db_user = await get_user_by_email(session=session, email=email)
     if not db_user:
         # Prevent timing attack by running dummy hash when user doesn't exist
-        verify_password(password, DUMMY_HASH)
+        await verify_password_async(password, DUMMY_HASH)
         return None
-    verified, updated_password_hash = verify_password(password, db_user.hashed_password)
+    verified, updated_password_hash = await verify_password_async(password, db_user.hashed_password)
     if not verified:
         return None
     if updated_password_hash:
         db_user.hashed_password = updated_password_hash
         session.add(db_user)
-        session.commit()
-        session.refresh(db_user)
+        await session.commit()
+        await session.refresh(db_user)
     return db_user
     
\ No newline at end of file
@@ -1,30 +1,68 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from backend.app.config import settings
-from backend.app.database import create_db_and_tables
-from backend.app.api import auth, chat, documents, notes, search
+from fastapi.responses import JSONResponse
+from app.api.main import router as api_router
+from app.core.config import settings
+from app.core.database import async_engine, create_db_and_tables, engine
+from app.core.metrics import MetricsMiddleware
+from app.core.rate_limit import PostgresRateLimitStore, RateLimitMiddleware
+from app.core.security import PasswordHashingBusyError
+from app.services.access_service import access_tracker
+from app.services.activity_service import activity_log, maintain_partitions
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create database tables on startup
+    create_db_and_tables()
+    maintain_partitions()
+    activity_log.start()
+    access_tracker.start()
+    yield
+    # Write buffered activity and access times before the engines go away
+    activity_log.close()
+    access_tracker.close()
+    await async_engine.dispose()
+    engine.dispose()
 
 # Create FastAPI app
 app = FastAPI(
     title=settings.PROJECT_NAME,
     description=settings.PROJECT_DESCRIPTION,
     version=settings.VERSION,
-    debug=settings.DEBUG
+    debug=settings.DEBUG,
+    lifespan=lifespan,
 )
 
+# Per-client request budget, inside CORS so 429s stay readable cross-origin; the
+# postgres store shares it across workers
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(
+        RateLimitMiddleware,
+        store=PostgresRateLimitStore(async_engine) if settings.RATE_LIMIT_STORE == "postgres" else None,
+    )
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=settings.ALLOWED_ORIGINS,
+    allow_origins=settings.all_cors_origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
-# Create database tables on startup
-@app.on_event("startup")
-def on_startup():
-    create_db_and_tables()
+# Latency, query counts and N+1 detection per route, served at /admin/metrics
+app.add_middleware(MetricsMiddleware)
+
+# Shed login/signup load instead of queueing behind a burst of password hashes
+@app.exception_handler(PasswordHashingBusyError)
+async def password_hashing_busy_handler(request: Request, exc: PasswordHashingBusyError):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many authentication requests, retry shortly"},
+        headers={"Retry-After": "1"},
+    )
 
 # Root endpoint
 @app.get("/")
@@ -40,8 +78,4 @@ def read_root():
 def health_check():
     return {"status": "healthy"}
 
-# app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
-# app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
-# app.include_router(documents.router, prefix="/api/documents", tags=["documents"])
-# app.include_router(notes.router, prefix="/api/notes", tags=["notes"])
-# app.include_router(search.router, prefix="/api/search", tags=["search"])
+app.include_router(api_router, prefix=settings.API_V1_STR)
@@ -1,6 +1,6 @@
 from enum import Enum
 from sqlmodel import Column, Field, Index, SQLModel, Relationship
-from sqlalchemy import desc
+from sqlalchemy import desc, text
 from sqlalchemy.dialects.postgresql import JSONB
 from datetime import datetime, timezone
 from typing import TYPE_CHECKING
@@ -25,6 +25,9 @@ class ChatSession(TimestampMixin, SQLModel, table=True):
     is_archived: bool = Field(default=False)
     is_pinned: bool = Field(default=False)
     last_message_at: datetime = Field(default_factory=datetime.now)
+    # Rolling summary of every message created at or before summary_until
+    summary: str | None = Field(default=None)
+    summary_until: datetime | None = Field(default=None)
 
     # Relationships
     user: "User" = Relationship(back_populates="chat_sessions")
@@ -39,13 +42,14 @@ class ChatSession(TimestampMixin, SQLModel, table=True):
 
 class ChatRole(str, Enum):
     user ="user"
-    assistant = "asssistant"
+    assistant = "assistant"
     system = "system"
 
 class ChatMessages(TimestampMixin, SQLModel, table=True):
     __tablename__ = "chat_messages"
     __table_args__ = (
         Index("ix_chat_messages_session_created", "session_id", desc("created_at")),
+        Index("ix_chat_messages_search", text("to_tsvector('english', content)"), postgresql_using="gin"),
     )
     id: int | None = Field(default=None, primary_key=True)
     session_id: int | None = Field(foreign_key="chat_sessions.id", ondelete="CASCADE", nullable=False)
@@ -55,6 +59,7 @@ class ChatMessages(TimestampMixin, SQLModel, table=True):
     model_used: str | None = Field(default=None, max_length=100)
     tokens_used: int | None = Field(default=None)
     response_time_ms: int | None = Field(default=None)
+    time_to_first_token_ms: int | None = Field(default=None)
     rating: int | None = Field(default=None)
     feedback: str | None = Field(default=None)
 
@@ -1,6 +1,7 @@
 from sqlmodel import Index, SQLModel, Field, Column, Relationship, UniqueConstraint
 from enum import Enum
-from sqlalchemy import ARRAY, String, text
+from sqlalchemy import ARRAY, String, event, text
+from sqlalchemy.orm import Session
 from datetime import datetime
 from typing import TYPE_CHECKING
 from .chat import TimestampMixin
@@ -20,6 +21,7 @@ class Document(TimestampMixin, SQLModel, table=True):
     __table_args__ = (
         Index("ix_document_user_created", "user_id", "created_at"),
         Index("ix_documents_user_status", "user_id", "status"),
+        Index("ix_documents_ingest_queue", "created_at", postgresql_where=text("status = 'processing'")),
         Index("ix_document_search", text("to_tsvector('english', coalesce(title, '') || ' ' || coalesce(content, ''))"), postgresql_using="gin"),
         Index("ix_document_tags", "tags", postgresql_using="gin"),
         Index("ix_document_full_text", text("to_tsvector('english', coalesce(title, '') || ' ' || coalesce(content, '') || ' ' || coalesce(summary, ''))"), postgresql_using="gin"),
@@ -43,6 +45,7 @@ class Document(TimestampMixin, SQLModel, table=True):
     processing_started_at: datetime | None = Field(default=None)
     processing_completed_at: datetime | None = Field(default=None)
     processing_error: str | None = Field(default=None)
+    processing_attempts: int = Field(default=0)
     word_count: int | None = Field(default=None)
     page_count: int | None = Field(default=None)
     chunk_count: int = Field(default=0)
@@ -82,3 +85,26 @@ class DocumentChunks(TimestampMixin, SQLModel, table=True):
     
     # Relationships
     document: Document = Relationship(back_populates="chunks")
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_corpus_version(session: Session, flush_context) -> None:
+    """
+    Bump users.corpus_version for every user whose documents or chunks were
+    written in this flush, so answers cached against the old corpus are not reused.
+    """
+    user_ids, document_ids = set(), set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Document):
+            user_ids.add(obj.user_id)
+        elif isinstance(obj, DocumentChunks):
+            document_ids.add(obj.document_id)
+    if not user_ids and not document_ids:
+        return
+    session.execute(
+        text(
+            "UPDATE users SET corpus_version = corpus_version + 1 "
+            "WHERE id = ANY(:user_ids) OR id IN (SELECT user_id FROM documents WHERE id = ANY(:document_ids))"
+        ),
+        {"user_ids": list(user_ids), "document_ids": list(document_ids)},
+    )
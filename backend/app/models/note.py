@@ -1,6 +1,7 @@
-from sqlmodel import CheckConstraint, Field, Index, PrimaryKeyConstraint, SQLModel, Column, Relationship, UniqueConstraint, text, true
+from sqlmodel import CheckConstraint, Field, Index, PrimaryKeyConstraint, SQLModel, Column, Relationship, UniqueConstraint, text
 from enum import Enum
-from sqlalchemy import ARRAY, String, desc
+from sqlalchemy import ARRAY, DDL, ForeignKey, Integer, LargeBinary, String, Table, desc, event
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from datetime import datetime, timezone
 from typing import TYPE_CHECKING, List, Optional
 from .chat import TimestampMixin
@@ -44,7 +45,7 @@ class NoteFolders(TimestampMixin, SQLModel, table=True):
         sa_relationship_kwargs={"cascade": "all, delete-orphan"}
     )
     notes: List["Notes"] = Relationship(back_populates="folder")
-    user_settings: List["UserSettings"] = Relationship()
+    user_settings: List["UserSettings"] = Relationship(sa_relationship_kwargs={"overlaps": "default_folder"})
 
 class NoteTagRelations(SQLModel, table=True):
     __tablename__ = "note_tag_relations"
@@ -58,10 +59,9 @@ class NoteTagRelations(SQLModel, table=True):
 class Notes(TimestampMixin, SQLModel, table=True):
     __tablename__ = "notes"
     __table_args__ = (
-        Index("ix_notes_favorite", "user_id", "updated_at", desc("updated_at"), postgresql_where=true()),
-        Index("ix_notes_archived", "user_id", "updated_at", desc("updated_at"), postgresql_where=true()),
-        Index("ix_notes_search", text("to_tsvector('english', coalesce(title, '') || ' ' || coalesce(content, ''))"), postgresql_using="gin"),
-        Index("ix_notes_full_search", text("to_tsvector('english', coalesce(title, '') || ' ' || coalesce(content, '') || ' ' || coalesce(summary, ''))"), postgresql_using="gin"),
+        Index("ix_notes_user_created", "user_id", desc("created_at"), desc("id")),
+        Index("ix_notes_favorite", "user_id", desc("updated_at"), postgresql_where=text("is_favorite = true")),
+        Index("ix_notes_archived", "user_id", desc("updated_at"), postgresql_where=text("is_archived = true")),
     )
     id: int | None = Field(default=None, primary_key=True)
     user_id: int | None = Field(foreign_key="users.id", ondelete="CASCADE", nullable=False)
@@ -81,6 +81,7 @@ class Notes(TimestampMixin, SQLModel, table=True):
     linked_document_id: int | None = Field(default=None, foreign_key="documents.id", ondelete="SET NULL", index=True)
     linked_chat_session_id: int | None = Field(default=None, foreign_key="chat_sessions.id", ondelete="SET NULL", index=True)
     parent_note_id: int | None = Field(default=None, foreign_key="notes.id", ondelete="SET NULL")
+    # Latest entry in note_versions; previous_version_id is no longer written
     version: int = Field(default=1)
     previous_version_id: int | None = Field(default=None, foreign_key="notes.id", ondelete="SET NULL")
     is_public: bool = Field(default=False)
@@ -93,9 +94,14 @@ class Notes(TimestampMixin, SQLModel, table=True):
     read_time_minutes: int | None = Field(default=None)
     last_accessed_at: datetime = Field(default_factory=datetime.now)
     last_edited_at: datetime = Field(default_factory=datetime.now)
+    # Set by the auto-linking job; the note is re-embedded once last_edited_at passes it
+    embedded_at: datetime | None = Field(default=None)
     
     # Relationships
-    user: "User" = Relationship(back_populates="notes")
+    user: "User" = Relationship(
+        back_populates="notes",
+        sa_relationship_kwargs={"foreign_keys": "[Notes.user_id]"}
+    )
     folder: NoteFolders | None = Relationship(back_populates="notes")
     linked_document: Optional["Document"] | None = Relationship(
         back_populates="linked_notes", 
@@ -111,7 +117,7 @@ class Notes(TimestampMixin, SQLModel, table=True):
     )
     child_notes: list["Notes"] = Relationship(
         back_populates="parent_note",
-        sa_relationship_kwargs={"cascade": "all, delete-orphan"}
+        sa_relationship_kwargs={"cascade": "all, delete-orphan", "foreign_keys": "[Notes.parent_note_id]"}
     )
     previous_version: Optional["Notes"] | None = Relationship(
         sa_relationship_kwargs={"remote_side": "[Notes.id]", "foreign_keys": "[Notes.previous_version_id]"}
@@ -128,6 +134,57 @@ class Notes(TimestampMixin, SQLModel, table=True):
         sa_relationship_kwargs={"foreign_keys": "[NoteLinks.target_note_id]"}
     )
 
+# Search vectors, title weighted above body, live in their own table
+# rather than on notes. A vector is about twice the size of a typical note
+# row, and every non-HOT note update (moving, archiving, deleting) copied it
+# and re-inserted it into the GIN index. The trigger below rewrites a
+# vector only when a statement sets title, content or summary, and keeps
+# rows for live notes only, so search never has to read notes to drop
+# deleted ones.
+note_search = Table(
+    "note_search",
+    SQLModel.metadata,
+    Column("note_id", Integer, ForeignKey("notes.id", ondelete="CASCADE"), primary_key=True),
+    Column("user_id", Integer, nullable=False),
+    Column("search_vector", TSVECTOR, nullable=False),
+)
+Index("ix_note_search_vector", note_search.c.search_vector, postgresql_using="gin")
+# Newest first, for terms too common for the GIN index to pay off
+Index("ix_note_search_user_note", note_search.c.user_id, note_search.c.note_id.desc())
+
+event.listen(note_search, "after_create", DDL("""
+CREATE OR REPLACE FUNCTION note_search_refresh() RETURNS trigger AS $$
+BEGIN
+    IF NEW.is_deleted THEN
+        DELETE FROM note_search WHERE note_id = NEW.id;
+    ELSE
+        INSERT INTO note_search (note_id, user_id, search_vector)
+        VALUES (
+            NEW.id, NEW.user_id,
+            setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(NEW.content, '') || ' ' || coalesce(NEW.summary, '')), 'B')
+        )
+        ON CONFLICT (note_id) DO UPDATE SET search_vector = EXCLUDED.search_vector;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""))
+event.listen(note_search, "after_create", DDL(
+    "CREATE TRIGGER note_search_refresh AFTER INSERT OR UPDATE OF title, content, summary, is_deleted ON notes "
+    "FOR EACH ROW EXECUTE FUNCTION note_search_refresh()"
+))
+# Vectors of the notes written before note_search existed
+event.listen(note_search, "after_create", DDL("""
+INSERT INTO note_search (note_id, user_id, search_vector)
+SELECT id, user_id,
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(content, '') || ' ' || coalesce(summary, '')), 'B')
+FROM notes
+WHERE NOT is_deleted
+ON CONFLICT DO NOTHING
+"""))
+
 class NoteTags(SQLModel, table=True):
     __tablename__ = "note_tags"
     __table_args__ = (
@@ -208,6 +265,9 @@ class NoteLinks(SQLModel, table=True):
     target_note_id: int | None = Field(foreign_key="notes.id", ondelete="CASCADE", nullable=False)
     link_type: NoteLinkType = Field(default=NoteLinkType.related)
     description: str | None = Field(default=None)
+    # Proposed by the auto-linking job rather than created by the user
+    is_auto: bool = Field(default=False)
+    similarity: float | None = Field(default=None)
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     
     # Relationships
@@ -218,4 +278,26 @@ class NoteLinks(SQLModel, table=True):
     target_note: Notes = Relationship(
         back_populates="target_links",
         sa_relationship_kwargs={"foreign_keys": "[NoteLinks.target_note_id]"}
-    )
\ No newline at end of file
+    )
+
+class NoteVersions(SQLModel, table=True):
+    """
+    One entry of a note's history. Every NOTE_VERSION_SNAPSHOT_INTERVAL
+    versions the full content is stored; the versions in between hold a
+    compressed line diff against the version before them.
+    """
+    __tablename__ = "note_versions"
+    __table_args__ = (
+        UniqueConstraint("note_id", "version", name="uix_note_versions_note_version"),
+    )
+    id: int | None = Field(default=None, primary_key=True)
+    note_id: int = Field(foreign_key="notes.id", ondelete="CASCADE", nullable=False)
+    version: int = Field(nullable=False)
+    is_snapshot: bool = Field(default=False)
+    payload: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    title: str = Field(nullable=False, max_length=500)
+    char_count: int = Field(default=0)
+    edited_by: int | None = Field(default=None, foreign_key="users.id", ondelete="SET NULL")
+    created_at: datetime = Field(default_factory=datetime.now)
+    # Moves forward while autosaves are coalesced into this version
+    updated_at: datetime = Field(default_factory=datetime.now)
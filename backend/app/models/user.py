@@ -54,6 +54,8 @@ class User(TimestampMixin, UserBase, SQLModel, table=True):
     is_verified: bool = Field(default=False)
     is_deleted: bool = Field(default=False)
     last_login_at: datetime | None = Field(default=None)
+    # Bumped whenever the user's documents or chunks change, see models.document
+    corpus_version: int = Field(default=0)
     
     # Relationships
     settings: "UserSettings" = Relationship(
@@ -62,7 +64,10 @@ class User(TimestampMixin, UserBase, SQLModel, table=True):
         "uselist": False,
         "cascade": "all, delete-orphan"
     })
-    notes: list["Notes"] = Relationship(back_populates="user")
+    notes: list["Notes"] = Relationship(
+        back_populates="user",
+        sa_relationship_kwargs={"foreign_keys": "[Notes.user_id]"}
+    )
     folders: list["NoteFolders"] = Relationship(back_populates="user")
     tags: list["NoteTags"] = Relationship(back_populates="user")
     templates: list["NoteTemplates"] = Relationship(back_populates="user")
@@ -77,7 +82,8 @@ class UserPublic(UserBase):
     
 class UsersPublic(SQLModel):
     data: list[UserPublic]
-    count: int
+    count: int | None = None
+    next_cursor: str | None = None
 
 class UserTheme(str, Enum):
     light = "light"
@@ -128,7 +134,6 @@ class UserSettings(TimestampMixin, SQLModel, table=True):
     default_folder: Optional["NoteFolders"] = Relationship(
         sa_relationship_kwargs={
             "foreign_keys": "[UserSettings.default_note_folder_id]",
-            "cascade": "all, delete-orphan"
         }
     )
 
@@ -145,13 +150,19 @@ class ActivityAction(str, Enum):
     shared = "shared"
 
 class ActivityLogs(SQLModel, table=True):
+    """
+    Range-partitioned by month on created_at, so retention drops whole
+    partitions. Written in batches by app.services.activity_service.
+    """
     __tablename__ = "activitylogs"
     __table_args__ = (
         Index("ix_activity_logs_user_created", "user_id", desc("created_at")),
-        Index("ix_activity_logs_entity", "entity_type", "entity_id")
+        Index("ix_activity_logs_entity", "entity_type", "entity_id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
     
-    id: int | None = Field(primary_key=True, default=None)
+    # The partition key has to be part of the primary key
+    id: int | None = Field(primary_key=True, default=None, sa_column_kwargs={"autoincrement": True})
     user_id: int | None = Field(foreign_key="users.id", ondelete="CASCADE", nullable=False)
     action: ActivityAction = Field(nullable=False)
     entity_type: EntityType = Field(nullable=False, max_length=50)
@@ -159,7 +170,7 @@ class ActivityLogs(SQLModel, table=True):
     details: dict | None = Field(default=None, sa_column=Column(JSONB))
     ip_address: str | None = Field(default=None)  # Store as string for INET type
     user_agent: str | None = Field(default=None)
-    created_at: datetime = Field(default_factory=datetime.now)
+    created_at: datetime = Field(default_factory=datetime.now, primary_key=True)
     
     # Relationships
     user: User = Relationship(back_populates="activity_logs")
@@ -0,0 +1,42 @@
+from datetime import datetime
+
+from sqlmodel import Field, SQLModel
+
+from app.models.chat import ChatRole
+
+
+class ChatSessionCreate(SQLModel):
+    title: str | None = Field(default=None, max_length=255)
+    description: str | None = None
+
+
+class ChatSessionPublic(SQLModel):
+    id: int
+    title: str | None = None
+    description: str | None = None
+    is_archived: bool
+    is_pinned: bool
+    last_message_at: datetime
+    created_at: datetime
+
+
+class ChatSessionsPublic(SQLModel):
+    data: list[ChatSessionPublic]
+    next_cursor: str | None = None
+
+
+class ChatMessageCreate(SQLModel):
+    content: str = Field(min_length=1, max_length=20_000)
+
+
+class ChatMessagePublic(SQLModel):
+    id: int
+    session_id: int
+    role: ChatRole
+    content: str
+    sources: dict | None = None
+    model_used: str | None = None
+    tokens_used: int | None = None
+    response_time_ms: int | None = None
+    time_to_first_token_ms: int | None = None
+    created_at: datetime
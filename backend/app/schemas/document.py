@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from sqlmodel import SQLModel
+
+
+class DocumentPublic(SQLModel):
+    id: int
+    title: str
+    file_name: str
+    file_size: int
+    file_type: str
+    mime_type: str
+    status: str
+    tags: list[str] = []
+    page_count: int | None = None
+    chunk_count: int = 0
+    created_at: datetime | None = None
+
+
+class DocumentJobStatus(SQLModel):
+    document_id: int
+    status: str
+    queued: bool
+    attempts: int
+    processing_error: str | None = None
+    processing_started_at: datetime | None = None
+    processing_completed_at: datetime | None = None
+    page_count: int | None = None
+    chunk_count: int = 0
@@ -0,0 +1,30 @@
+from sqlmodel import SQLModel
+
+
+class FolderNode(SQLModel):
+    id: int
+    parent_folder_id: int | None
+    name: str
+    depth: int
+    path: list[int]
+    sort_order: int
+    is_archived: bool
+    note_count: int
+    total_note_count: int
+
+
+class FolderTreePublic(SQLModel):
+    data: list[FolderNode]
+
+
+class FolderMove(SQLModel):
+    parent_folder_id: int | None = None
+
+
+class FolderArchive(SQLModel):
+    archived: bool = True
+
+
+class FolderSubtreeResult(SQLModel):
+    folders: int
+    notes: int
@@ -0,0 +1,27 @@
+from sqlmodel import SQLModel
+
+
+class GraphNode(SQLModel):
+    id: str
+    kind: str
+    ref_id: int
+    label: str
+    component: int | None = None
+    degree: int | None = None
+    distance: int | None = None
+
+
+class GraphEdge(SQLModel):
+    source: str
+    target: str
+    type: str
+
+
+class GraphPublic(SQLModel):
+    nodes: list[GraphNode]
+    edges: list[GraphEdge]
+
+
+class GraphPath(SQLModel):
+    found: bool
+    nodes: list[GraphNode] = []
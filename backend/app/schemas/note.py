@@ -0,0 +1,134 @@
+from datetime import datetime
+from typing import Literal
+
+from sqlmodel import Field, SQLModel
+
+
+class NoteUpdate(SQLModel):
+    title: str | None = Field(default=None, min_length=1, max_length=500)
+    content: str | None = None
+
+
+class NotePublic(SQLModel):
+    id: int
+    folder_id: int | None = None
+    title: str
+    content: str
+    version: int
+    last_edited_at: datetime
+    created_at: datetime
+
+
+class NoteFolderRef(SQLModel):
+    id: int
+    name: str
+    color: str | None = None
+
+
+class NoteTagRef(SQLModel):
+    id: int
+    name: str
+    color: str | None = None
+
+
+class NoteListItem(SQLModel):
+    id: int
+    folder_id: int | None = None
+    title: str
+    content_preview: str | None = None
+    is_favorite: bool
+    is_pinned: bool
+    is_archived: bool
+    word_count: int | None = None
+    created_at: datetime
+    updated_at: datetime
+    folder: NoteFolderRef | None = None
+    tags: list[NoteTagRef] = []
+
+
+class NotesPublic(SQLModel):
+    data: list[NoteListItem]
+    next_cursor: str | None = None
+
+
+class LinkedRef(SQLModel):
+    id: int
+    title: str | None = None
+
+
+class NoteLinkPublic(SQLModel):
+    source_note_id: int
+    target_note_id: int
+    link_type: str
+    is_auto: bool
+
+
+class NoteCollaboratorPublic(SQLModel):
+    user_id: int
+    permission: str
+    accepted_at: datetime | None = None
+
+
+class NoteDetail(NotePublic):
+    summary: str | None = None
+    keywords: list[str] | None = None
+    is_favorite: bool
+    is_pinned: bool
+    is_archived: bool
+    word_count: int | None = None
+    updated_at: datetime
+    folder: NoteFolderRef | None = None
+    tags: list[NoteTagRef] = []
+    linked_document: LinkedRef | None = None
+    linked_chat_session: LinkedRef | None = None
+    source_links: list[NoteLinkPublic] = []
+    target_links: list[NoteLinkPublic] = []
+    collaborators: list[NoteCollaboratorPublic] = []
+
+
+class NoteVersionPublic(SQLModel):
+    version: int
+    title: str
+    char_count: int
+    is_snapshot: bool
+    edited_by: int | None = None
+    created_at: datetime
+    updated_at: datetime
+
+
+class NoteVersionsPublic(SQLModel):
+    data: list[NoteVersionPublic]
+
+
+class NoteVersionContent(NoteVersionPublic):
+    content: str
+
+
+# Bulk operations; ids that are missing or not the user's come back as not_found
+MAX_BULK_NOTES = 10_000
+
+
+class BulkNoteIds(SQLModel):
+    note_ids: list[int] = Field(min_length=1, max_length=MAX_BULK_NOTES)
+
+
+class BulkNoteMove(BulkNoteIds):
+    folder_id: int | None = None
+
+
+class BulkNoteTag(BulkNoteIds):
+    tag_ids: list[int] = Field(min_length=1, max_length=100)
+
+
+class BulkNoteArchive(BulkNoteIds):
+    archived: bool = True
+
+
+class BulkNoteOutcome(SQLModel):
+    id: int
+    status: Literal["updated", "unchanged", "not_found"]
+
+
+class BulkNoteResults(SQLModel):
+    data: list[BulkNoteOutcome]
+    updated: int
@@ -0,0 +1,50 @@
+from datetime import datetime
+from typing import Literal
+
+from sqlmodel import SQLModel
+
+SearchEntity = Literal["note", "document", "chat"]
+
+
+class SearchHit(SQLModel):
+    type: SearchEntity
+    # Note, document or chat session id
+    id: int
+    title: str
+    # HTML-escaped; matched terms are wrapped in <mark>
+    snippet: str
+    score: float
+    updated_at: datetime | None = None
+    page_number: int | None = None
+    message_id: int | None = None
+
+
+class SearchBranchPlan(SQLModel):
+    entity: SearchEntity
+    strategy: Literal["text_index", "filter_first", "recent_window"]
+    index: str
+    estimated_rows: int | None = None
+    # Matches ranked; when truncated, only the newest SEARCH_RANK_CANDIDATES
+    # were, or (recent_window) only matches among the newest notes
+    ranked_candidates: int | None = None
+    truncated: bool = False
+
+
+class SearchResults(SQLModel):
+    hits: list[SearchHit]
+    plan: list[SearchBranchPlan]
+    # Entities that timed out or failed and are missing from the hits
+    degraded: list[SearchEntity] = []
+    elapsed_ms: float = 0.0
+
+
+class Suggestion(SQLModel):
+    type: Literal["note", "tag", "document"]
+    id: int
+    label: str
+    # Matched with one typo
+    fuzzy: bool = False
+
+
+class SuggestionsPublic(SQLModel):
+    data: list[Suggestion]
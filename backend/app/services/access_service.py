@@ -0,0 +1,118 @@
+import logging
+import threading
+from datetime import datetime
+
+from sqlalchemy import DateTime, Engine, Integer, column, update, values
+
+from app.core.config import settings
+from app.core.database import engine
+from app.models.document import Document
+from app.models.note import Notes
+
+logger = logging.getLogger(__name__)
+
+# Touchable timestamps: (model, column name)
+_TRACKED = {
+    ("note", "accessed"): (Notes, "last_accessed_at"),
+    ("note", "edited"): (Notes, "last_edited_at"),
+    ("document", "accessed"): (Document, "last_accessed_at"),
+}
+# Rows per UPDATE statement
+_FLUSH_CHUNK = 5000
+
+
+class AccessTracker:
+    """
+    Coalesces last_accessed_at / last_edited_at touches in memory: repeat
+    touches of an entity only keep the latest time. A background thread
+    writes them every ACCESS_TRACKING_FLUSH_INTERVAL seconds (the bound on
+    how stale the columns get) with one ``UPDATE ... FROM (VALUES ...)`` per
+    column, and on ``close``.
+    """
+
+    def __init__(self, bind: Engine | None = None):
+        self.bind = bind or engine
+        self._pending: dict[tuple[str, str], dict[int, datetime]] = {key: {} for key in _TRACKED}
+        self._condition = threading.Condition()
+        self._closing = False
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._closing = False
+            self._thread = threading.Thread(target=self._run, name="access-tracker", daemon=True)
+            self._thread.start()
+
+    def close(self) -> None:
+        with self._condition:
+            self._closing = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def touch(self, kind: str, entity_id: int, edited: bool = False, at: datetime | None = None) -> None:
+        """
+        Record an access (or edit) of a note or document; cheap enough for
+        every read
+        """
+        at = at or datetime.now()
+        with self._condition:
+            pending = self._pending[(kind, "edited" if edited else "accessed")]
+            if pending.get(entity_id, at) <= at:
+                pending[entity_id] = at
+            if sum(map(len, self._pending.values())) >= settings.ACCESS_TRACKING_MAX_PENDING:
+                self._condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                if not self._closing:
+                    self._condition.wait(settings.ACCESS_TRACKING_FLUSH_INTERVAL)
+                if self._closing:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to write access times; retrying on the next flush")
+
+    def flush(self) -> int:
+        with self._condition:
+            batches, self._pending = self._pending, {key: {} for key in _TRACKED}
+        written = 0
+        try:
+            for key, touched in batches.items():
+                # Id order, so concurrent flushers lock rows in the same order
+                rows = sorted(touched.items())
+                for start in range(0, len(rows), _FLUSH_CHUNK):
+                    chunk = rows[start:start + _FLUSH_CHUNK]
+                    self._write(key, chunk)
+                    for entity_id, _ in chunk:
+                        del touched[entity_id]
+                    written += len(chunk)
+        except Exception:
+            # Merge what was not written back into the new batch
+            with self._condition:
+                for key, touched in batches.items():
+                    pending = self._pending[key]
+                    for entity_id, at in touched.items():
+                        if pending.get(entity_id, at) <= at:
+                            pending[entity_id] = at
+            raise
+        return written
+
+    def _write(self, key: tuple[str, str], rows: list[tuple[int, datetime]]) -> None:
+        model, name = _TRACKED[key]
+        target = getattr(model, name)
+        touched = values(column("id", Integer), column("at", DateTime), name="touched").data(rows)
+        statement = (
+            update(model)
+            .where(model.id == touched.c.id, target < touched.c.at)  # type: ignore
+            .values({name: touched.c.at})
+        )
+        with self.bind.begin() as connection:
+            connection.execute(statement)
+
+
+access_tracker = AccessTracker()
@@ -0,0 +1,197 @@
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any
+
+from sqlalchemy import Engine, insert, text
+
+from app.core.config import settings
+from app.core.database import engine
+from app.models.user import ActivityAction, ActivityLogs, EntityType
+
+logger = logging.getLogger(__name__)
+
+_TABLE = ActivityLogs.__tablename__
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _next_month(month: date) -> date:
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def _partition_name(month: date) -> str:
+    return f"{_TABLE}_{month:%Y_%m}"
+
+
+def is_partitioned(connection) -> bool:
+    # Databases created before partitioning keep a plain table until migrated
+    return connection.execute(
+        text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:table)"), {"table": _TABLE}
+    ).scalar() is True
+
+
+def ensure_partitions(connection, months: set[date]) -> None:
+    for month in sorted(months):
+        connection.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {_partition_name(month)} PARTITION OF {_TABLE} "
+            f"FOR VALUES FROM ('{month}') TO ('{_next_month(month)}')"
+        ))
+
+
+def drop_expired_partitions(connection, today: date | None = None) -> list[str]:
+    """
+    Drop monthly partitions that hold only rows older than
+    ACTIVITY_LOG_RETENTION_DAYS. A DROP is instant and leaves no dead rows,
+    unlike a DELETE over the same range.
+    """
+    cutoff = (today or date.today()) - timedelta(days=settings.ACTIVITY_LOG_RETENTION_DAYS)
+    rows = connection.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = to_regclass(:table)"
+    ), {"table": _TABLE}).scalars().all()
+    dropped = []
+    for name in rows:
+        try:
+            month = datetime.strptime(name.removeprefix(f"{_TABLE}_"), "%Y_%m").date()
+        except ValueError:
+            continue
+        if _next_month(month) <= cutoff:
+            connection.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            dropped.append(name)
+    return dropped
+
+
+def maintain_partitions(*, bind: Engine | None = None) -> list[str]:
+    """
+    Create the current and upcoming monthly partitions and drop expired
+    ones; returns the partitions dropped
+    """
+    with (bind or engine).begin() as connection:
+        if not is_partitioned(connection):
+            return []
+        month, months = _month_start(date.today()), set()
+        for _ in range(settings.ACTIVITY_LOG_PARTITIONS_AHEAD + 1):
+            months.add(month)
+            month = _next_month(month)
+        ensure_partitions(connection, months)
+        dropped = drop_expired_partitions(connection)
+    if dropped:
+        logger.info("Dropped expired activity log partitions: %s", ", ".join(dropped))
+    return dropped
+
+
+class ActivityLogWriter:
+    """
+    Buffers activity events in memory and writes them from a background
+    thread, one multi-row INSERT per ACTIVITY_LOG_BATCH_SIZE events, at
+    least every ACTIVITY_LOG_FLUSH_INTERVAL seconds and on ``close``.
+    ``log`` never touches the database, so request paths do not pay for
+    the write. Events still buffered when the process is killed are lost.
+    """
+
+    def __init__(self, bind: Engine | None = None):
+        self.bind = bind or engine
+        self._buffer: list[dict[str, Any]] = []
+        self._condition = threading.Condition()
+        self._closing = False
+        self._thread: threading.Thread | None = None
+        self._months: set[date] = set()
+        self._partitioned: bool | None = None
+        self.dropped = 0
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._closing = False
+            self._thread = threading.Thread(target=self._run, name="activity-log-writer", daemon=True)
+            self._thread.start()
+
+    def close(self) -> None:
+        """
+        Stop the flusher thread after writing everything still buffered
+        """
+        with self._condition:
+            self._closing = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def log(
+        self,
+        *,
+        user_id: int,
+        action: ActivityAction,
+        entity_type: EntityType,
+        entity_id: int,
+        details: dict | None = None,
+        ip_address: str | None = None,
+        user_agent: str | None = None,
+    ) -> None:
+        event = {
+            "user_id": user_id, "action": action, "entity_type": entity_type, "entity_id": entity_id,
+            "details": details, "ip_address": ip_address, "user_agent": user_agent, "created_at": datetime.now(),
+        }
+        with self._condition:
+            if len(self._buffer) >= settings.ACTIVITY_LOG_MAX_BUFFER:
+                # The database has been unreachable for a while: shed instead of growing without bound
+                self.dropped += 1
+                return
+            self._buffer.append(event)
+            if len(self._buffer) >= settings.ACTIVITY_LOG_BATCH_SIZE:
+                self._condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                if not self._closing and len(self._buffer) < settings.ACTIVITY_LOG_BATCH_SIZE:
+                    self._condition.wait(settings.ACTIVITY_LOG_FLUSH_INTERVAL)
+                if self._closing:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to write activity logs; retrying on the next flush")
+                with self._condition:
+                    if not self._closing:
+                        self._condition.wait(settings.ACTIVITY_LOG_FLUSH_INTERVAL)
+
+    def flush(self) -> int:
+        with self._condition:
+            events, self._buffer = self._buffer, []
+        if not events:
+            return 0
+        written = 0
+        try:
+            while written < len(events):
+                batch = events[written:written + settings.ACTIVITY_LOG_BATCH_SIZE]
+                self._write(batch)
+                written += len(batch)
+        except Exception:
+            unwritten = events[written:]
+            with self._condition:
+                # Put them back in front, within the buffer bound
+                room = max(settings.ACTIVITY_LOG_MAX_BUFFER - len(self._buffer), 0)
+                self.dropped += max(len(unwritten) - room, 0)
+                self._buffer[:0] = unwritten[:room]
+            raise
+        return written
+
+    def _write(self, events: list[dict[str, Any]]) -> None:
+        with self.bind.begin() as connection:
+            if self._partitioned is None:
+                self._partitioned = is_partitioned(connection)
+            months = {_month_start(event["created_at"].date()) for event in events} - self._months
+            if self._partitioned and months:
+                ensure_partitions(connection, months)
+            # A list of rows runs as batched multi-row INSERTs (insertmanyvalues)
+            connection.execute(insert(ActivityLogs.__table__), events)  # type: ignore
+        self._months |= months
+
+
+activity_log = ActivityLogWriter()
+
@@ -0,0 +1,335 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterator
+
+from sqlmodel import Session, col, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.ai.context import build_prompt, fold_into_summary
+from app.ai.llm import LLMClient, get_llm_client
+from app.ai.rag import (
+    CachedAnswer, RetrievalResult, answer_cache, answer_variant, embed_query, hybrid_search,
+)
+from app.core.config import settings
+from app.core.database import async_session_maker, engine
+from app.models.chat import ChatMessages, ChatRole, ChatSession
+from app.models.user import User, UserSettings
+from app.schemas.chat import ChatSessionCreate
+from app.utils.pagination import Page, fetch_page
+from app.utils.text_processing import count_tokens
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = (
+    "You are a personal knowledge assistant. Answer using the provided context "
+    "from the user's documents when it is relevant, and say so when it is not enough."
+)
+
+
+async def create_chat_session(
+    *, session: AsyncSession, user_id: int, chat_in: ChatSessionCreate
+) -> ChatSession:
+    chat_session = ChatSession.model_validate(chat_in, update={"user_id": user_id})
+    session.add(chat_session)
+    await session.commit()
+    await session.refresh(chat_session)
+    return chat_session
+
+
+async def get_chat_session(
+    *, session: AsyncSession, user_id: int, chat_session_id: int
+) -> ChatSession | None:
+    chat_session = await session.get(ChatSession, chat_session_id)
+    if not chat_session or chat_session.user_id != user_id:
+        return None
+    return chat_session
+
+
+async def list_chat_sessions(
+    *, session: AsyncSession, user_id: int, limit: int = 50, cursor: str | None = None
+) -> Page[ChatSession]:
+    # Keyset over ix_chat_session_user_last_message
+    return await fetch_page(
+        session,
+        select(ChatSession).where(ChatSession.user_id == user_id),
+        sort_column=ChatSession.last_message_at,
+        id_column=ChatSession.id,
+        limit=limit,
+        cursor=cursor,
+    )
+
+
+async def list_messages(
+    *, session: AsyncSession, chat_session_id: int, limit: int | None = None
+) -> list[ChatMessages]:
+    """
+    The newest ``limit`` messages of a session, oldest first
+    """
+    # Walks ix_chat_messages_session_created backwards, newest first
+    statement = (
+        select(ChatMessages)
+        .where(ChatMessages.session_id == chat_session_id)
+        .order_by(col(ChatMessages.created_at).desc())
+        .limit(limit or settings.CHAT_HISTORY_MESSAGES)
+    )
+    messages = list((await session.exec(statement)).all())
+    messages.reverse()
+    return messages
+
+
+async def load_unsummarized_messages(
+    *, session: AsyncSession, chat_session: ChatSession, limit: int | None = None
+) -> list[ChatMessages]:
+    """
+    The newest messages not yet folded into the session's summary, oldest first.
+    Bounded, so the read cost per turn does not grow with the session.
+    """
+    statement = select(ChatMessages).where(ChatMessages.session_id == chat_session.id)
+    if chat_session.summary_until is not None:
+        statement = statement.where(ChatMessages.created_at > chat_session.summary_until)
+    statement = statement.order_by(col(ChatMessages.created_at).desc()).limit(
+        limit or settings.CHAT_HISTORY_MESSAGES + settings.CHAT_SUMMARY_BATCH
+    )
+    messages = list((await session.exec(statement)).all())
+    messages.reverse()
+    return messages
+
+
+async def _fold_history(
+    session: AsyncSession, chat_session: ChatSession, client: LLMClient, model: str
+) -> None:
+    """
+    While more than CHAT_SUMMARY_BATCH messages have fallen out of the newest
+    CHAT_HISTORY_MESSAGES, fold the oldest CHAT_SUMMARY_BATCH of them into the
+    rolling summary, so none is skipped however far behind the summary is.
+    """
+    window, batch = settings.CHAT_HISTORY_MESSAGES, settings.CHAT_SUMMARY_BATCH
+    summary, until = chat_session.summary, chat_session.summary_until
+    while True:
+        # Oldest first through ix_chat_messages_session_created
+        statement = select(ChatMessages).where(ChatMessages.session_id == chat_session.id)
+        if until is not None:
+            statement = statement.where(ChatMessages.created_at > until)
+        folded = list((await session.exec(statement.order_by(col(ChatMessages.created_at)).limit(batch))).all())
+        if len(folded) < batch:
+            return
+        # Fold only if more than ``window`` messages stay after the batch
+        newer = await session.exec(
+            select(ChatMessages.id)
+            .where(ChatMessages.session_id == chat_session.id, ChatMessages.created_at > folded[-1].created_at)
+            .order_by(col(ChatMessages.created_at))
+            .offset(window)
+            .limit(1)
+        )
+        if newer.first() is None:
+            return
+        folded_summary = await fold_into_summary(summary, folded, client=client, model=model)
+        # Compare-and-set, so a concurrent turn that already folded these wins
+        result = await session.execute(
+            update(ChatSession)
+            .where(
+                col(ChatSession.id) == chat_session.id,
+                col(ChatSession.summary_until).is_not_distinct_from(until),
+            )
+            .values(summary=folded_summary, summary_until=folded[-1].created_at)
+        )
+        await session.commit()
+        if result.rowcount == 0:
+            return
+        summary, until = folded_summary, folded[-1].created_at
+
+
+def _retrieve(user_id: int, query: str, user_settings: UserSettings) -> RetrievalResult:
+    with Session(engine) as session:
+        return hybrid_search(session=session, user_id=user_id, query=query, user_settings=user_settings)
+
+
+def _sources(retrieved: RetrievalResult) -> dict:
+    return {
+        "chunks": [
+            {
+                "chunk_id": chunk.chunk_id,
+                "document_id": chunk.document_id,
+                "document_title": chunk.document_title,
+                "page_number": chunk.page_number,
+                "section_title": chunk.section_title,
+                "score": chunk.score,
+            }
+            for chunk in retrieved.chunks
+        ],
+        "degraded": retrieved.degraded,
+    }
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _lookup_cached_answer(
+    session: AsyncSession, user_id: int, user_settings: UserSettings, content: str, has_context: bool
+) -> tuple[CachedAnswer | None, tuple | None]:
+    """
+    Return a reusable answer, if any, and the key to store a fresh one under.
+    Only a session's opening question is cached: later turns ("tell me
+    more", "what about the second one?") depend on the conversation, which
+    the key does not capture.
+    """
+    if not settings.ANSWER_CACHE_ENABLED or has_context:
+        return None, None
+    try:
+        vector = await asyncio.to_thread(embed_query, user_settings.embedding_model, content)
+    except Exception as exc:
+        logger.warning("Answer cache skipped, question could not be embedded: %s", exc)
+        return None, None
+    corpus_version = (await session.exec(select(User.corpus_version).where(User.id == user_id))).one()
+    key = (vector, answer_variant(user_settings), corpus_version)
+    cached = answer_cache.lookup(user_id, vector, variant=key[1], corpus_version=corpus_version)
+    return cached, key
+
+
+async def _save_reply(
+    session: AsyncSession,
+    chat_session: ChatSession,
+    *,
+    content: str,
+    sources: dict,
+    model_used: str | None,
+    tokens_used: int,
+    started: float,
+    first_token_ms: int | None,
+) -> ChatMessages:
+    now = datetime.now(timezone.utc)
+    message = ChatMessages(
+        session_id=chat_session.id,
+        role=ChatRole.assistant,
+        content=content,
+        sources=sources,
+        model_used=model_used,
+        tokens_used=tokens_used,
+        response_time_ms=int((time.perf_counter() - started) * 1000),
+        time_to_first_token_ms=first_token_ms,
+        created_at=now,
+    )
+    session.add(message)
+    chat_session.last_message_at = now
+    await session.commit()
+    logger.info(
+        "Chat reply in session %s: ttft=%s ms total=%s ms tokens=%s",
+        chat_session.id, message.time_to_first_token_ms, message.response_time_ms, message.tokens_used,
+    )
+    return message
+
+
+def _done(message: ChatMessages, cached: bool) -> str:
+    return _sse("done", {
+        "message_id": message.id,
+        "cached": cached,
+        "tokens_used": message.tokens_used,
+        "response_time_ms": message.response_time_ms,
+        "time_to_first_token_ms": message.time_to_first_token_ms,
+    })
+
+
+async def stream_reply(*, user_id: int, chat_session_id: int, content: str) -> AsyncIterator[str]:
+    """
+    Answer ``content`` in a chat session as Server-Sent Events: one
+    ``sources`` event, a ``token`` event per generated delta, then ``done``
+    (or ``error``).
+
+    The user's message is stored before generation starts; the assistant's
+    reply, with its time-to-first-token and total latency, is stored in a
+    single write once the stream ends. A client that disconnects mid-stream
+    leaves no assistant message behind.
+
+    The prompt holds the session's rolling summary plus the messages after
+    it, packed into the context window left over by ``max_tokens``.
+
+    A near-duplicate of an earlier opening question over an unchanged
+    corpus is answered from the semantic answer cache without retrieval or
+    generation. Follow-up turns always go to the model.
+    """
+    started = time.perf_counter()
+    # Own session: the stream outlives the request's dependencies
+    async with async_session_maker() as session:
+        user_settings = await session.get(UserSettings, user_id) or UserSettings(user_id=user_id)
+        chat_session = await session.get(ChatSession, chat_session_id)
+        history = await load_unsummarized_messages(session=session, chat_session=chat_session)
+
+        now = datetime.now(timezone.utc)
+        session.add(ChatMessages(session_id=chat_session_id, role=ChatRole.user, content=content, created_at=now))
+        chat_session.last_message_at = now
+        await session.commit()
+
+        cached, cache_key = await _lookup_cached_answer(
+            session, user_id, user_settings, content, has_context=bool(history or chat_session.summary)
+        )
+        if cached is not None:
+            sources = {**cached.sources, "cached": True, "similarity": cached.similarity}
+            yield _sse("sources", sources)
+            yield _sse("token", {"text": cached.answer})
+            message = await _save_reply(
+                session, chat_session, content=cached.answer, sources=sources, model_used=cached.model_used,
+                tokens_used=0, started=started, first_token_ms=int((time.perf_counter() - started) * 1000),
+            )
+            yield _done(message, cached=True)
+            await _fold_history(session, chat_session, get_llm_client(user_settings.llm_provider), user_settings.llm_model)
+            return
+
+        retrieved = await asyncio.to_thread(_retrieve, user_id, content, user_settings)
+        sources = _sources(retrieved)
+        yield _sse("sources", sources)
+
+        client = get_llm_client(user_settings.llm_provider)
+        parts: list[str] = []
+        completion_tokens = None
+        first_token_ms = None
+        try:
+            async for delta in client.stream(
+                build_prompt(
+                    system_prompt=SYSTEM_PROMPT,
+                    question=content,
+                    summary=chat_session.summary,
+                    history=history,
+                    chunks=retrieved.chunks,
+                    # The reply's own tokens come out of the same context window
+                    budget=settings.CHAT_CONTEXT_WINDOW_TOKENS - user_settings.max_tokens,
+                ),
+                model=user_settings.llm_model,
+                temperature=user_settings.temperature,
+                max_tokens=user_settings.max_tokens,
+            ):
+                if delta.completion_tokens is not None:
+                    completion_tokens = delta.completion_tokens
+                if not delta.text:
+                    continue
+                if first_token_ms is None:
+                    first_token_ms = int((time.perf_counter() - started) * 1000)
+                parts.append(delta.text)
+                yield _sse("token", {"text": delta.text})
+        except Exception as exc:
+            logger.exception("LLM stream failed for chat session %s", chat_session_id)
+            yield _sse("error", {"detail": str(exc)})
+            return
+
+        answer = "".join(parts)
+        model_used = f"{client.provider}:{user_settings.llm_model}"
+        message = await _save_reply(
+            session, chat_session, content=answer, sources=sources, model_used=model_used,
+            tokens_used=completion_tokens if completion_tokens is not None else count_tokens(answer),
+            started=started, first_token_ms=first_token_ms,
+        )
+        if cache_key is not None and not retrieved.degraded:
+            # Stored under the version read before retrieval: if the corpus
+            # changed meanwhile, the entry is already stale and never served
+            vector, variant, corpus_version = cache_key
+            answer_cache.store(
+                user_id, vector,
+                CachedAnswer(question=content, answer=answer, sources=sources, model_used=model_used),
+                variant=variant, corpus_version=corpus_version,
+            )
+        yield _done(message, cached=False)
+        # After ``done``: summarising never delays the reply
+        await _fold_history(session, chat_session, client, user_settings.llm_model)
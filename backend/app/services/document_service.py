@@ -0,0 +1,302 @@
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import islice
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, TypeVar
+
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, col, delete, func, or_, select, update
+
+from app.ai.embeddings import get_batch_embedder
+from app.ai.vectorstore import get_vector_store
+from app.core.config import settings
+from app.core.database import engine
+from app.models.document import Document, DocumentChunks, DocumentStatus
+from app.models.user import UserSettings
+from app.utils.file_processing import get_file_type, get_mime_type, iter_pages, save_upload
+from app.utils.text_processing import TextChunk, iter_chunks
+
+T = TypeVar("T")
+
+
+def _batched(items: Iterable[T], size: int) -> Iterator[list[T]]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def get_user_settings(*, session: Session, user_id: int) -> UserSettings:
+    return session.get(UserSettings, user_id) or UserSettings(user_id=user_id)
+
+
+def create_document(
+    *, session: Session, user_id: int, file_name: str, source: BinaryIO, title: str | None = None
+) -> Document:
+    """
+    Stream the upload to disk and create its Document row in ``processing`` state.
+    """
+    file_type = get_file_type(file_name)
+    file_path, file_size = save_upload(source, file_name, user_id)
+    document = Document(
+        user_id=user_id,
+        title=title or Path(file_name).stem,
+        file_name=file_name,
+        file_path=str(file_path),
+        file_size=file_size,
+        file_type=file_type,
+        mime_type=get_mime_type(file_name),
+        status=DocumentStatus.processing,
+    )
+    session.add(document)
+    session.commit()
+    session.refresh(document)
+    return document
+
+
+@dataclass
+class _StoredChunk:
+    id: int
+    content_hash: str | None
+    vector_id: str
+    page_number: int | None
+    section_title: str | None
+
+
+def _load_stored_chunks(*, session: Session, document: Document) -> dict[int, _StoredChunk]:
+    # Only the columns needed for diffing, never the chunk text
+    rows = session.exec(
+        select(
+            DocumentChunks.chunk_index,
+            DocumentChunks.id,
+            DocumentChunks.content_hash,
+            DocumentChunks.vector_id,
+            DocumentChunks.page_number,
+            DocumentChunks.section_title,
+        ).where(DocumentChunks.document_id == document.id)
+    ).all()
+    return {row[0]: _StoredChunk(*row[1:]) for row in rows}
+
+
+def _delete_stored_chunks(*, session: Session, document: Document, stored: list[_StoredChunk]) -> None:
+    """
+    Delete chunk rows, then their vectors once the deletion is committed, so a
+    failed transaction never leaves a surviving row without its vector.
+    """
+    if not stored:
+        return
+    session.exec(delete(DocumentChunks).where(col(DocumentChunks.id).in_([chunk.id for chunk in stored])))  # type: ignore
+    session.commit()
+    get_vector_store().delete(document.user_id, [chunk.vector_id for chunk in stored])
+
+
+def _write_chunks(
+    *,
+    session: Session,
+    document: Document,
+    batch: list[TextChunk],
+    stored: dict[int, _StoredChunk],
+    embedder,
+) -> None:
+    """
+    Diff a batch of fresh chunks against the stored rows by
+    (chunk_index, content_hash). Matching rows stay in place, with only
+    page/section metadata updated if it moved; everything else is replaced
+    and re-embedded.
+    """
+    changed: list[TextChunk] = []
+    replaced: list[_StoredChunk] = []
+    for chunk in batch:
+        previous = stored.pop(chunk.chunk_index, None)
+        if previous is None or previous.content_hash != chunk.content_hash:
+            changed.append(chunk)
+            if previous is not None:
+                replaced.append(previous)
+        elif (previous.page_number, previous.section_title) != (chunk.page_number, chunk.section_title):
+            session.exec(
+                update(DocumentChunks)
+                .where(col(DocumentChunks.id) == previous.id)
+                .values(page_number=chunk.page_number, section_title=chunk.section_title)
+            )  # type: ignore
+
+    rows = []
+    if replaced:
+        # Same transaction as the replacements, and before they are flushed,
+        # since (document_id, chunk_index) is unique
+        session.exec(delete(DocumentChunks).where(col(DocumentChunks.id).in_([chunk.id for chunk in replaced])))  # type: ignore
+    if changed:
+        vectors = embedder.embed([chunk.content for chunk in changed], [chunk.content_hash for chunk in changed])
+        rows = [
+            DocumentChunks(
+                document_id=document.id,
+                chunk_index=chunk.chunk_index,
+                content=chunk.content,
+                content_hash=chunk.content_hash,
+                vector_id=uuid.uuid4().hex,
+                token_count=chunk.token_count,
+                char_count=chunk.char_count,
+                page_number=chunk.page_number,
+                section_title=chunk.section_title,
+            )
+            for chunk in changed
+        ]
+        get_vector_store().upsert(document.user_id, [row.vector_id for row in rows], vectors)
+        session.add_all(rows)
+    if document.content_preview is None:
+        document.content_preview = batch[0].content[:500]
+    document.chunk_count += len(batch)
+    session.add(document)
+    try:
+        session.commit()
+    except Exception:
+        # The rows naming the new vectors were not written: drop the vectors
+        # too, or they stay in the shard and a retry adds another set
+        if rows:
+            get_vector_store().delete(document.user_id, [row.vector_id for row in rows])
+        raise
+    if replaced:
+        get_vector_store().delete(document.user_id, [chunk.vector_id for chunk in replaced])
+    # Committed rows are not needed again; keep the identity map from growing
+    for row in rows:
+        session.expunge(row)
+
+
+def process_document(*, session: Session, document: Document) -> Document:
+    """
+    Ingest a stored upload as a pipeline of generators: pages are extracted
+    lazily, chunked as they arrive and embedded/written in batches of
+    ``INGEST_BATCH_SIZE``. Only one page and one batch are held in memory.
+
+    Re-processing a changed document is incremental: chunks whose
+    (chunk_index, content_hash) is unchanged are left alone, so only the
+    edited parts are rewritten and re-embedded.
+
+    Progress (``page_count``, ``chunk_count``) is committed with every batch.
+    """
+    user_settings = get_user_settings(session=session, user_id=document.user_id)
+    embedder = get_batch_embedder(user_settings.embedding_model)
+
+    stored = _load_stored_chunks(session=session, document=document)
+    document.status = DocumentStatus.processing
+    document.processing_started_at = datetime.now()
+    document.processing_completed_at = None
+    document.processing_error = None
+    document.content_preview = None
+    document.page_count = 0
+    document.chunk_count = 0
+    document.word_count = 0
+    session.add(document)
+    session.commit()
+
+    def pages() -> Iterator[tuple[int, str]]:
+        for page_number, text in iter_pages(document.file_path, document.file_type):
+            document.page_count = page_number
+            document.word_count += len(text.split())
+            yield page_number, text
+
+    try:
+        chunks = iter_chunks(pages(), user_settings.chunk_size, user_settings.chunk_overlap)
+        for batch in _batched(chunks, settings.INGEST_BATCH_SIZE):
+            _write_chunks(session=session, document=document, batch=batch, stored=stored, embedder=embedder)
+        # The document got shorter: drop the chunks past its new end
+        _delete_stored_chunks(session=session, document=document, stored=list(stored.values()))
+    except Exception as exc:
+        session.rollback()
+        document.status = DocumentStatus.failed
+        document.processing_error = str(exc)
+        document.processing_completed_at = datetime.now()
+        session.add(document)
+        session.commit()
+        session.refresh(document)
+        return document
+
+    document.status = DocumentStatus.completed
+    document.processing_completed_at = datetime.now()
+    session.add(document)
+    session.commit()
+    session.refresh(document)
+    return document
+
+
+def claim_next_document(*, session: Session) -> Document | None:
+    """
+    Claim the oldest queued document with ``SELECT ... FOR UPDATE SKIP LOCKED``.
+
+    A document is queued while ``status`` is ``processing`` and it has no
+    ``processing_started_at``; running jobs older than ``INGEST_JOB_TIMEOUT``
+    are treated as abandoned and become claimable again. Users who already
+    have ``INGEST_PER_USER_CONCURRENCY`` running jobs are skipped.
+    """
+    stale_before = datetime.now() - timedelta(seconds=settings.INGEST_JOB_TIMEOUT)
+    running = aliased(Document)
+    running_for_user = (
+        select(func.count())
+        .select_from(running)
+        .where(
+            running.user_id == Document.user_id,
+            running.status == DocumentStatus.processing,
+            running.processing_started_at >= stale_before,
+        )
+        .scalar_subquery()
+    )
+    statement = (
+        select(Document)
+        .where(
+            Document.status == DocumentStatus.processing,
+            or_(Document.processing_started_at == None, Document.processing_started_at < stale_before),  # noqa: E711
+            running_for_user < settings.INGEST_PER_USER_CONCURRENCY,
+        )
+        .order_by(Document.created_at)
+        .limit(1)
+        .with_for_update(skip_locked=True, of=Document)
+    )
+    while True:
+        document = session.exec(statement).first()
+        if document is None:
+            session.rollback()
+            return None
+        if document.processing_attempts >= settings.INGEST_MAX_ATTEMPTS:
+            # Its last worker died mid-job too many times
+            document.status = DocumentStatus.failed
+            document.processing_error = document.processing_error or "Processing was abandoned"
+            document.processing_completed_at = datetime.now()
+            session.add(document)
+            session.commit()
+            continue
+        document.processing_started_at = datetime.now()
+        document.processing_attempts += 1
+        session.add(document)
+        session.commit()
+        session.refresh(document)
+        return document
+
+
+def requeue_document(*, session: Session, document: Document) -> Document:
+    """
+    Put a failed document back in the queue, keeping its ``processing_error``.
+    """
+    document.status = DocumentStatus.processing
+    document.processing_started_at = None
+    document.processing_completed_at = None
+    session.add(document)
+    session.commit()
+    session.refresh(document)
+    return document
+
+
+def run_ingestion_job(document_id: int) -> str | None:
+    """
+    Entry point for worker processes: process one claimed document in its
+    own session and requeue it on failure while attempts remain.
+    """
+    with Session(engine) as session:
+        document = session.get(Document, document_id)
+        if document is None or document.status != DocumentStatus.processing:
+            return None
+        document = process_document(session=session, document=document)
+        if (
+            document.status == DocumentStatus.failed
+            and document.processing_attempts < settings.INGEST_MAX_ATTEMPTS
+        ):
+            document = requeue_document(session=session, document=document)
+        return document.status
@@ -0,0 +1,386 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any
+
+from sqlalchemy import event, func, inspect, literal
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import col, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.models.note import NoteFolders, Notes
+from app.schemas.folder import FolderNode
+from app.services.graph_service import graph_cache
+from app.services.suggest_service import suggest_cache
+
+
+class FolderMoveError(ValueError):
+    """
+    The new parent is missing, deleted, or inside the folder being moved
+    """
+
+
+class FolderTree:
+    """
+    One user's live folders as parent/children maps, with each folder's
+    materialised path (root first) and direct note count. Moves rewrite
+    the paths of the moved subtree only.
+    """
+
+    def __init__(self, rows: list[tuple[int, int | None, str, int, bool, int]]):
+        self.parent: dict[int, int | None] = {}
+        self.children: dict[int | None, list[int]] = {None: []}
+        self.info: dict[int, tuple[str, int, bool]] = {}
+        self.paths: dict[int, tuple[int, ...]] = {}
+        self.note_counts: dict[int, int] = {}
+        # Rows come parents first, so each parent's path is known
+        for folder_id, parent_id, name, sort_order, is_archived, note_count in rows:
+            self._attach(folder_id, parent_id)
+            self.info[folder_id] = (name, sort_order, is_archived)
+            self.note_counts[folder_id] = note_count
+            self.paths[folder_id] = self.paths.get(parent_id, ()) + (folder_id,)  # type: ignore[arg-type]
+        self.loaded_at = time.monotonic()
+
+    def __contains__(self, folder_id: int) -> bool:
+        return folder_id in self.parent
+
+    def _attach(self, folder_id: int, parent_id: int | None) -> None:
+        self.parent[folder_id] = parent_id
+        self.children.setdefault(parent_id, []).append(folder_id)
+        self.children.setdefault(folder_id, [])
+
+    def subtree(self, folder_id: int) -> list[int]:
+        found, stack = [], [folder_id]
+        while stack:
+            current = stack.pop()
+            found.append(current)
+            stack.extend(self.children.get(current, ()))
+        return found
+
+    def upsert(self, folder_id: int, parent_id: int | None, name: str, sort_order: int, is_archived: bool) -> bool:
+        """
+        Add, rename or move a folder. False when its new parent is not in the
+        tree, in which case the caller reloads it.
+        """
+        if parent_id is not None and (parent_id not in self or folder_id in self.paths.get(parent_id, ())):
+            return False
+        if folder_id not in self:
+            self._attach(folder_id, parent_id)
+            self.note_counts[folder_id] = 0
+        elif self.parent[folder_id] != parent_id:
+            self.children[self.parent[folder_id]].remove(folder_id)
+            self.parent[folder_id] = parent_id
+            self.children.setdefault(parent_id, []).append(folder_id)
+        self.info[folder_id] = (name, sort_order, is_archived)
+        base = self.paths[parent_id] if parent_id is not None else ()
+        if self.paths.get(folder_id) != base + (folder_id,):
+            # subtree() lists parents before their children
+            for member in self.subtree(folder_id):
+                parent_path = self.paths[self.parent[member]] if self.parent[member] is not None else ()  # type: ignore[index]
+                self.paths[member] = parent_path + (member,)
+        return True
+
+    def remove(self, folder_id: int) -> None:
+        if folder_id not in self:
+            return
+        self.children[self.parent[folder_id]].remove(folder_id)
+        for member in self.subtree(folder_id):
+            for mapping in (self.parent, self.info, self.paths, self.note_counts):
+                mapping.pop(member, None)
+            self.children.pop(member, None)
+
+    def add_notes(self, folder_id: int | None, delta: int) -> None:
+        if folder_id in self.note_counts:
+            self.note_counts[folder_id] += delta  # type: ignore[index]
+
+    def nodes(self, root: int | None = None) -> list[FolderNode]:
+        """
+        Folders under ``root`` (all when None) depth-first in display order,
+        with note totals that include subfolders
+        """
+        ordered: list[int] = []
+        stack = list(reversed(self._sorted(self.children.get(root, [])))) if root is None else [root]
+        while stack:
+            current = stack.pop()
+            ordered.append(current)
+            stack.extend(reversed(self._sorted(self.children.get(current, []))))
+        totals = dict(self.note_counts)
+        for folder_id in reversed(ordered):
+            parent_id = self.parent[folder_id]
+            if parent_id is not None and parent_id in totals and folder_id != root:
+                totals[parent_id] += totals[folder_id]
+        return [
+            FolderNode(
+                id=folder_id, parent_folder_id=self.parent[folder_id], name=self.info[folder_id][0],
+                sort_order=self.info[folder_id][1], is_archived=self.info[folder_id][2],
+                path=list(self.paths[folder_id]), depth=len(self.paths[folder_id]) - 1,
+                note_count=self.note_counts[folder_id], total_note_count=totals[folder_id],
+            )
+            for folder_id in ordered
+        ]
+
+    def _sorted(self, folder_ids: list[int]) -> list[int]:
+        return sorted(folder_ids, key=lambda folder_id: (self.info[folder_id][1], self.info[folder_id][0].casefold()))
+
+
+def _live_folder():
+    return col(NoteFolders.is_deleted).is_(False)
+
+
+async def load_folder_tree(*, session: AsyncSession, user_id: int) -> FolderTree:
+    """
+    The whole tree and its note counts in one query: a recursive CTE walks
+    down from the root folders, so folders under a deleted one are left out
+    """
+    columns = (
+        NoteFolders.id, NoteFolders.parent_folder_id, NoteFolders.name, NoteFolders.sort_order, NoteFolders.is_archived,
+    )
+    tree = (
+        select(*columns, literal(0).label("depth"))
+        .where(NoteFolders.user_id == user_id, col(NoteFolders.parent_folder_id).is_(None), _live_folder())
+        .cte("tree", recursive=True)
+    )
+    tree = tree.union_all(
+        select(*columns, tree.c.depth + 1)
+        .join(tree, col(NoteFolders.parent_folder_id) == tree.c.id)
+        .where(_live_folder())
+    )
+    counts = (
+        select(Notes.folder_id, func.count().label("note_count"))
+        .where(Notes.user_id == user_id, col(Notes.is_deleted).is_(False), col(Notes.folder_id).is_not(None))
+        .group_by(Notes.folder_id)
+        .subquery()
+    )
+    statement = (
+        select(
+            tree.c.id, tree.c.parent_folder_id, tree.c.name, tree.c.sort_order, tree.c.is_archived,
+            func.coalesce(counts.c.note_count, 0),
+        )
+        .outerjoin(counts, counts.c.folder_id == tree.c.id)
+        .order_by(tree.c.depth)
+    )
+    return FolderTree(list((await session.exec(statement)).all()))  # type: ignore
+
+
+class FolderTreeCache:
+    """
+    Folder trees of the most recently active users. The ORM hooks below
+    apply folder and note changes in place; the subtree operations in this
+    module, which are single Core statements, update or drop the entry
+    themselves. Entries are reloaded after FOLDER_TREE_CACHE_TTL so writes
+    from other processes show up.
+    """
+
+    def __init__(self, max_users: int | None = None, ttl: int | None = None):
+        self.max_users = max_users or settings.FOLDER_TREE_CACHE_MAX_USERS
+        self.ttl = ttl or settings.FOLDER_TREE_CACHE_TTL
+        self._trees: OrderedDict[int, FolderTree] = OrderedDict()
+        self.lock = threading.RLock()
+
+    async def get(self, *, session: AsyncSession, user_id: int) -> FolderTree:
+        with self.lock:
+            tree = self._trees.get(user_id)
+            if tree is not None and time.monotonic() - tree.loaded_at < self.ttl:
+                self._trees.move_to_end(user_id)
+                return tree
+        tree = await load_folder_tree(session=session, user_id=user_id)
+        with self.lock:
+            self._trees[user_id] = tree
+            self._trees.move_to_end(user_id)
+            while len(self._trees) > self.max_users:
+                self._trees.popitem(last=False)
+        return tree
+
+    def invalidate(self, user_id: int) -> None:
+        with self.lock:
+            self._trees.pop(user_id, None)
+
+    def apply(self, changes: list[tuple]) -> None:
+        with self.lock:
+            for kind, user_id, *args in changes:
+                tree = self._trees.get(user_id)
+                if tree is None:
+                    continue
+                if kind == "folder_upserted":
+                    if not tree.upsert(*args):
+                        self.invalidate(user_id)
+                elif kind == "folder_removed":
+                    tree.remove(args[0])
+                elif kind == "notes_moved":
+                    source, target, count = args
+                    tree.add_notes(source, -count)
+                    tree.add_notes(target, count)
+
+
+folder_tree_cache = FolderTreeCache()
+
+
+def _subtree(user_id: int, folder_id: int):
+    subtree = (
+        select(NoteFolders.id)
+        .where(NoteFolders.id == folder_id, NoteFolders.user_id == user_id, _live_folder())
+        .cte("subtree", recursive=True)
+    )
+    # UNION drops folders already reached, so the walk ends even on a cycle
+    return subtree.union(
+        select(NoteFolders.id).join(subtree, col(NoteFolders.parent_folder_id) == subtree.c.id).where(_live_folder())
+    )
+
+
+# Advisory lock namespace, so one user's folder moves run one at a time
+_FOLDER_MOVE_LOCK = 0x464F4C44
+
+
+async def move_folder(*, session: AsyncSession, user_id: int, folder_id: int, parent_id: int | None) -> bool:
+    """
+    Reparent a folder in one guarded UPDATE: the new parent must be a live
+    folder of the user outside the moved subtree. Returns False when the
+    folder itself does not exist.
+
+    Moves of the same user are serialised: two concurrent moves (a under b,
+    b under a) would each pass the guard against the other's snapshot and
+    together make a cycle. The lock is held until commit or rollback.
+    """
+    await session.exec(select(func.pg_advisory_xact_lock(_FOLDER_MOVE_LOCK, user_id)))
+    folder = await session.get(NoteFolders, folder_id)
+    if folder is None or folder.user_id != user_id or folder.is_deleted:
+        await session.rollback()
+        return False
+    statement = update(NoteFolders).where(NoteFolders.id == folder_id).values(
+        parent_folder_id=parent_id, updated_at=datetime.now(timezone.utc)
+    )
+    if parent_id is not None:
+        parent_is_valid = select(NoteFolders.id).where(
+            NoteFolders.id == parent_id, NoteFolders.user_id == user_id, _live_folder()
+        ).exists()
+        statement = statement.where(
+            parent_is_valid, literal(parent_id).not_in(select(_subtree(user_id, folder_id).c.id))
+        )
+    try:
+        moved = (await session.exec(statement.returning(NoteFolders.id))).first()  # type: ignore
+    except IntegrityError:
+        await session.rollback()
+        raise FolderMoveError("The new parent already has a folder with this name")
+    if moved is None:
+        await session.rollback()
+        raise FolderMoveError("Cannot move a folder into itself, a subfolder or a missing folder")
+    await session.commit()
+    folder_tree_cache.apply([
+        ("folder_upserted", user_id, folder_id, parent_id, folder.name, folder.sort_order, folder.is_archived)
+    ])
+    return True
+
+
+async def _update_subtree(
+    *, session: AsyncSession, user_id: int, folder_id: int, values: dict[str, Any]
+) -> tuple[int, int] | None:
+    # Folders and their notes in one statement: two data-modifying CTEs over the subtree
+    subtree = _subtree(user_id, folder_id)
+    now = datetime.now(timezone.utc)
+    folders = (
+        update(NoteFolders)
+        .where(col(NoteFolders.id).in_(select(subtree.c.id)))
+        .values(**values, updated_at=now)
+        .returning(NoteFolders.id)
+        .cte("changed_folders")
+    )
+    notes = (
+        update(Notes)
+        .where(
+            col(Notes.folder_id).in_(select(subtree.c.id)),
+            Notes.user_id == user_id,
+            col(Notes.is_deleted).is_(False),
+        )
+        .values(**values, updated_at=now)
+        .returning(Notes.id)
+        .cte("changed_notes")
+    )
+    statement = select(
+        select(func.count()).select_from(folders).scalar_subquery(),
+        select(func.count()).select_from(notes).scalar_subquery(),
+    )
+    folder_count, note_count = (await session.exec(statement)).one()  # type: ignore
+    await session.commit()
+    return (folder_count, note_count) if folder_count else None
+
+
+async def archive_folder(
+    *, session: AsyncSession, user_id: int, folder_id: int, archived: bool = True
+) -> tuple[int, int] | None:
+    """
+    Archive (or restore) a folder, its subfolders and their notes. Returns
+    the number of folders and notes updated, None if the folder is missing.
+    """
+    counts = await _update_subtree(
+        session=session, user_id=user_id, folder_id=folder_id, values={"is_archived": archived}
+    )
+    folder_tree_cache.invalidate(user_id)
+    return counts
+
+
+async def delete_folder(*, session: AsyncSession, user_id: int, folder_id: int) -> tuple[int, int] | None:
+    """
+    Move a folder, its subfolders and their notes to the trash
+    """
+    counts = await _update_subtree(session=session, user_id=user_id, folder_id=folder_id, values={"is_deleted": True})
+    if counts:
+        folder_tree_cache.apply([("folder_removed", user_id, folder_id)])
+        graph_cache.invalidate(user_id)
+        suggest_cache.invalidate(user_id)
+    return counts
+
+
+def _changed(obj: Any, name: str) -> bool:
+    return inspect(obj).attrs[name].history.has_changes()
+
+
+def _previous(obj: Any, name: str) -> Any:
+    history = inspect(obj).attrs[name].history
+    return history.deleted[0] if history.deleted else None
+
+
+@event.listens_for(OrmSession, "after_flush")
+def _collect_folder_changes(session: OrmSession, flush_context) -> None:
+    changes = session.info.setdefault("folder_changes", [])
+    for obj in session.new:
+        if isinstance(obj, NoteFolders) and not obj.is_deleted:
+            changes.append((
+                "folder_upserted", obj.user_id, obj.id, obj.parent_folder_id, obj.name, obj.sort_order, obj.is_archived,
+            ))
+        elif isinstance(obj, Notes) and not obj.is_deleted and obj.folder_id is not None:
+            changes.append(("notes_moved", obj.user_id, None, obj.folder_id, 1))
+    for obj in session.deleted:
+        if isinstance(obj, NoteFolders):
+            changes.append(("folder_removed", obj.user_id, obj.id))
+        elif isinstance(obj, Notes) and not obj.is_deleted:
+            changes.append(("notes_moved", obj.user_id, obj.folder_id, None, 1))
+    for obj in session.dirty:
+        if isinstance(obj, NoteFolders):
+            if obj.is_deleted:
+                changes.append(("folder_removed", obj.user_id, obj.id))
+            elif any(_changed(obj, name) for name in ("parent_folder_id", "name", "sort_order", "is_archived")):
+                changes.append((
+                    "folder_upserted", obj.user_id, obj.id, obj.parent_folder_id, obj.name, obj.sort_order,
+                    obj.is_archived,
+                ))
+        elif isinstance(obj, Notes) and (_changed(obj, "folder_id") or _changed(obj, "is_deleted")):
+            was_deleted = _previous(obj, "is_deleted") if _changed(obj, "is_deleted") else obj.is_deleted
+            source = None if was_deleted else (_previous(obj, "folder_id") if _changed(obj, "folder_id") else obj.folder_id)
+            target = None if obj.is_deleted else obj.folder_id
+            if source != target:
+                changes.append(("notes_moved", obj.user_id, source, target, 1))
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _apply_folder_changes(session: OrmSession) -> None:
+    changes = session.info.pop("folder_changes", None)
+    if changes:
+        folder_tree_cache.apply(changes)
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _drop_folder_changes(session: OrmSession) -> None:
+    session.info.pop("folder_changes", None)
@@ -0,0 +1,395 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Iterable
+
+import numpy as np
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.models.document import Document
+from app.models.note import NoteLinks, NoteLinkType, Notes
+
+NodeKey = tuple[str, int]
+
+# NoteLinks.link_type values, plus the implicit parent_note_id and linked_document_id edges
+EDGE_TYPES = [link_type.value for link_type in NoteLinkType] + ["subnote", "document"]
+_EDGE_CODES = {name: code for code, name in enumerate(EDGE_TYPES)}
+
+
+def node_id(key: NodeKey) -> str:
+    return f"{key[0]}:{key[1]}"
+
+
+class UserGraph:
+    """
+    One user's note graph. Directed edges are the source of truth; traversal
+    runs on an undirected CSR adjacency (``indptr``/``indices`` int32 arrays)
+    built from them. Inserts and deletes after a build go to a small overlay
+    that is folded into a fresh CSR once it grows past an eighth of the graph.
+    """
+
+    def __init__(self, nodes: Iterable[tuple[NodeKey, str]], edges: Iterable[tuple[NodeKey, NodeKey, str]]):
+        self.keys: list[NodeKey] = []
+        self.labels: list[str] = []
+        self.alive: list[bool] = []
+        self.index: dict[NodeKey, int] = {}
+        self.edges: dict[tuple[int, int], int] = {}
+        for key, label in nodes:
+            self.add_node(key, label)
+        for source, target, edge_type in edges:
+            if source in self.index and target in self.index:
+                self.edges[(self.index[source], self.index[target])] = _EDGE_CODES[edge_type]
+        self.loaded_at = time.monotonic()
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        pairs = np.array(list(self.edges), dtype=np.int32).reshape(-1, 2)
+        sources = np.concatenate([pairs[:, 0], pairs[:, 1]])
+        targets = np.concatenate([pairs[:, 1], pairs[:, 0]])
+        order = np.lexsort((targets, sources))
+        sources, targets = sources[order], targets[order]
+        # Both directions of a reciprocal link collapse into one neighbour
+        keep = np.ones(len(sources), dtype=bool)
+        keep[1:] = (sources[1:] != sources[:-1]) | (targets[1:] != targets[:-1])
+        sources, targets = sources[keep], targets[keep]
+        self._base_nodes = len(self.keys)
+        self.indptr = np.zeros(self._base_nodes + 1, dtype=np.int32)
+        np.cumsum(np.bincount(sources, minlength=self._base_nodes), out=self.indptr[1:])
+        self.indices = targets
+        self._added: dict[int, set[int]] = {}
+        self._removed: set[tuple[int, int]] = set()
+        self._components: list[int] | None = None
+
+    def _overlay_size(self) -> int:
+        return len(self._removed) + sum(len(v) for v in self._added.values())
+
+    def _maybe_rebuild(self) -> None:
+        if self._overlay_size() > max(64, len(self.edges) // 8):
+            self._rebuild()
+
+    def _base_adjacent(self, u: int, v: int) -> bool:
+        if u >= self._base_nodes:
+            return False
+        row = self.indices[self.indptr[u]:self.indptr[u + 1]]
+        position = np.searchsorted(row, v)
+        return position < len(row) and row[position] == v
+
+    def neighbors(self, u: int) -> list[int]:
+        base = self.indices[self.indptr[u]:self.indptr[u + 1]].tolist() if u < self._base_nodes else []
+        if self._removed:
+            base = [v for v in base if (min(u, v), max(u, v)) not in self._removed]
+        extra = self._added.get(u)
+        return base + list(extra) if extra else base
+
+    def add_node(self, key: NodeKey, label: str) -> int:
+        if key in self.index:
+            u = self.index[key]
+            self.labels[u], self.alive[u] = label, True
+            return u
+        self.index[key] = len(self.keys)
+        self.keys.append(key)
+        self.labels.append(label)
+        self.alive.append(True)
+        return self.index[key]
+
+    def add_edge(self, source: NodeKey, target: NodeKey, edge_type: str, target_label: str = "") -> None:
+        if source not in self.index:
+            return
+        u = self.index[source]
+        v = self.index[target] if target in self.index else self.add_node(target, target_label)
+        reverse_exists = (v, u) in self.edges
+        self.edges[(u, v)] = _EDGE_CODES[edge_type]
+        pair = (min(u, v), max(u, v))
+        if pair in self._removed:
+            self._removed.discard(pair)
+        elif not reverse_exists and not self._base_adjacent(u, v):
+            self._added.setdefault(u, set()).add(v)
+            self._added.setdefault(v, set()).add(u)
+        if self._components is not None:
+            self._union(u, v)
+        self._maybe_rebuild()
+
+    def remove_edge(self, source: NodeKey, target: NodeKey) -> None:
+        u, v = self.index.get(source), self.index.get(target)
+        if u is None or v is None or self.edges.pop((u, v), None) is None or (v, u) in self.edges:
+            return
+        if v in self._added.get(u, ()):
+            self._added[u].discard(v)
+            self._added[v].discard(u)
+        else:
+            self._removed.add((min(u, v), max(u, v)))
+        self._components = None
+        self._maybe_rebuild()
+
+    def remove_node(self, key: NodeKey) -> None:
+        u = self.index.get(key)
+        if u is None:
+            return
+        for v in self.neighbors(u):
+            self.remove_edge(key, self.keys[v])
+            self.remove_edge(self.keys[v], key)
+        self.alive[u] = False
+
+    def _find(self, u: int) -> int:
+        parent = self._components
+        while parent[u] != u:
+            parent[u] = parent[parent[u]]
+            u = parent[u]
+        return u
+
+    def _union(self, u: int, v: int) -> None:
+        while len(self._components) < len(self.keys):
+            self._components.append(len(self._components))
+        root_u, root_v = self._find(u), self._find(v)
+        if root_u != root_v:
+            self._components[max(root_u, root_v)] = min(root_u, root_v)
+
+    def component(self, u: int) -> int:
+        """
+        Component label of ``u``: the smallest node index in its component
+        """
+        if self._components is None:
+            # Union-find: extended on inserts, recomputed after a delete
+            self._components = list(range(len(self.keys)))
+            for a, b in self.edges:
+                self._union(a, b)
+        elif len(self._components) < len(self.keys):
+            self._components.extend(range(len(self._components), len(self.keys)))
+        return self._find(u)
+
+    def k_hop(self, start: int, depth: int, max_nodes: int) -> dict[int, int]:
+        """
+        Nodes within ``depth`` hops of ``start`` mapped to their distance
+        """
+        distances = {start: 0}
+        frontier = [start]
+        for hop in range(1, depth + 1):
+            next_frontier = []
+            for u in frontier:
+                for v in self.neighbors(u):
+                    if v not in distances:
+                        distances[v] = hop
+                        next_frontier.append(v)
+                        if len(distances) >= max_nodes:
+                            return distances
+            frontier = next_frontier
+        return distances
+
+    def shortest_path(self, source: int, target: int, max_depth: int) -> list[int] | None:
+        """
+        Bidirectional BFS; None when the nodes are not connected within ``max_depth`` hops
+        """
+        if source == target:
+            return [source]
+        parents = [{source: None}, {target: None}]
+        frontiers = [deque([source]), deque([target])]
+        for _ in range(max_depth):
+            # Expand the smaller side
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            seen, other = parents[side], parents[1 - side]
+            for _ in range(len(frontiers[side])):
+                u = frontiers[side].popleft()
+                for v in self.neighbors(u):
+                    if v in seen:
+                        continue
+                    seen[v] = u
+                    if v in other:
+                        return self._join(parents, v)
+                    frontiers[side].append(v)
+            if not frontiers[side]:
+                return None
+        return None
+
+    @staticmethod
+    def _join(parents: list[dict[int, int | None]], meeting: int) -> list[int]:
+        path, u = [], meeting
+        while u is not None:
+            path.append(u)
+            u = parents[0][u]
+        path.reverse()
+        u = parents[1][meeting]
+        while u is not None:
+            path.append(u)
+            u = parents[1][u]
+        return path
+
+    def node_payload(self, u: int, **extra: Any) -> dict[str, Any]:
+        kind, ref_id = self.keys[u]
+        return {"id": node_id(self.keys[u]), "kind": kind, "ref_id": ref_id, "label": self.labels[u], **extra}
+
+    def subgraph(self, members: Iterable[int], **per_node: dict[int, Any]) -> dict[str, list]:
+        members = {u for u in members if self.alive[u]}
+        nodes = [
+            self.node_payload(u, **{name: values[u] for name, values in per_node.items()})
+            for u in sorted(members)
+        ]
+        # From the members' adjacency, so a neighborhood costs its own degree, not every edge
+        edges = []
+        for u in sorted(members):
+            for v in self.neighbors(u):
+                code = self.edges.get((u, v)) if v in members else None
+                if code is not None:
+                    edges.append(
+                        {"source": node_id(self.keys[u]), "target": node_id(self.keys[v]), "type": EDGE_TYPES[code]}
+                    )
+        return {"nodes": nodes, "edges": edges}
+
+    def whole(self) -> dict[str, list]:
+        alive = [u for u in range(len(self.keys)) if self.alive[u]]
+        return self.subgraph(
+            alive,
+            component={u: self.component(u) for u in alive},
+            degree={u: len(self.neighbors(u)) for u in alive},
+        )
+
+
+async def load_user_graph(*, session: AsyncSession, user_id: int) -> UserGraph:
+    """
+    Build a user's graph with three flat queries instead of walking relationships
+    """
+    notes = (await session.exec(
+        select(Notes.id, Notes.title, Notes.parent_note_id, Notes.linked_document_id)
+        .where(Notes.user_id == user_id, col(Notes.is_deleted).is_(False))
+    )).all()
+    links = (await session.exec(
+        select(NoteLinks.source_note_id, NoteLinks.target_note_id, NoteLinks.link_type)
+        .join(Notes, col(Notes.id) == NoteLinks.source_note_id)
+        .where(Notes.user_id == user_id)
+    )).all()
+    document_ids = {document_id for *_, document_id in notes if document_id is not None}
+    documents = (await session.exec(
+        select(Document.id, Document.title).where(col(Document.id).in_(document_ids))
+    )).all() if document_ids else []
+
+    nodes = [(("note", note_id), title) for note_id, title, _, _ in notes]
+    nodes += [(("document", document_id), title) for document_id, title in documents]
+    edges = [(("note", source), ("note", target), NoteLinkType(link_type).value) for source, target, link_type in links]
+    for note_id, _, parent_id, document_id in notes:
+        if parent_id is not None:
+            edges.append((("note", note_id), ("note", parent_id), "subnote"))
+        if document_id is not None:
+            edges.append((("note", note_id), ("document", document_id), "document"))
+    return UserGraph(nodes, edges)
+
+
+class GraphCache:
+    """
+    Loaded graphs for the most recently active users. ORM hooks below keep
+    them current as notes and links are committed in this process; entries
+    are reloaded after GRAPH_CACHE_TTL so writes from other processes show up.
+    """
+
+    def __init__(self, max_users: int | None = None, ttl: int | None = None):
+        self.max_users = max_users or settings.GRAPH_CACHE_MAX_USERS
+        self.ttl = ttl or settings.GRAPH_CACHE_TTL
+        self._graphs: OrderedDict[int, UserGraph] = OrderedDict()
+        self._note_owner: dict[int, int] = {}
+        self.lock = threading.RLock()
+
+    async def get(self, *, session: AsyncSession, user_id: int) -> UserGraph:
+        with self.lock:
+            graph = self._graphs.get(user_id)
+            if graph is not None and time.monotonic() - graph.loaded_at < self.ttl:
+                self._graphs.move_to_end(user_id)
+                return graph
+        graph = await load_user_graph(session=session, user_id=user_id)
+        with self.lock:
+            self.invalidate(user_id)
+            self._graphs[user_id] = graph
+            self._note_owner.update({ref_id: user_id for kind, ref_id in graph.keys if kind == "note"})
+            while len(self._graphs) > self.max_users:
+                self.invalidate(next(iter(self._graphs)))
+        return graph
+
+    def invalidate(self, user_id: int) -> None:
+        with self.lock:
+            graph = self._graphs.pop(user_id, None)
+            if graph is not None:
+                for kind, ref_id in graph.keys:
+                    if kind == "note":
+                        self._note_owner.pop(ref_id, None)
+
+    def graph_for_note(self, note_id: int) -> UserGraph | None:
+        user_id = self._note_owner.get(note_id)
+        return self._graphs.get(user_id) if user_id is not None else None
+
+    def apply(self, changes: list[tuple]) -> None:
+        with self.lock:
+            for change in changes:
+                kind = change[0]
+                if kind == "invalidate":
+                    self.invalidate(change[1])
+                elif kind == "note_added":
+                    _, user_id, note_id, title, parent_id, document_id = change
+                    graph = self._graphs.get(user_id)
+                    if graph is None:
+                        continue
+                    graph.add_node(("note", note_id), title)
+                    self._note_owner[note_id] = user_id
+                    if parent_id is not None:
+                        graph.add_edge(("note", note_id), ("note", parent_id), "subnote")
+                    if document_id is not None:
+                        graph.add_edge(("note", note_id), ("document", document_id), "document")
+                elif kind == "note_renamed":
+                    graph = self.graph_for_note(change[1])
+                    if graph is not None:
+                        graph.labels[graph.index[("note", change[1])]] = change[2]
+                elif kind == "note_removed":
+                    graph = self.graph_for_note(change[1])
+                    if graph is not None:
+                        graph.remove_node(("note", change[1]))
+                elif kind == "link_added":
+                    _, source, target, link_type = change
+                    graph = self.graph_for_note(source)
+                    if graph is not None:
+                        graph.add_edge(("note", source), ("note", target), link_type)
+                elif kind == "link_removed":
+                    graph = self.graph_for_note(change[1])
+                    if graph is not None:
+                        graph.remove_edge(("note", change[1]), ("note", change[2]))
+
+
+graph_cache = GraphCache()
+
+_STRUCTURAL_FIELDS = ("parent_note_id", "linked_document_id", "is_deleted")
+
+
+def _attribute_changed(obj: Any, name: str) -> bool:
+    return inspect(obj).attrs[name].history.has_changes()
+
+
+@event.listens_for(OrmSession, "after_flush")
+def _collect_graph_changes(session: OrmSession, flush_context) -> None:
+    changes = session.info.setdefault("graph_changes", [])
+    for obj in session.new:
+        if isinstance(obj, NoteLinks):
+            changes.append(("link_added", obj.source_note_id, obj.target_note_id, NoteLinkType(obj.link_type).value))
+        elif isinstance(obj, Notes) and not obj.is_deleted:
+            changes.append(("note_added", obj.user_id, obj.id, obj.title, obj.parent_note_id, obj.linked_document_id))
+    for obj in session.deleted:
+        if isinstance(obj, NoteLinks):
+            changes.append(("link_removed", obj.source_note_id, obj.target_note_id))
+        elif isinstance(obj, Notes):
+            changes.append(("note_removed", obj.id))
+    for obj in session.dirty:
+        if isinstance(obj, Notes):
+            if any(_attribute_changed(obj, name) for name in _STRUCTURAL_FIELDS):
+                changes.append(("invalidate", obj.user_id))
+            elif _attribute_changed(obj, "title"):
+                changes.append(("note_renamed", obj.id, obj.title))
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _apply_graph_changes(session: OrmSession) -> None:
+    changes = session.info.pop("graph_changes", None)
+    if changes:
+        graph_cache.apply(changes)
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _drop_graph_changes(session: OrmSession) -> None:
+    session.info.pop("graph_changes", None)
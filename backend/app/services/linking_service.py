@@ -0,0 +1,195 @@
+import logging
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, col, delete, or_, select, text, update
+
+from app.ai.embeddings import get_batch_embedder
+from app.ai.vectorstore import get_note_vector_store
+from app.core.config import settings
+from app.core.database import engine
+from app.models.note import NoteLinks, NoteLinkType, Notes
+from app.services.document_service import get_user_settings
+from app.utils.text_processing import hash_content
+
+logger = logging.getLogger(__name__)
+
+
+def _vector_id(note_id: int) -> str:
+    return f"note:{note_id}"
+
+
+def _note_text(title: str, content: str, summary: str | None) -> str:
+    return "\n\n".join(part for part in (title, summary, content) if part)
+
+
+def _is_stale():
+    return or_(col(Notes.embedded_at).is_(None), col(Notes.embedded_at) < Notes.last_edited_at)
+
+
+def find_users_with_stale_notes(*, session: Session) -> list[int]:
+    statement = select(Notes.user_id).where(col(Notes.is_deleted).is_(False), _is_stale()).distinct()
+    return list(session.exec(statement).all())
+
+
+def embed_stale_notes(*, session: Session, user_id: int, embedding_model: str) -> list[int]:
+    """
+    Embed the user's notes edited since they were last embedded, drop the
+    vectors of deleted notes, and return the ids of the notes re-embedded.
+    """
+    store = get_note_vector_store()
+    embedder = get_batch_embedder(embedding_model)
+    shard = store.shard(user_id)
+    if shard.dim is not None and shard.dim != embedder.embedder.dim:
+        # The user switched embedding models: start the shard over
+        store.drop_user(user_id)
+        session.exec(update(Notes).where(Notes.user_id == user_id).values(embedded_at=None))  # type: ignore
+        session.commit()
+
+    # Notes edited after this point stay stale and are picked up next time
+    started = datetime.now()
+    alive = set(session.exec(
+        select(Notes.id).where(Notes.user_id == user_id, col(Notes.is_deleted).is_(False))
+    ).all())
+    gone = [vector_id for vector_id in store.shard(user_id).ids if int(vector_id.split(":")[1]) not in alive]
+    if gone:
+        store.delete(user_id, gone)
+
+    rows = session.exec(
+        select(Notes.id, Notes.title, Notes.content, Notes.summary)
+        .where(Notes.user_id == user_id, col(Notes.is_deleted).is_(False), _is_stale())
+        .order_by(Notes.id)
+    ).all()
+    for start in range(0, len(rows), settings.EMBEDDING_BATCH_SIZE):
+        batch = rows[start:start + settings.EMBEDDING_BATCH_SIZE]
+        texts = [_note_text(title, content, summary) for _, title, content, summary in batch]
+        vectors = embedder.embed(texts, content_hashes=[hash_content(text) for text in texts])
+        store.upsert(user_id, [_vector_id(note_id) for note_id, *_ in batch], vectors)
+    if rows:
+        # Bulk UPDATE by primary key, one statement for all rows
+        session.execute(update(Notes), [{"id": note_id, "embedded_at": started} for note_id, *_ in rows])
+        session.commit()
+    return [note_id for note_id, *_ in rows]
+
+
+def similar_pairs(
+    matrix: np.ndarray, query_rows: np.ndarray, threshold: float, max_per_row: int, block_rows: int | None = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    For each row in ``query_rows``, its ``max_per_row`` most similar rows of
+    ``matrix`` scoring at least ``threshold``. Works block by block with
+    matrix products, so memory stays at ``block_rows * len(matrix)`` floats.
+
+    Returns parallel arrays (row, neighbour row, similarity).
+    """
+    block_rows = block_rows or settings.AUTO_LINK_BLOCK_ROWS
+    k = min(max_per_row, len(matrix) - 1)
+    found_rows, found_neighbors, found_scores = [], [], []
+    if k <= 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+    for start in range(0, len(query_rows), block_rows):
+        rows = query_rows[start:start + block_rows]
+        scores = matrix[rows] @ matrix.T
+        scores[np.arange(len(rows)), rows] = -np.inf
+        neighbors = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best = np.take_along_axis(scores, neighbors, axis=1)
+        keep = best >= threshold
+        found_rows.append(np.repeat(rows, k).reshape(len(rows), k)[keep])
+        found_neighbors.append(neighbors[keep])
+        found_scores.append(best[keep])
+    return np.concatenate(found_rows), np.concatenate(found_neighbors), np.concatenate(found_scores)
+
+
+def _replace_auto_links(
+    *, session: Session, user_id: int, note_ids: list[int] | None, proposals: dict[tuple[int, int], float]
+) -> int:
+    """
+    Swap the auto links touching ``note_ids`` (all of the user's when None)
+    for ``proposals``. Links the user created are never touched or duplicated.
+    """
+    user_notes = select(Notes.id).where(Notes.user_id == user_id)
+    scope = col(NoteLinks.source_note_id).in_(user_notes)
+    if note_ids is not None:
+        scope = or_(col(NoteLinks.source_note_id).in_(note_ids), col(NoteLinks.target_note_id).in_(note_ids))
+    session.exec(delete(NoteLinks).where(col(NoteLinks.is_auto).is_(True), scope))  # type: ignore
+
+    manual = session.exec(select(NoteLinks.source_note_id, NoteLinks.target_note_id).where(scope)).all()
+    taken = {(min(a, b), max(a, b)) for a, b in manual}
+    values = [
+        {
+            "source_note_id": source,
+            "target_note_id": target,
+            "link_type": NoteLinkType.related,
+            "is_auto": True,
+            "similarity": similarity,
+            "description": f"Suggested: {similarity:.0%} similar",
+        }
+        for (source, target), similarity in proposals.items()
+        if (source, target) not in taken
+    ]
+    for start in range(0, len(values), 1000):
+        session.exec(insert(NoteLinks).values(values[start:start + 1000]).on_conflict_do_nothing())  # type: ignore
+    return len(values)
+
+
+def link_notes(*, session: Session, user_id: int) -> int:
+    """
+    Re-embed the user's edited notes and refresh their suggested links.
+    Only edited notes are re-scored, unless so many changed that a full
+    pass is cheaper. Returns the number of links proposed.
+    """
+    user_settings = get_user_settings(session=session, user_id=user_id)
+    edited = embed_stale_notes(session=session, user_id=user_id, embedding_model=user_settings.embedding_model)
+    if not edited:
+        return 0
+    vector_ids, matrix = get_note_vector_store().shard(user_id).snapshot()
+    note_ids = np.array([int(vector_id.split(":")[1]) for vector_id in vector_ids])
+    full = len(edited) > len(note_ids) * settings.AUTO_LINK_FULL_RESCORE_FRACTION
+    if full:
+        query_rows = np.arange(len(note_ids))
+    else:
+        query_rows = np.flatnonzero(np.isin(note_ids, edited))
+
+    rows, neighbors, scores = similar_pairs(
+        matrix, query_rows, settings.AUTO_LINK_THRESHOLD, settings.AUTO_LINK_MAX_PER_NOTE
+    )
+    proposals: dict[tuple[int, int], float] = {}
+    for a, b, score in zip(note_ids[rows].tolist(), note_ids[neighbors].tolist(), scores.tolist()):
+        pair = (min(a, b), max(a, b))
+        proposals[pair] = max(score, proposals.get(pair, 0.0))
+
+    created = _replace_auto_links(
+        session=session, user_id=user_id, note_ids=None if full else edited, proposals=proposals
+    )
+    session.commit()
+    logger.info(
+        "Auto-linking for user %s: %s notes re-embedded, %s links proposed (%s pass)",
+        user_id, len(edited), created, "full" if full else "incremental",
+    )
+    return created
+
+
+# Advisory lock namespace, so two workers never link the same user at once
+_AUTO_LINK_LOCK = 0x4C494E4B
+
+
+def run_auto_linking(user_id: int) -> int:
+    """
+    Process-pool entry point, like ``run_ingestion_job``
+    """
+    key = {"namespace": _AUTO_LINK_LOCK, "user_id": user_id}
+    # Session-level lock: the session is pinned to this connection so the
+    # lock outlives its commits
+    with engine.connect() as connection:
+        locked = connection.execute(text("SELECT pg_try_advisory_lock(:namespace, :user_id)"), key).scalar()
+        connection.commit()
+        if not locked:
+            return 0
+        try:
+            with Session(bind=connection) as session:
+                return link_notes(session=session, user_id=user_id)
+        finally:
+            connection.rollback()
+            connection.execute(text("SELECT pg_advisory_unlock(:namespace, :user_id)"), key)
+            connection.commit()
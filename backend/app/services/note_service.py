@@ -0,0 +1,261 @@
+from datetime import datetime, timezone
+from typing import Any, Literal
+
+from sqlalchemy import Integer, func, literal, true
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.orm import joinedload, load_only, raiseload, selectinload
+from sqlmodel import col, delete, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.chat import ChatSession
+from app.models.document import Document
+from app.models.note import NoteCollaborators, NoteFolders, NoteLinks, NoteTagRelations, NoteTags, Notes
+from app.services.folder_service import folder_tree_cache
+from app.services.graph_service import graph_cache
+from app.services.suggest_service import suggest_cache
+from app.utils.pagination import Page, fetch_page
+
+NoteProfile = Literal["list", "detail", "graph"]
+BulkOutcome = Literal["updated", "unchanged", "not_found"]
+
+
+class BulkTargetNotFoundError(LookupError):
+    """
+    The folder or tags a bulk operation points at do not belong to the user
+    """
+
+
+def _folder_ref():
+    return joinedload(Notes.folder).load_only(NoteFolders.id, NoteFolders.name, NoteFolders.color, raiseload=True)
+
+
+def _tag_refs():
+    return selectinload(Notes.tags).load_only(NoteTags.id, NoteTags.name, NoteTags.color, raiseload=True)
+
+
+def _links(relationship):
+    return selectinload(relationship).load_only(
+        NoteLinks.source_note_id, NoteLinks.target_note_id, NoteLinks.link_type, NoteLinks.is_auto, raiseload=True
+    )
+
+
+def note_load_options(profile: NoteProfile) -> list:
+    """
+    Loader options for a view of notes. To-one relationships are joined into
+    the main query and each collection costs one ``SELECT ... IN`` for the
+    whole page, so the query count does not grow with the number of notes.
+    Anything the profile leaves out raises on access instead of lazy
+    loading one note at a time.
+    """
+    if profile == "list":
+        # content can be megabytes per note; a list row only shows the preview
+        return [
+            load_only(
+                Notes.id, Notes.user_id, Notes.folder_id, Notes.title, Notes.content_preview, Notes.is_favorite,
+                Notes.is_pinned, Notes.is_archived, Notes.word_count, Notes.created_at, Notes.updated_at,
+                raiseload=True,
+            ),
+            _folder_ref(), _tag_refs(), raiseload("*"),
+        ]
+    if profile == "detail":
+        return [
+            _folder_ref(), _tag_refs(),
+            joinedload(Notes.linked_document).load_only(Document.id, Document.title, raiseload=True),
+            joinedload(Notes.linked_chat_session).load_only(ChatSession.id, ChatSession.title, raiseload=True),
+            _links(Notes.source_links), _links(Notes.target_links),
+            selectinload(Notes.collaborators).load_only(
+                NoteCollaborators.user_id, NoteCollaborators.permission, NoteCollaborators.accepted_at,
+                raiseload=True,
+            ),
+            raiseload("*"),
+        ]
+    # graph: node labels and outgoing edges only
+    return [
+        load_only(Notes.id, Notes.user_id, Notes.title, Notes.linked_document_id, raiseload=True),
+        _links(Notes.source_links), raiseload("*"),
+    ]
+
+
+async def list_notes(
+    *,
+    session: AsyncSession,
+    user_id: int,
+    folder_id: int | None = None,
+    archived: bool = False,
+    limit: int = 50,
+    cursor: str | None = None,
+) -> Page[Notes]:
+    """
+    Newest notes first, loaded with the ``list`` profile
+    """
+    # Keyset over ix_notes_user_created (user_id, created_at, id)
+    statement = (
+        select(Notes)
+        .where(Notes.user_id == user_id, col(Notes.is_deleted).is_(False), Notes.is_archived == archived)
+        .options(*note_load_options("list"))
+    )
+    if folder_id is not None:
+        statement = statement.where(Notes.folder_id == folder_id)
+    return await fetch_page(
+        session, statement, sort_column=Notes.created_at, id_column=Notes.id, limit=limit, cursor=cursor
+    )
+
+
+async def get_notes(
+    *, session: AsyncSession, user_id: int, note_ids: list[int], profile: NoteProfile = "detail"
+) -> list[Notes]:
+    """
+    The user's live notes among ``note_ids``, in id order, loaded with ``profile``
+    """
+    statement = (
+        select(Notes)
+        .where(col(Notes.id) == func.any(_ids(note_ids)), Notes.user_id == user_id, col(Notes.is_deleted).is_(False))
+        .order_by(Notes.id)
+        .options(*note_load_options(profile))
+        # Rows already in the session may have been loaded with another profile
+        .execution_options(populate_existing=True)
+    )
+    return list((await session.exec(statement)).all())
+
+
+def _ids(values: list[int]):
+    # One array parameter, however many ids: the statement text and plan stay the same
+    return literal(sorted(set(values)), ARRAY(Integer))
+
+
+def _owned_notes(user_id: int, note_ids: list[int]):
+    # Locked in id order, so two bulk operations on overlapping notes cannot deadlock
+    return (
+        select(Notes.id)
+        .where(col(Notes.id) == func.any(_ids(note_ids)), Notes.user_id == user_id, col(Notes.is_deleted).is_(False))
+        .order_by(Notes.id)
+        .with_for_update()
+        .cte("owned")
+    )
+
+
+async def _run(
+    *, session: AsyncSession, note_ids: list[int], owned, changed
+) -> dict[int, BulkOutcome]:
+    """
+    Execute ``changed`` (a CTE returning the ids it modified) against the
+    ``owned`` CTE and map every requested id to its outcome, in one
+    round trip
+    """
+    statement = select(owned.c.id, changed.c.id.is_not(None)).outerjoin(changed, changed.c.id == owned.c.id)
+    rows = (await session.exec(statement)).all()  # type: ignore
+    await session.commit()
+    outcomes: dict[int, BulkOutcome] = dict.fromkeys(note_ids, "not_found")
+    outcomes.update({note_id: "updated" if modified else "unchanged" for note_id, modified in rows})
+    return outcomes
+
+
+async def _update_notes(
+    *, session: AsyncSession, user_id: int, note_ids: list[int], values: dict[str, Any], changes
+) -> dict[int, BulkOutcome]:
+    owned = _owned_notes(user_id, note_ids)
+    changed = (
+        update(Notes)
+        .where(col(Notes.id) == owned.c.id, changes)
+        .values(**values, updated_at=datetime.now(timezone.utc))
+        .returning(col(Notes.id))
+        .cte("changed")
+    )
+    return await _run(session=session, note_ids=note_ids, owned=owned, changed=changed)
+
+
+async def move_notes(
+    *, session: AsyncSession, user_id: int, note_ids: list[int], folder_id: int | None
+) -> dict[int, BulkOutcome]:
+    """
+    Move notes into ``folder_id`` (None for the top level)
+    """
+    if folder_id is not None:
+        folder = await session.get(NoteFolders, folder_id)
+        if folder is None or folder.user_id != user_id or folder.is_deleted:
+            raise BulkTargetNotFoundError("Folder not found")
+    outcomes = await _update_notes(
+        session=session, user_id=user_id, note_ids=note_ids,
+        values={"folder_id": folder_id}, changes=col(Notes.folder_id).is_distinct_from(folder_id),
+    )
+    folder_tree_cache.invalidate(user_id)
+    return outcomes
+
+
+async def archive_notes(
+    *, session: AsyncSession, user_id: int, note_ids: list[int], archived: bool = True
+) -> dict[int, BulkOutcome]:
+    return await _update_notes(
+        session=session, user_id=user_id, note_ids=note_ids,
+        values={"is_archived": archived}, changes=col(Notes.is_archived).is_distinct_from(archived),
+    )
+
+
+async def delete_notes(*, session: AsyncSession, user_id: int, note_ids: list[int]) -> dict[int, BulkOutcome]:
+    """
+    Soft-delete notes. The statement bypasses the ORM hooks, so the user's
+    cached graph, autocomplete index and folder tree are dropped instead.
+    """
+    outcomes = await _update_notes(
+        session=session, user_id=user_id, note_ids=note_ids,
+        values={"is_deleted": True}, changes=col(Notes.is_deleted).is_(False),
+    )
+    graph_cache.invalidate(user_id)
+    suggest_cache.invalidate(user_id)
+    folder_tree_cache.invalidate(user_id)
+    return outcomes
+
+
+async def _check_tags(*, session: AsyncSession, user_id: int, tag_ids: list[int]) -> None:
+    found = (await session.exec(
+        select(func.count()).select_from(NoteTags)
+        .where(col(NoteTags.id) == func.any(_ids(tag_ids)), NoteTags.user_id == user_id)
+    )).one()
+    if found != len(set(tag_ids)):
+        raise BulkTargetNotFoundError("Tag not found")
+
+
+async def tag_notes(
+    *, session: AsyncSession, user_id: int, note_ids: list[int], tag_ids: list[int]
+) -> dict[int, BulkOutcome]:
+    """
+    Attach every tag to every note; existing pairs are left alone
+    """
+    await _check_tags(session=session, user_id=user_id, tag_ids=tag_ids)
+    owned = _owned_notes(user_id, note_ids)
+    tags = select(func.unnest(_ids(tag_ids)).label("tag_id")).subquery()
+    pairs = select(owned.c.id, tags.c.tag_id, literal(datetime.now(timezone.utc))).join(tags, true())
+    changed = (
+        insert(NoteTagRelations)
+        .from_select(["note_id", "tag_id", "created_at"], pairs)
+        .on_conflict_do_nothing()
+        .returning(col(NoteTagRelations.note_id).label("id"))
+        .cte("changed")
+    )
+    # A note counts once however many of its tags were new
+    changed = select(changed.c.id).distinct().cte("changed_notes")
+    return await _run(session=session, note_ids=note_ids, owned=owned, changed=changed)
+
+
+async def untag_notes(
+    *, session: AsyncSession, user_id: int, note_ids: list[int], tag_ids: list[int]
+) -> dict[int, BulkOutcome]:
+    await _check_tags(session=session, user_id=user_id, tag_ids=tag_ids)
+    owned = _owned_notes(user_id, note_ids)
+    changed = (
+        delete(NoteTagRelations)
+        .where(
+            col(NoteTagRelations.note_id) == func.any(_ids(note_ids)),
+            col(NoteTagRelations.tag_id) == func.any(_ids(tag_ids)),
+            # Ownership through the notes primary key rather than a join to
+            # owned: right after a large bulk tag the table's statistics are
+            # stale, and the join was planned as a nested loop over both sets
+            select(Notes.id).where(
+                Notes.id == NoteTagRelations.note_id, Notes.user_id == user_id, col(Notes.is_deleted).is_(False)
+            ).exists(),
+        )
+        .returning(col(NoteTagRelations.note_id).label("id"))
+        .cte("changed")
+    )
+    changed = select(changed.c.id).distinct().cte("changed_notes")
+    return await _run(session=session, note_ids=note_ids, owned=owned, changed=changed)
@@ -0,0 +1,410 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import ARRAY, Select, String, literal
+from sqlmodel import col, func, select, text
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.models.chat import ChatMessages, ChatSession
+from app.models.document import Document, DocumentChunks
+from app.models.note import NoteTagRelations, NoteTags, Notes, note_search
+from app.schemas.search import SearchBranchPlan, SearchEntity, SearchHit, SearchResults
+
+logger = logging.getLogger(__name__)
+
+# Match markers, swapped for <mark> once the snippet is out of the database
+_START, _STOP = "\x02", "\x03"
+_HEADLINE_OPTIONS = f'StartSel={_START}, StopSel={_STOP}, MaxWords=30, MinWords=10, MaxFragments=2, FragmentDelimiter=" … "'
+
+# Filters each entity supports; an entity is left out when any other is set
+_SUPPORTED_FILTERS: dict[SearchEntity, set[str]] = {
+    "note": {"tags", "folder_id", "is_archived", "is_favorite"},
+    "document": {"tags"},
+    "chat": {"is_archived"},
+}
+
+
+@dataclass(frozen=True)
+class SearchFilters:
+    tags: tuple[str, ...] = ()
+    folder_id: int | None = None
+    is_archived: bool | None = None
+    is_favorite: bool | None = None
+
+    def active(self) -> set[str]:
+        return {name for name in ("tags", "folder_id", "is_archived", "is_favorite") if getattr(self, name) not in (None, ())}
+
+
+def _tsquery(query: str):
+    return func.websearch_to_tsquery(text("'english'"), query)
+
+
+def _chunk_tsvector():
+    # Must match ix_document_chunks_content_search for the GIN index to be used
+    return func.to_tsvector(text("'english'"), DocumentChunks.content)
+
+
+def _message_tsvector():
+    # Must match ix_chat_messages_search
+    return func.to_tsvector(text("'english'"), ChatMessages.content)
+
+
+# Weights for D, C, B, A. Chunks and messages are unweighted (D) and note
+# bodies are B, so both score like body text; note titles (A) score higher.
+_RANK_WEIGHTS = text("'{0.4, 0.4, 0.4, 1.0}'")
+
+
+def _rank(vector, tsquery):
+    # Normalisation 32 maps ranks into [0, 1), comparable across entities
+    return func.ts_rank(_RANK_WEIGHTS, vector, tsquery, 32).label("rank")
+
+
+def _headline(content, tsquery):
+    # Escaped before highlighting: the parser would otherwise drop anything
+    # that looks like a tag, and skip matches inside <script> or <style>
+    escaped = func.left(content, settings.SEARCH_HEADLINE_MAX_CHARS)
+    for char, entity in (("&", "&amp;"), ("<", "&lt;"), (">", "&gt;")):
+        escaped = func.replace(escaped, char, entity)
+    return func.ts_headline(text("'english'"), escaped, tsquery, literal(_HEADLINE_OPTIONS)).label("snippet")
+
+
+def _snippet(escaped: str | None) -> str:
+    return (escaped or "").replace(_START, "<mark>").replace(_STOP, "</mark>")
+
+
+def _note_clauses(user_id: int, filters: SearchFilters) -> list:
+    clauses = [Notes.user_id == user_id, col(Notes.is_deleted).is_(False)]
+    if filters.folder_id is not None:
+        clauses.append(Notes.folder_id == filters.folder_id)
+    # "= true" rather than "IS TRUE", so the partial indexes' predicates match
+    if filters.is_archived is not None:
+        clauses.append(Notes.is_archived == filters.is_archived)
+    if filters.is_favorite is not None:
+        clauses.append(Notes.is_favorite == filters.is_favorite)
+    if filters.tags:
+        # Notes carrying every requested tag
+        tagged = (
+            select(NoteTagRelations.note_id)
+            .join(NoteTags, col(NoteTags.id) == NoteTagRelations.tag_id)
+            .where(NoteTags.user_id == user_id, col(NoteTags.name).in_(filters.tags))
+            .group_by(col(NoteTagRelations.note_id))
+            .having(func.count() == len(set(filters.tags)))
+        )
+        clauses.append(col(Notes.id).in_(tagged))
+    return clauses
+
+
+def _document_clauses(user_id: int, filters: SearchFilters) -> list:
+    clauses = [Document.user_id == user_id, col(Document.is_deleted).is_(False)]
+    if filters.tags:
+        # @> is what ix_document_tags (GIN) serves
+        clauses.append(col(Document.tags).op("@>")(literal(list(filters.tags), ARRAY(String))))
+    return clauses
+
+
+# ---------------------------------------------------------------------------
+# Planner
+# ---------------------------------------------------------------------------
+
+_estimates: TTLCache[tuple, int] = TTLCache(maxsize=4096, ttl=settings.SEARCH_PLAN_CACHE_TTL)
+
+
+async def _bounded_estimate(session: AsyncSession, key: tuple, statement: Select) -> int:
+    """
+    Rows ``statement`` returns, counted up to SEARCH_FILTER_FIRST_MAX_ROWS + 1:
+    the planner only needs to know which side of the threshold it is on,
+    so the estimate never scans more than that.
+    """
+    estimate = _estimates.get(key)
+    if estimate is None:
+        bounded = statement.limit(settings.SEARCH_FILTER_FIRST_MAX_ROWS + 1).subquery()
+        estimate = (await session.exec(select(func.count()).select_from(bounded))).one()
+        _estimates.set(key, estimate)
+    return estimate
+
+
+async def _term_estimate(session: AsyncSession, user_id: int, query: str) -> int:
+    """
+    Notes Postgres expects ``query`` to match, from its lexeme statistics.
+    Only planned, never run: a common term costs no more than a rare one.
+    """
+    key = ("note_terms", user_id, query)
+    estimate = _estimates.get(key)
+    if estimate is None:
+        explained = (await session.exec(
+            text(
+                "EXPLAIN (FORMAT JSON) SELECT 1 FROM note_search "
+                "WHERE user_id = :user_id AND search_vector @@ websearch_to_tsquery('english', :query)"
+            ).bindparams(user_id=user_id, query=query)
+        )).one()[0]
+        estimate = int(explained[0]["Plan"]["Plan Rows"])
+        _estimates.set(key, estimate)
+    return estimate
+
+
+async def plan_search(
+    *, session: AsyncSession, user_id: int, query: str, entities: list[SearchEntity], filters: SearchFilters
+) -> list[SearchBranchPlan]:
+    """
+    One branch per entity that supports every active filter.
+
+    Filters are written so their indexes are usable, which lets Postgres
+    AND a filter's index bitmap with the GIN text index in one scan. When a
+    filter leaves only a handful of rows (a small folder, a rare tag), those
+    are fetched first and the text match runs on them alone, skipping the
+    GIN index: for common terms its bitmap is the expensive part.
+
+    A note term expected to match more than SEARCH_RANK_CANDIDATES notes
+    skips the GIN index too. Its matches are read from the newest
+    SEARCH_RECENT_WINDOW_ROWS notes, so the cost is bounded by the window
+    rather than by how common the term is. Older matches are then not ranked.
+    """
+    active = filters.active()
+    plans = []
+    for entity in entities:
+        if not active <= _SUPPORTED_FILTERS[entity]:
+            continue
+        plan = SearchBranchPlan(entity=entity, strategy="text_index", index={
+            "note": "ix_note_search_vector",
+            "document": "ix_document_chunks_content_search",
+            "chat": "ix_chat_messages_search",
+        }[entity])
+        if entity == "note":
+            # Only filters that narrow the set; is_favorite=false matches most notes
+            narrowing = [
+                (filters.folder_id is not None, "ix_notes_folder_id"),
+                (bool(filters.tags), "ix_note_tag_relations_tag_id"),
+                (filters.is_favorite is True, "ix_notes_favorite"),
+                (filters.is_archived is True, "ix_notes_archived"),
+            ]
+            index = next((name for applies, name in narrowing if applies), None)
+            if index:
+                plan.index = f"{plan.index}+{index}"
+                plan.estimated_rows = await _bounded_estimate(
+                    session, ("note", user_id, filters), select(Notes.id).where(*_note_clauses(user_id, filters))
+                )
+                if plan.estimated_rows <= settings.SEARCH_FILTER_FIRST_MAX_ROWS:
+                    plan.strategy, plan.index = "filter_first", index
+            if plan.strategy == "text_index":
+                matches = await _term_estimate(session, user_id, query)
+                if matches > settings.SEARCH_RANK_CANDIDATES:
+                    plan.strategy, plan.index, plan.estimated_rows = "recent_window", "ix_note_search_user_note", matches
+        elif entity == "document" and filters.tags:
+            plan.index = f"{plan.index}+ix_document_tags"
+            # Cost is in chunks: each candidate chunk is parsed for the text match
+            plan.estimated_rows = await _bounded_estimate(
+                session, ("document", user_id, filters),
+                select(DocumentChunks.id)
+                .join(Document, col(Document.id) == DocumentChunks.document_id)
+                .where(*_document_clauses(user_id, filters)),
+            )
+            if plan.estimated_rows <= settings.SEARCH_FILTER_FIRST_MAX_ROWS:
+                plan.strategy, plan.index = "filter_first", "ix_document_tags"
+        plans.append(plan)
+    return plans
+
+
+# ---------------------------------------------------------------------------
+# Branches
+# ---------------------------------------------------------------------------
+
+def _capped(matches: Select, id_column):
+    """
+    Ids of the newest SEARCH_RANK_CANDIDATES matches, the only ones ranked.
+    For a term matching more, the best hits are chosen among the most recent
+    rather than among whichever rows the scan happened to reach first. Only
+    ids are sorted; vectors and content are read for the capped rows alone.
+    """
+    return matches.order_by(col(id_column).desc()).limit(settings.SEARCH_RANK_CANDIDATES).cte("capped")
+
+
+def _candidate_count(capped):
+    return select(func.count()).select_from(capped).scalar_subquery().label("candidates")
+
+
+def _note_statement(plan: SearchBranchPlan, user_id: int, query: str, filters: SearchFilters, limit: int) -> Select:
+    tsquery = _tsquery(query)
+    # note_search holds live notes only; notes is joined just for the filters
+    searched = note_search
+    if plan.strategy == "recent_window":
+        # Walks ix_note_search_user_note, stopping once enough matches are found
+        searched = (
+            select(note_search)
+            .where(note_search.c.user_id == user_id)
+            .order_by(note_search.c.note_id.desc())
+            .limit(settings.SEARCH_RECENT_WINDOW_ROWS)
+            .subquery("recent")
+        )
+    matches = select(searched.c.note_id.label("id")).where(searched.c.user_id == user_id)
+    if plan.strategy == "filter_first":
+        candidates = select(Notes.id).where(*_note_clauses(user_id, filters)).cte("candidates").prefix_with("MATERIALIZED")
+        matches = matches.join(candidates, candidates.c.id == searched.c.note_id)
+    elif filters.active():
+        matches = matches.join(Notes, col(Notes.id) == searched.c.note_id).where(*_note_clauses(user_id, filters))
+    capped = _capped(matches.where(searched.c.search_vector.op("@@")(tsquery)), searched.c.note_id)
+    rank = _rank(note_search.c.search_vector, tsquery)
+    top = (
+        select(note_search.c.note_id.label("id"), rank)
+        .join(capped, capped.c.id == note_search.c.note_id)
+        .order_by(rank.desc())
+        .limit(limit)
+        .subquery()
+    )
+    # Headlines are only built for the rows returned
+    return (
+        select(
+            top.c.id, top.c.rank, Notes.title, _headline(Notes.content, tsquery), Notes.updated_at,
+            _candidate_count(capped),
+        )
+        .join(Notes, col(Notes.id) == top.c.id)
+        .order_by(top.c.rank.desc())
+    )
+
+
+def _document_statement(plan: SearchBranchPlan, user_id: int, query: str, filters: SearchFilters, limit: int) -> Select:
+    tsquery = _tsquery(query)
+    matches = select(DocumentChunks.id)
+    if plan.strategy == "filter_first":
+        candidates = select(Document.id).where(*_document_clauses(user_id, filters)).cte("candidates").prefix_with("MATERIALIZED")
+        matches = matches.join(candidates, candidates.c.id == DocumentChunks.document_id)
+    else:
+        matches = matches.join(Document, col(Document.id) == DocumentChunks.document_id).where(
+            *_document_clauses(user_id, filters)
+        )
+    capped = _capped(matches.where(_chunk_tsvector().op("@@")(tsquery)), DocumentChunks.id)
+    rank = _rank(_chunk_tsvector(), tsquery)
+    # Best chunk per document
+    best = (
+        select(DocumentChunks.id, DocumentChunks.document_id, rank)
+        .join(capped, capped.c.id == DocumentChunks.id)
+        .distinct(DocumentChunks.document_id)
+        .order_by(DocumentChunks.document_id, rank.desc())
+        .subquery()
+    )
+    top = select(best).order_by(best.c.rank.desc()).limit(limit).subquery()
+    return (
+        select(
+            top.c.document_id, top.c.rank, Document.title, _headline(DocumentChunks.content, tsquery),
+            Document.updated_at, DocumentChunks.page_number, _candidate_count(capped),
+        )
+        .join(DocumentChunks, col(DocumentChunks.id) == top.c.id)
+        .join(Document, col(Document.id) == top.c.document_id)
+        .order_by(top.c.rank.desc())
+    )
+
+
+def _chat_statement(plan: SearchBranchPlan, user_id: int, query: str, filters: SearchFilters, limit: int) -> Select:
+    tsquery = _tsquery(query)
+    clauses = [ChatSession.user_id == user_id, _message_tsvector().op("@@")(tsquery)]
+    if filters.is_archived is not None:
+        clauses.append(col(ChatSession.is_archived).is_(filters.is_archived))
+    capped = _capped(
+        select(ChatMessages.id)
+        .join(ChatSession, col(ChatSession.id) == ChatMessages.session_id)
+        .where(*clauses),
+        ChatMessages.id,
+    )
+    rank = _rank(_message_tsvector(), tsquery)
+    # Best message per session
+    best = (
+        select(ChatMessages.id, ChatMessages.session_id, rank)
+        .join(capped, capped.c.id == ChatMessages.id)
+        .distinct(ChatMessages.session_id)
+        .order_by(ChatMessages.session_id, rank.desc())
+        .subquery()
+    )
+    top = select(best).order_by(best.c.rank.desc()).limit(limit).subquery()
+    return (
+        select(
+            top.c.session_id, top.c.rank, func.coalesce(ChatSession.title, "Untitled chat"),
+            _headline(ChatMessages.content, tsquery), ChatSession.last_message_at, top.c.id,
+            _candidate_count(capped),
+        )
+        .join(ChatMessages, col(ChatMessages.id) == top.c.id)
+        .join(ChatSession, col(ChatSession.id) == top.c.session_id)
+        .order_by(top.c.rank.desc())
+    )
+
+
+_STATEMENTS = {"note": _note_statement, "document": _document_statement, "chat": _chat_statement}
+
+
+async def _run_branch(
+    plan: SearchBranchPlan, user_id: int, query: str, filters: SearchFilters, limit: int
+) -> list[SearchHit]:
+    statement = _STATEMENTS[plan.entity](plan, user_id, query, filters, limit)
+    # Each branch needs its own connection to run concurrently
+    async with async_session_maker() as session:
+        # Give up server-side too, not just stop waiting for the answer
+        await session.execute(text(f"SET LOCAL statement_timeout = {int(settings.SEARCH_BRANCH_TIMEOUT_MS)}"))
+        rows = (await session.execute(statement)).all()
+        if plan.strategy == "recent_window" and len(rows) < limit:
+            # The newest notes hold too few matches, so the term is rarer than
+            # estimated, which also makes the GIN index cheap: match them all
+            plan.strategy, plan.index = "text_index", "ix_note_search_vector"
+            rows = (await session.execute(_note_statement(plan, user_id, query, filters, limit))).all()
+    hits = []
+    if rows:
+        plan.ranked_candidates = rows[0].candidates
+        plan.truncated = plan.strategy == "recent_window" or plan.ranked_candidates >= settings.SEARCH_RANK_CANDIDATES
+    for row in rows:
+        ref_id, rank, title, snippet, updated_at, *extra, _ = row
+        hits.append(SearchHit(
+            type=plan.entity,
+            id=ref_id,
+            title=title,
+            snippet=_snippet(snippet),
+            score=float(rank),
+            updated_at=updated_at,
+            page_number=extra[0] if plan.entity == "document" else None,
+            message_id=extra[0] if plan.entity == "chat" else None,
+        ))
+    return hits
+
+
+async def search(
+    *,
+    session: AsyncSession,
+    user_id: int,
+    query: str,
+    entities: list[SearchEntity],
+    filters: SearchFilters,
+    limit: int = 20,
+) -> SearchResults:
+    """
+    Full-text search across notes, documents and chats. The per-entity
+    queries run concurrently and their hits are merged by rank; a branch
+    that fails or misses SEARCH_BRANCH_TIMEOUT_MS is reported in
+    ``degraded`` and left out.
+    """
+    started = time.perf_counter()
+    plans = await plan_search(session=session, user_id=user_id, query=query, entities=entities, filters=filters)
+    results = await asyncio.gather(
+        *(
+            asyncio.wait_for(
+                _run_branch(plan, user_id, query, filters, limit), timeout=settings.SEARCH_BRANCH_TIMEOUT_MS / 1000
+            )
+            for plan in plans
+        ),
+        return_exceptions=True,
+    )
+    hits: list[SearchHit] = []
+    degraded: list[SearchEntity] = []
+    for plan, result in zip(plans, results):
+        if isinstance(result, BaseException):
+            degraded.append(plan.entity)
+            logger.warning("Search branch %s failed: %r", plan.entity, result)
+        else:
+            hits.extend(result)
+    hits.sort(key=lambda hit: hit.score, reverse=True)
+    return SearchResults(
+        hits=hits[:limit],
+        plan=plans,
+        degraded=degraded,
+        elapsed_ms=(time.perf_counter() - started) * 1000,
+    )
@@ -0,0 +1,263 @@
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Any, Iterable
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.models.document import Document
+from app.models.note import NoteTags, Notes
+from app.schemas.search import Suggestion
+
+SuggestKey = tuple[str, int]
+
+_TOKEN_RE = re.compile(r"\w+")
+# Past this many words a title is only findable by its earlier ones
+_MAX_KEYS_PER_LABEL = 12
+# Sorts after every character a normalised key can contain
+_KEY_END = "\U0010ffff"
+
+
+def normalize(text: str) -> str:
+    """
+    Case- and accent-insensitive form used for keys and queries
+    """
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return " ".join(_TOKEN_RE.findall("".join(c for c in decomposed if not unicodedata.combining(c))))
+
+
+def _label_keys(label: str) -> list[tuple[str, int]]:
+    # The label from each word onwards, so "kubernetes basics" is found by "bas"
+    normalized = normalize(label)
+    starts = [match.start() for match in re.finditer(r"\S+", normalized)][:_MAX_KEYS_PER_LABEL]
+    return [(normalized[start:], position) for position, start in enumerate(starts)]
+
+
+class PrefixIndex:
+    """
+    One user's note titles, tag names and document titles as a sorted list
+    of ``(key, word position, kind, id)`` entries. A prefix query is a
+    ``bisect`` range; updates are ``insort`` and a delete by bisect.
+    """
+
+    def __init__(self, items: Iterable[tuple[str, int, str]] = ()):
+        self.labels: dict[SuggestKey, str] = {}
+        entries = []
+        for kind, ref_id, label in items:
+            self.labels[(kind, ref_id)] = label
+            entries.extend((key, position, kind, ref_id) for key, position in _label_keys(label))
+        entries.sort()
+        self.entries: list[tuple[str, int, str, int]] = entries
+        self.loaded_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def add(self, kind: str, ref_id: int, label: str) -> None:
+        self.remove(kind, ref_id)
+        self.labels[(kind, ref_id)] = label
+        for key, position in _label_keys(label):
+            insort(self.entries, (key, position, kind, ref_id))
+
+    def remove(self, kind: str, ref_id: int) -> None:
+        label = self.labels.pop((kind, ref_id), None)
+        if label is None:
+            return
+        for key, position in _label_keys(label):
+            entry = (key, position, kind, ref_id)
+            index = bisect_left(self.entries, entry)
+            if index < len(self.entries) and self.entries[index] == entry:
+                del self.entries[index]
+
+    def _scan(self, prefix: str, limit: int) -> Iterable[tuple[str, int, str, int]]:
+        start = bisect_left(self.entries, (prefix,))
+        end = min(bisect_left(self.entries, (prefix + _KEY_END,)), start + limit)
+        return self.entries[start:end]
+
+    def _next_chars(self, prefix: str) -> list[str]:
+        # Characters that follow ``prefix`` in some key, one bisect per character
+        chars = []
+        # "\x00" never occurs in a key, so this skips keys equal to the prefix
+        index = bisect_left(self.entries, (prefix + "\x00",))
+        while index < len(self.entries) and self.entries[index][0].startswith(prefix):
+            char = self.entries[index][0][len(prefix)]
+            chars.append(char)
+            index = bisect_left(self.entries, (prefix + char + _KEY_END,), index)
+        return chars
+
+    def _edits(self, word: str) -> set[str]:
+        """
+        Strings one insertion, deletion, substitution or transposition away
+        from ``word``. Only characters that occur after the unchanged part in
+        some key are tried, and positions past the point where ``word``
+        stops matching any key are skipped: no edit there can match.
+        """
+        edits = set()
+        for i in range(len(word) + 1):
+            left, right = word[:i], word[i:]
+            if right:
+                edits.add(left + right[1:])
+            if len(right) > 1:
+                edits.add(left + right[1] + right[0] + right[2:])
+            following = self._next_chars(left)
+            for char in following:
+                if right:
+                    edits.add(left + char + right[1:])
+                edits.add(left + char + right)
+            if not following:
+                break
+        edits.discard(word)
+        return edits
+
+    def search(self, query: str, limit: int, kinds: set[str] | None = None) -> list[Suggestion]:
+        """
+        Labels with a word starting with ``query``; when there are fewer than
+        ``limit``, also those one typo away. Title starts rank first, then
+        exact words, then shorter labels.
+        """
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        best: dict[SuggestKey, tuple] = {}
+
+        def collect(candidate: str, fuzzy: bool, scan_limit: int) -> None:
+            for key, position, kind, ref_id in self._scan(candidate, scan_limit):
+                if kinds and kind not in kinds:
+                    continue
+                exact_word = key == candidate or key[len(candidate)] == " "
+                rank = (fuzzy, position > 0, not exact_word, len(self.labels[(kind, ref_id)]))
+                if rank < best.get((kind, ref_id), (True, True, True, 1 << 30)):
+                    best[(kind, ref_id)] = rank
+
+        collect(prefix, False, settings.SUGGEST_SCAN_LIMIT)
+        if len(best) < limit and len(prefix) >= settings.SUGGEST_FUZZY_MIN_LENGTH:
+            for candidate in self._edits(prefix):
+                collect(candidate, True, limit)
+        ranked = sorted(best, key=best.__getitem__)[:limit]
+        return [
+            Suggestion(type=kind, id=ref_id, label=self.labels[(kind, ref_id)], fuzzy=best[(kind, ref_id)][0])
+            for kind, ref_id in ranked
+        ]
+
+
+async def load_prefix_index(*, session: AsyncSession, user_id: int) -> PrefixIndex:
+    notes = (await session.exec(
+        select(Notes.id, Notes.title).where(Notes.user_id == user_id, col(Notes.is_deleted).is_(False))
+    )).all()
+    tags = (await session.exec(select(NoteTags.id, NoteTags.name).where(NoteTags.user_id == user_id))).all()
+    documents = (await session.exec(
+        select(Document.id, Document.title).where(Document.user_id == user_id, col(Document.is_deleted).is_(False))
+    )).all()
+    return PrefixIndex(
+        [("note", ref_id, label) for ref_id, label in notes]
+        + [("tag", ref_id, label) for ref_id, label in tags]
+        + [("document", ref_id, label) for ref_id, label in documents]
+    )
+
+
+class SuggestCache:
+    """
+    Prefix indexes of the most recently active users, built on first use.
+    The ORM hooks below keep them current as notes, tags and documents are
+    committed in this process; entries are rebuilt after SUGGEST_CACHE_TTL
+    so writes from other processes show up. Code that writes with bulk
+    statements, which skip the hooks, calls ``invalidate``.
+    """
+
+    def __init__(self, max_users: int | None = None, ttl: int | None = None):
+        self.max_users = max_users or settings.SUGGEST_CACHE_MAX_USERS
+        self.ttl = ttl or settings.SUGGEST_CACHE_TTL
+        self._indexes: OrderedDict[int, PrefixIndex] = OrderedDict()
+        self.lock = threading.RLock()
+
+    async def get(self, *, session: AsyncSession, user_id: int) -> PrefixIndex:
+        with self.lock:
+            index = self._indexes.get(user_id)
+            if index is not None and time.monotonic() - index.loaded_at < self.ttl:
+                self._indexes.move_to_end(user_id)
+                return index
+        index = await load_prefix_index(session=session, user_id=user_id)
+        with self.lock:
+            self._indexes[user_id] = index
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+        return index
+
+    async def suggest(
+        self, *, session: AsyncSession, user_id: int, query: str, limit: int, kinds: set[str] | None = None
+    ) -> list[Suggestion]:
+        index = await self.get(session=session, user_id=user_id)
+        with self.lock:
+            return index.search(query, limit, kinds)
+
+    def invalidate(self, user_id: int) -> None:
+        with self.lock:
+            self._indexes.pop(user_id, None)
+
+    def apply(self, changes: list[tuple[int, str, int, str | None]]) -> None:
+        """
+        ``(user_id, kind, id, label)`` changes; a None label removes the entry
+        """
+        with self.lock:
+            for user_id, kind, ref_id, label in changes:
+                index = self._indexes.get(user_id)
+                if index is None:
+                    continue
+                if label is None:
+                    index.remove(kind, ref_id)
+                else:
+                    index.add(kind, ref_id, label)
+
+
+suggest_cache = SuggestCache()
+
+# Model, suggestion kind, label attribute
+_INDEXED = ((Notes, "note", "title"), (NoteTags, "tag", "name"), (Document, "document", "title"))
+
+
+def _suggest_change(obj: Any, deleted: bool) -> tuple[int, str, int, str | None] | None:
+    for model, kind, attribute in _INDEXED:
+        if isinstance(obj, model):
+            gone = deleted or getattr(obj, "is_deleted", False)
+            return obj.user_id, kind, obj.id, None if gone else getattr(obj, attribute)
+    return None
+
+
+@event.listens_for(OrmSession, "after_flush")
+def _collect_suggest_changes(session: OrmSession, flush_context) -> None:
+    changes = session.info.setdefault("suggest_changes", [])
+    for obj in session.new:
+        change = _suggest_change(obj, deleted=False)
+        if change:
+            changes.append(change)
+    for obj in session.deleted:
+        change = _suggest_change(obj, deleted=True)
+        if change:
+            changes.append(change)
+    for obj in session.dirty:
+        change = _suggest_change(obj, deleted=False)
+        state = inspect(obj)
+        if change and any(
+            state.attrs[name].history.has_changes() for name in ("title", "name", "is_deleted") if name in state.attrs
+        ):
+            changes.append(change)
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _apply_suggest_changes(session: OrmSession) -> None:
+    changes = session.info.pop("suggest_changes", None)
+    if changes:
+        suggest_cache.apply(changes)
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _drop_suggest_changes(session: OrmSession) -> None:
+    session.info.pop("suggest_changes", None)
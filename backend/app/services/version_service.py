@@ -0,0 +1,168 @@
+import json
+import zlib
+from datetime import datetime, timedelta
+from difflib import SequenceMatcher
+
+from sqlalchemy.orm import defer
+from sqlmodel import col, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.models.note import Notes, NoteVersions
+
+
+def _pack(content: str) -> bytes:
+    return zlib.compress(content.encode())
+
+
+def _unpack(payload: bytes) -> str:
+    return zlib.decompress(payload).decode()
+
+
+def encode_delta(old: str, new: str) -> bytes:
+    """
+    Line diff from ``old`` to ``new`` as a compressed op list: a positive
+    int copies that many lines, a negative int skips them, a string is
+    inserted as is.
+    """
+    a, b = old.splitlines(keepends=True), new.splitlines(keepends=True)
+    ops: list[int | str] = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, a, b).get_opcodes():
+        if tag == "equal":
+            ops.append(i2 - i1)
+            continue
+        if i2 > i1:
+            ops.append(i1 - i2)
+        if j2 > j1:
+            ops.append("".join(b[j1:j2]))
+    return zlib.compress(json.dumps(ops, separators=(",", ":")).encode())
+
+
+def apply_delta(base: str, delta: bytes) -> str:
+    lines = base.splitlines(keepends=True)
+    out, position = [], 0
+    for op in json.loads(zlib.decompress(delta)):
+        if isinstance(op, str):
+            out.append(op)
+        elif op > 0:
+            out.extend(lines[position:position + op])
+            position += op
+        else:
+            position -= op
+    return "".join(out)
+
+
+def replay(rows: list[NoteVersions]) -> list[str]:
+    """
+    Contents of consecutive versions, starting from a snapshot
+    """
+    if rows and not rows[0].is_snapshot:
+        raise ValueError(f"History of note {rows[0].note_id} does not start at a snapshot")
+    contents: list[str] = []
+    for row in rows:
+        contents.append(_unpack(row.payload) if row.is_snapshot else apply_delta(contents[-1], row.payload))
+    return contents
+
+
+async def _version_chain(*, session: AsyncSession, note_id: int, version: int) -> list[NoteVersions]:
+    # The nearest snapshot and the diffs after it, in one query
+    snapshot = (
+        select(func.max(NoteVersions.version))
+        .where(NoteVersions.note_id == note_id, col(NoteVersions.is_snapshot).is_(True), NoteVersions.version <= version)
+        .scalar_subquery()
+    )
+    statement = (
+        select(NoteVersions)
+        .where(NoteVersions.note_id == note_id, NoteVersions.version >= snapshot, NoteVersions.version <= version)
+        .order_by(NoteVersions.version)
+    )
+    return list((await session.exec(statement)).all())
+
+
+async def get_version(*, session: AsyncSession, note_id: int, version: int) -> tuple[NoteVersions, str] | None:
+    """
+    A version and its content. At most NOTE_VERSION_SNAPSHOT_INTERVAL diffs
+    are applied.
+    """
+    rows = await _version_chain(session=session, note_id=note_id, version=version)
+    if not rows or rows[-1].version != version:
+        return None
+    return rows[-1], replay(rows)[-1]
+
+
+async def list_versions(
+    *, session: AsyncSession, note_id: int, with_content: bool = False
+) -> list[tuple[NoteVersions, str | None]]:
+    """
+    The whole history of a note, oldest first, in a single query. Contents
+    are rebuilt in one forward pass when ``with_content`` is set.
+    """
+    statement = select(NoteVersions).where(NoteVersions.note_id == note_id).order_by(NoteVersions.version)
+    if not with_content:
+        statement = statement.options(defer(NoteVersions.payload))  # type: ignore
+    rows = list((await session.exec(statement)).all())
+    if not with_content:
+        return [(row, None) for row in rows]
+    return list(zip(rows, replay(rows)))
+
+
+async def save_note(
+    *, session: AsyncSession, note: Notes, title: str, content: str, edited_by: int
+) -> NoteVersions:
+    """
+    Apply an edit and record it in the note's history. Edits by the same
+    user within NOTE_AUTOSAVE_WINDOW of the latest version are folded into
+    it instead of starting a new one.
+    """
+    # Lock the note so concurrent autosaves are applied one at a time
+    await session.refresh(note, with_for_update=True)
+    now = datetime.now()
+    previous = note.content
+    latest = (await session.exec(
+        select(NoteVersions).where(NoteVersions.note_id == note.id, NoteVersions.version == note.version)
+    )).first()
+
+    if latest is None:
+        # Notes written before the version store get their current content as the base
+        latest = NoteVersions(
+            note_id=note.id, version=note.version, is_snapshot=True, payload=_pack(previous),
+            title=note.title, char_count=len(previous), edited_by=note.user_id,
+            created_at=note.last_edited_at, updated_at=note.last_edited_at,
+        )
+        session.add(latest)
+    elif latest.edited_by == edited_by and now - latest.updated_at < timedelta(seconds=settings.NOTE_AUTOSAVE_WINDOW):
+        if latest.is_snapshot:
+            latest.payload = _pack(content)
+        else:
+            base = await get_version(session=session, note_id=note.id, version=latest.version - 1)
+            latest.payload = encode_delta(base[1] if base else "", content)
+        latest.title, latest.char_count, latest.updated_at = title, len(content), now
+        session.add(latest)
+        return await _apply_edit(session=session, note=note, title=title, content=content, version=latest, now=now)
+
+    last_snapshot = (await session.exec(
+        select(func.max(NoteVersions.version))
+        .where(NoteVersions.note_id == note.id, col(NoteVersions.is_snapshot).is_(True))
+    )).one() or latest.version
+    number = latest.version + 1
+    delta, full = encode_delta(previous, content), _pack(content)
+    # A diff bigger than the content (e.g. a rewrite) is stored as a snapshot
+    is_snapshot = number - last_snapshot >= settings.NOTE_VERSION_SNAPSHOT_INTERVAL or len(delta) >= len(full)
+    version = NoteVersions(
+        note_id=note.id, version=number, is_snapshot=is_snapshot, payload=full if is_snapshot else delta,
+        title=title, char_count=len(content), edited_by=edited_by, created_at=now, updated_at=now,
+    )
+    session.add(version)
+    return await _apply_edit(session=session, note=note, title=title, content=content, version=version, now=now)
+
+
+async def _apply_edit(
+    *, session: AsyncSession, note: Notes, title: str, content: str, version: NoteVersions, now: datetime
+) -> NoteVersions:
+    note.title, note.content, note.version = title, content, version.version
+    note.char_count, note.word_count = len(content), len(content.split())
+    note.last_edited_at = note.updated_at = now
+    session.add(note)
+    await session.commit()
+    await session.refresh(version)
+    return version
@@ -0,0 +1,120 @@
+import mimetypes
+import uuid
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+from app.core.config import settings
+
+READ_BUFFER_SIZE = 1024 * 1024  # 1 MB
+TEXT_PAGE_CHARS = 20_000  # plain text has no pages, so split it into pages of about this size
+
+
+class FileTooLargeError(ValueError):
+    pass
+
+
+class UnsupportedFileTypeError(ValueError):
+    pass
+
+
+def get_file_type(file_name: str) -> str:
+    extension = Path(file_name).suffix.lower()
+    if extension not in settings.ALLOWED_EXTENSIONS:
+        raise UnsupportedFileTypeError(f"File type '{extension}' is not supported")
+    return extension
+
+
+def get_mime_type(file_name: str) -> str:
+    return mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+
+
+def save_upload(source: BinaryIO, file_name: str, user_id: int) -> tuple[Path, int]:
+    """
+    Stream an upload to ``UPLOAD_DIR/<user_id>/`` in fixed-size reads,
+    aborting as soon as it grows past ``MAX_FILE_SIZE``.
+    Returns the stored path and its size in bytes.
+    """
+    directory = Path(settings.UPLOAD_DIR) / str(user_id)
+    directory.mkdir(parents=True, exist_ok=True)
+    destination = directory / f"{uuid.uuid4().hex}{get_file_type(file_name)}"
+    size = 0
+    try:
+        with open(destination, "wb") as out:
+            while block := source.read(READ_BUFFER_SIZE):
+                size += len(block)
+                if size > settings.MAX_FILE_SIZE:
+                    raise FileTooLargeError(
+                        f"File exceeds the maximum size of {settings.MAX_FILE_SIZE} bytes"
+                    )
+                out.write(block)
+    except BaseException:
+        destination.unlink(missing_ok=True)
+        raise
+    return destination, size
+
+
+def iter_pages(path: Path | str, file_type: str) -> Iterator[tuple[int, str]]:
+    """
+    Yield ``(page_number, text)`` one page at a time, starting at 1.
+    """
+    path = Path(path)
+    if file_type == ".pdf":
+        yield from _iter_pdf_pages(path)
+    elif file_type == ".docx":
+        yield from _iter_docx_pages(path)
+    elif file_type in (".txt", ".md"):
+        yield from _iter_text_pages(path)
+    else:
+        raise UnsupportedFileTypeError(f"File type '{file_type}' is not supported")
+
+
+def _iter_text_pages(path: Path) -> Iterator[tuple[int, str]]:
+    page_number = 1
+    buffer: list[str] = []
+    buffered = 0
+    with open(path, encoding="utf-8", errors="replace") as f:
+        # Bounded reads, so a file without newlines cannot blow up a page
+        while line := f.readline(TEXT_PAGE_CHARS):
+            # Form feeds are explicit page breaks
+            *complete, line = line.split("\f")
+            for part in complete:
+                buffer.append(part)
+                yield page_number, "".join(buffer)
+                page_number += 1
+                buffer, buffered = [], 0
+            buffer.append(line)
+            buffered += len(line)
+            if buffered >= TEXT_PAGE_CHARS:
+                yield page_number, "".join(buffer)
+                page_number += 1
+                buffer, buffered = [], 0
+    if any(part.strip() for part in buffer):
+        yield page_number, "".join(buffer)
+
+
+def _iter_pdf_pages(path: Path) -> Iterator[tuple[int, str]]:
+    from pypdf import PdfReader
+
+    # Given a path, pypdf reads the whole file into memory; a handle is read lazily
+    with open(path, "rb") as file:
+        reader = PdfReader(file)
+        for page_number, page in enumerate(reader.pages, start=1):
+            yield page_number, page.extract_text() or ""
+
+
+def _iter_docx_pages(path: Path) -> Iterator[tuple[int, str]]:
+    from docx import Document as DocxDocument
+
+    # python-docx has no notion of rendered pages; group paragraphs instead
+    page_number = 1
+    buffer: list[str] = []
+    buffered = 0
+    for paragraph in DocxDocument(str(path)).paragraphs:
+        buffer.append(paragraph.text)
+        buffered += len(paragraph.text)
+        if buffered >= TEXT_PAGE_CHARS:
+            yield page_number, "\n".join(buffer)
+            page_number += 1
+            buffer, buffered = [], 0
+    if buffer:
+        yield page_number, "\n".join(buffer)
@@ -0,0 +1,158 @@
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Generic, Literal, Sequence, TypeVar
+
+from sqlalchemy import Select, tuple_
+from sqlmodel import SQLModel, func, select, text
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+T = TypeVar("T")
+
+CountMode = Literal["exact", "approximate", "cached", "none"]
+
+
+class InvalidCursorError(ValueError):
+    """
+    The cursor is malformed or was issued for a different ordering
+    """
+
+
+@dataclass
+class Page(Generic[T]):
+    items: list[T]
+    next_cursor: str | None
+
+
+def encode_cursor(key: str, value: datetime, row_id: int) -> str:
+    payload = json.dumps([key, value.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, key: str) -> tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_key, value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        if cursor_key != key:
+            raise InvalidCursorError(f"Cursor was issued for ordering by '{cursor_key}'")
+        return datetime.fromisoformat(value), int(row_id)
+    except InvalidCursorError:
+        raise
+    except (ValueError, TypeError):
+        raise InvalidCursorError("Malformed cursor")
+
+
+def keyset_paginate(
+    statement: Select,
+    *,
+    sort_column: Any,
+    id_column: Any,
+    limit: int,
+    cursor: str | None = None,
+    descending: bool = True,
+) -> Select:
+    """
+    Order ``statement`` by ``(sort_column, id_column)`` and continue after
+    ``cursor``. The row comparison walks the matching index from the cursor,
+    so page 1000 costs the same as page 1. Fetches one extra row so
+    ``build_page`` can tell whether there is a next page.
+
+    ``sort_column`` is one of created_at, updated_at or last_message_at and
+    must not be NULL.
+    """
+    key = (sort_column, id_column)
+    if cursor:
+        value, row_id = decode_cursor(cursor, sort_column.key)
+        boundary = tuple_(*key)
+        after = tuple_(value, row_id)
+        statement = statement.where(boundary < after if descending else boundary > after)
+    order = [column.desc() if descending else column.asc() for column in key]
+    return statement.order_by(*order).limit(limit + 1)
+
+
+def build_page(rows: Sequence[T], *, sort_column: Any, id_column: Any, limit: int) -> Page[T]:
+    items = list(rows[:limit])
+    next_cursor = None
+    if len(rows) > limit and items:
+        last = items[-1]
+        next_cursor = encode_cursor(
+            sort_column.key, getattr(last, sort_column.key), getattr(last, id_column.key)
+        )
+    return Page(items=items, next_cursor=next_cursor)
+
+
+async def fetch_page(
+    session: AsyncSession,
+    statement: Select,
+    *,
+    sort_column: Any,
+    id_column: Any,
+    limit: int,
+    cursor: str | None = None,
+    descending: bool = True,
+) -> Page:
+    paginated = keyset_paginate(
+        statement, sort_column=sort_column, id_column=id_column,
+        limit=limit, cursor=cursor, descending=descending,
+    )
+    rows = (await session.exec(paginated)).all()
+    return build_page(rows, sort_column=sort_column, id_column=id_column, limit=limit)
+
+
+async def exact_count(session: AsyncSession, statement: Select) -> int:
+    count_statement = select(func.count()).select_from(
+        statement.order_by(None).limit(None).offset(None).subquery()
+    )
+    return (await session.exec(count_statement)).one()
+
+
+async def approximate_count(session: AsyncSession, model: type[SQLModel]) -> int:
+    """
+    Row count of a whole table from the planner's statistics (pg_class.reltuples),
+    as of the last ANALYZE or autovacuum. Exact for tables never analysed.
+    """
+    result = await session.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"),
+        {"table": model.__tablename__},
+    )
+    reltuples = result.scalar()
+    if reltuples is None or reltuples < 0:
+        return await exact_count(session, select(model))
+    return int(reltuples)
+
+
+_count_cache: TTLCache[str, int] = TTLCache(maxsize=4096, ttl=settings.PAGINATION_COUNT_CACHE_TTL)
+
+
+async def cached_count(session: AsyncSession, statement: Select) -> int:
+    """
+    Exact count of ``statement``'s rows, reused for PAGINATION_COUNT_CACHE_TTL
+    seconds. Unlike ``approximate_count`` it works for filtered queries.
+    """
+    compiled = statement.compile()
+    key = f"{compiled}|{sorted(compiled.params.items(), key=lambda item: item[0])!r}"
+    count = _count_cache.get(key)
+    if count is None:
+        count = await exact_count(session, statement)
+        _count_cache.set(key, count)
+    return count
+
+
+async def count_rows(
+    session: AsyncSession, statement: Select, model: type[SQLModel], mode: CountMode
+) -> int | None:
+    """
+    Total for a list endpoint. ``approximate`` only applies to unfiltered
+    listings of ``model``'s table; pass ``cached`` for filtered ones.
+    """
+    if mode == "none":
+        return None
+    if mode == "approximate":
+        return await approximate_count(session, model)
+    if mode == "cached":
+        return await cached_count(session, statement)
+    return await exact_count(session, statement)
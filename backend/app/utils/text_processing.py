@@ -0,0 +1,252 @@
+import hashlib
+import re
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from itertools import accumulate
+from typing import Iterable, Iterator
+
+import numpy as np
+
+# Words plus individual punctuation marks: a close, cheap stand-in for BPE token counts
+_PUNCTUATION_RE = re.compile(r"[^\w\s]", re.UNICODE)
+# Blank lines, or a newline directly before a markdown heading, start a new block
+_BLOCK_RE = re.compile(r"\n\s*\n|\n(?=#{1,6}\s)")
+_HEADING_RE = re.compile(r"#{1,6}\s+(.+?)\s*#*\s*$")
+# Split keeping the mark: a pattern that starts with it is much faster to scan
+# than the equivalent lookbehind
+_SENTENCE_RE = re.compile(r"([.!?])\s+")
+# The ASCII characters _PUNCTUATION_RE matches
+_ASCII_PUNCTUATION = bytes(c for c in range(128) if _PUNCTUATION_RE.match(chr(c)))
+# Per-byte lookup tables for counting many ASCII texts at once
+_IS_PUNCTUATION = np.zeros(256, dtype=bool)
+_IS_PUNCTUATION[list(_ASCII_PUNCTUATION)] = True
+_IS_SPACE = np.array([chr(c).isspace() for c in range(256)]) & (np.arange(256) < 128)
+# Texts counted per pass, bounding the arrays for a huge page
+_COUNT_BATCH = 4096
+# What joins a segment to the one before it, by whether it starts a paragraph
+_SEPARATORS = {True: "\n\n", False: " "}
+
+
+def hash_content(text: str) -> str:
+    """
+    Stable digest used for DocumentChunks.content_hash
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def count_tokens(text: str) -> int:
+    if text.isascii():
+        # Same count without a regex scan: bytes.translate deletes by table lookup
+        return len(text.split()) + len(text) - len(text.encode().translate(None, _ASCII_PUNCTUATION))
+    return len(text.split()) + len(_PUNCTUATION_RE.findall(text))
+
+
+def count_tokens_many(texts: list[str]) -> list[int]:
+    """
+    ``count_tokens`` of each text. ASCII texts are counted together with
+    array operations: a token is a punctuation mark or the first character
+    of a word, so a text's count is the number of those positions in its span.
+    """
+    counts: list[int] = []
+    for start in range(0, len(texts), _COUNT_BATCH):
+        batch = texts[start:start + _COUNT_BATCH]
+        # Joined by a space, so no word runs across two texts
+        joined = " ".join(batch)
+        if not joined.isascii():
+            counts.extend(map(count_tokens, batch))
+            continue
+        data = np.frombuffer(joined.encode(), dtype=np.uint8)
+        space = _IS_SPACE[data]
+        word_start = ~space
+        word_start[1:] &= space[:-1]
+        bounds = np.zeros(len(batch) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter(map(len, batch), dtype=np.int64, count=len(batch)) + 1, out=bounds[1:])
+        tokens = np.zeros(len(batch), dtype=np.int64)
+        for positions in (np.flatnonzero(word_start), np.flatnonzero(_IS_PUNCTUATION[data])):
+            tokens += np.diff(np.searchsorted(positions, bounds))
+        counts.extend(tokens.tolist())
+    return counts
+
+
+def _sentences(block: str) -> list[str]:
+    parts = _SENTENCE_RE.split(block)
+    # [sentence, mark, sentence, mark, ..., rest]
+    sentences = list(map(str.__add__, parts[::2], parts[1::2]))
+    if parts[-1]:
+        sentences.append(parts[-1])
+    return sentences
+
+
+@dataclass
+class TextChunk:
+    chunk_index: int
+    content: str
+    content_hash: str
+    char_count: int
+    token_count: int
+    page_number: int | None = None
+    section_title: str | None = None
+
+
+def _split_oversized(text: str, chunk_size: int) -> list[tuple[str, int]]:
+    """
+    Cut a segment over ``chunk_size`` tokens into pieces that fit, between
+    words where possible. A single word that is still too long (a URL,
+    base64, a rule of dashes) is cut by characters.
+    """
+    words: list[tuple[str, int]] = []
+    # A slice of n characters counts at most n + 1 tokens
+    width = max(chunk_size - 1, 1)
+    for word in text.split():
+        tokens = count_tokens(word)
+        if tokens <= chunk_size:
+            words.append((word, tokens))
+            continue
+        for start in range(0, len(word), width):
+            part = word[start:start + width]
+            words.append((part, count_tokens(part)))
+    pieces: list[tuple[str, int]] = []
+    piece: list[str] = []
+    piece_tokens = 0
+    for word, tokens in words:
+        if piece and piece_tokens + tokens > chunk_size:
+            pieces.append((" ".join(piece), piece_tokens))
+            piece, piece_tokens = [], 0
+        piece.append(word)
+        piece_tokens += tokens
+    if piece:
+        pieces.append((" ".join(piece), piece_tokens))
+    return pieces
+
+
+class _ChunkPacker:
+    """
+    Greedily packs runs of segments (sentences, headings) into chunks of at
+    most ``chunk_size`` tokens, repeating up to ``chunk_overlap`` tokens of
+    trailing segments at the start of the next chunk. Works on running token
+    totals, so each chunk's end and the next chunk's overlap are found by
+    bisection instead of adding segments one at a time.
+    """
+
+    def __init__(self, chunk_size: int, chunk_overlap: int):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = min(chunk_overlap, chunk_size // 2)
+        self.chunk_index = 0
+        self.section_title: str | None = None
+
+    def _emit(self, content: str, tokens: int, page_number: int | None) -> TextChunk:
+        chunk = TextChunk(
+            chunk_index=self.chunk_index,
+            content=content,
+            content_hash=hash_content(content),
+            char_count=len(content),
+            token_count=tokens,
+            page_number=page_number,
+            section_title=self.section_title[:255] if self.section_title else None,
+        )
+        self.chunk_index += 1
+        return chunk
+
+    def pack(
+        self, texts: list[str], tokens: list[int], starts: list[bool], page_number: int | None
+    ) -> Iterator[TextChunk]:
+        """
+        Chunks of one run of segments, given as parallel lists of text, token
+        count and whether it starts a paragraph. Runs end at headings and
+        page ends, and no overlap is carried across them.
+        """
+        size, overlap = self.chunk_size, self.chunk_overlap
+        if max(tokens, default=0) > size:
+            texts, tokens, starts = _split_run(texts, tokens, starts, size)
+        # Each segment with the separator that goes before it inside a chunk
+        joined = list(map(str.__add__, map(_SEPARATORS.__getitem__, starts), texts))
+        # totals[i]: tokens in segments [0, i); the chunk being built is [start, end)
+        totals = [0, *accumulate(tokens)]
+        start = end = emitted = 0
+        while True:
+            # Take the following segments while they fit
+            end = max(end, bisect_right(totals, totals[start] + size) - 1)
+            if end >= len(texts):
+                break
+            if end > emitted:
+                content = texts[start] + "".join(joined[start + 1:end])
+                yield self._emit(content, totals[end] - totals[start], page_number)
+                emitted = end
+                # Keep the trailing segments that fit in the overlap
+                start = bisect_left(totals, totals[end] - overlap, start)
+            # Drop leading overlap until the next segment fits beside it; a
+            # segment that fits nowhere (one mark at chunk_size 1) goes alone
+            start = max(start, min(bisect_left(totals, totals[end + 1] - size, start), end))
+            end += 1
+        if end > emitted:
+            content = texts[start] + "".join(joined[start + 1:end])
+            yield self._emit(content, totals[end] - totals[start], page_number)
+
+
+def _split_run(
+    texts: list[str], tokens: list[int], starts: list[bool], chunk_size: int
+) -> tuple[list[str], list[int], list[bool]]:
+    # Oversized segments replaced by their pieces; each first piece starts a paragraph
+    split_texts, split_tokens, split_starts = [], [], []
+    for text, count, starts_block in zip(texts, tokens, starts):
+        if count <= chunk_size:
+            split_texts.append(text)
+            split_tokens.append(count)
+            split_starts.append(starts_block)
+            continue
+        for index, (piece, piece_tokens) in enumerate(_split_oversized(text, chunk_size)):
+            split_texts.append(piece)
+            split_tokens.append(piece_tokens)
+            split_starts.append(index == 0)
+    return split_texts, split_tokens, split_starts
+
+
+def _page_runs(text: str) -> Iterator[tuple[str | None, list[str], list[int], list[bool]]]:
+    """
+    Split a page into runs of segments that are packed independently:
+    ``(heading, texts, tokens, starts)`` where ``heading`` is set when the
+    run opens with a markdown heading line. Token counts of the whole page
+    are computed in one pass.
+    """
+    runs: list[tuple[str | None, list[str], list[bool]]] = [(None, [], [])]
+    for block in _BLOCK_RE.split(text):
+        block = block.strip()
+        if not block:
+            continue
+        if block.startswith("#"):
+            first_line, _, block = block.partition("\n")
+            match = _HEADING_RE.match(first_line)
+            if match:
+                runs.append((match.group(1), [first_line], [True]))
+            else:
+                block = f"{first_line}\n{block}" if block else first_line
+        sentences = _sentences(block)
+        if sentences:
+            # The first sentence of a block starts a new paragraph
+            runs[-1][1].extend(sentences)
+            runs[-1][2].append(True)
+            runs[-1][2].extend([False] * (len(sentences) - 1))
+    counts = count_tokens_many([text for _, texts, _ in runs for text in texts])
+    offset = 0
+    for heading, texts, starts in runs:
+        yield heading, texts, counts[offset:offset + len(texts)], starts
+        offset += len(texts)
+
+
+def iter_chunks(
+    pages: Iterable[tuple[int, str]], chunk_size: int, chunk_overlap: int
+) -> Iterator[TextChunk]:
+    """
+    Split a stream of ``(page_number, text)`` pages into chunks of at most
+    ``chunk_size`` tokens with ``chunk_overlap`` tokens of overlap.
+
+    Chunks end on sentence boundaries and never span a page or a markdown
+    heading, so an edit only changes the chunks of the page and section it
+    touches. Each chunk records the heading it falls under as its section title.
+    """
+    packer = _ChunkPacker(chunk_size, chunk_overlap)
+    for page_number, text in pages:
+        for heading, texts, tokens, starts in _page_runs(text):
+            if heading is not None:
+                packer.section_title = heading
+            yield from packer.pack(texts, tokens, starts, page_number)
@@ -0,0 +1,133 @@
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.database import engine
+from app.services.activity_service import maintain_partitions
+from app.services.document_service import claim_next_document, run_ingestion_job
+from app.services.linking_service import find_users_with_stale_notes, run_auto_linking
+
+logger = logging.getLogger(__name__)
+
+# Seconds between activity log partition maintenance runs
+_PARTITION_MAINTENANCE_INTERVAL = 3600
+
+
+def _ignore_signals() -> None:
+    # Children finish their current job; the parent decides when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+
+class IngestionWorker:
+    """
+    Polls the documents table for queued uploads and runs them on a process
+    pool, so PDF/DOCX parsing and embedding are not serialised by the GIL.
+
+    The queue is the ``documents`` table itself (see ``claim_next_document``),
+    so any number of worker services can run against the same database.
+    """
+
+    def __init__(self, max_workers: int | None = None):
+        self.max_workers = max_workers or settings.INGEST_WORKERS
+        self._stopping = threading.Event()
+        self._slots = threading.Semaphore(self.max_workers)
+        self._linking: set[int] = set()
+        self._next_link_scan = 0.0
+        self._next_partition_maintenance = 0.0
+        # spawn, not fork: children must not share the parent's pooled connections
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_ignore_signals,
+        )
+
+    def stop(self, *_: object) -> None:
+        logger.info("Ingestion worker stopping; waiting for running jobs to finish")
+        self._stopping.set()
+
+    def _on_done(self, document_id: int, future: Future) -> None:
+        self._slots.release()
+        try:
+            logger.info("Document %s finished with status %s", document_id, future.result())
+        except Exception:
+            # The child died before process_document could record the failure;
+            # the job's lease expires and it is claimed again.
+            logger.exception("Ingestion job for document %s crashed", document_id)
+
+    def _on_linked(self, user_id: int, future: Future) -> None:
+        self._slots.release()
+        self._linking.discard(user_id)
+        try:
+            future.result()
+        except Exception:
+            logger.exception("Auto-linking for user %s failed", user_id)
+
+    def _schedule_auto_linking(self) -> None:
+        """
+        Every AUTO_LINK_INTERVAL, queue an auto-linking job for each user with
+        edited notes. Only idle slots are used, so uploads are never held up.
+        """
+        if not settings.AUTO_LINK_ENABLED or time.monotonic() < self._next_link_scan:
+            return
+        self._next_link_scan = time.monotonic() + settings.AUTO_LINK_INTERVAL
+        with Session(engine) as session:
+            user_ids = find_users_with_stale_notes(session=session)
+        for user_id in user_ids:
+            if user_id in self._linking:
+                continue
+            if not self._slots.acquire(blocking=False):
+                # Pool is busy; the rest wait for the next scan
+                self._next_link_scan = 0.0
+                return
+            self._linking.add(user_id)
+            future = self._pool.submit(run_auto_linking, user_id)
+            future.add_done_callback(lambda f, user_id=user_id: self._on_linked(user_id, f))
+
+    def _maintain_activity_log(self) -> None:
+        # Partitions are per month, so an hourly check is plenty
+        if time.monotonic() < self._next_partition_maintenance:
+            return
+        self._next_partition_maintenance = time.monotonic() + _PARTITION_MAINTENANCE_INTERVAL
+        try:
+            maintain_partitions()
+        except Exception:
+            logger.exception("Activity log partition maintenance failed")
+
+    def run(self) -> None:
+        logger.info("Ingestion worker started with %s processes", self.max_workers)
+        try:
+            while not self._stopping.is_set():
+                if not self._slots.acquire(timeout=settings.INGEST_POLL_INTERVAL):
+                    continue
+                with Session(engine) as session:
+                    document = claim_next_document(session=session)
+                if document is None:
+                    self._slots.release()
+                    self._schedule_auto_linking()
+                    self._maintain_activity_log()
+                    self._stopping.wait(settings.INGEST_POLL_INTERVAL)
+                    continue
+                future = self._pool.submit(run_ingestion_job, document.id)
+                future.add_done_callback(lambda f, document_id=document.id: self._on_done(document_id, f))
+        finally:
+            self._pool.shutdown(wait=True)
+            logger.info("Ingestion worker stopped")
+
+
+def main() -> None:
+    logging.basicConfig(level=settings.LOG_LEVEL, format=settings.LOG_FORMAT)
+    worker = IngestionWorker()
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()
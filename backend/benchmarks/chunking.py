@@ -0,0 +1,48 @@
+"""
+Chunking a one-million-word document at the default chunk size and overlap.
+
+Run from backend/: python -m benchmarks.chunking
+"""
+import random
+import time
+
+from app.utils.text_processing import count_tokens_many, iter_chunks
+
+VOCABULARY = [
+    "lorem", "ipsum", "dolor", "sit", "amet,", "consectetur", "adipiscing", "elit", "sed", "do", "eiusmod",
+    "tempor", "(incididunt)", "ut", "labore", "et", "dolore", "magna", "aliqua", "e.g.", "x-ray",
+]
+
+
+def document(words: int, rng: random.Random) -> str:
+    # Paragraphs of 3-8 sentences, with a heading now and then
+    paragraphs: list[str] = []
+    while words > 0:
+        sentences = []
+        for _ in range(rng.randint(3, 8)):
+            length = rng.randint(8, 25)
+            words -= length
+            sentences.append(" ".join(rng.choices(VOCABULARY, k=length)).capitalize() + rng.choice(".!?"))
+        paragraphs.append(" ".join(sentences))
+        if rng.random() < 0.05:
+            paragraphs.append(f"## Section {len(paragraphs)}")
+    return "\n\n".join(paragraphs)
+
+
+def main() -> None:
+    text = document(1_000_000, random.Random(0))
+    for chunk_size, chunk_overlap in ((512, 64), (256, 32)):
+        timings = []
+        for _ in range(5):
+            started = time.perf_counter()
+            chunks = list(iter_chunks([(1, text)], chunk_size, chunk_overlap))
+            timings.append(time.perf_counter() - started)
+        print(f"{chunk_size}/{chunk_overlap}: {len(chunks)} chunks, best {min(timings):.3f} s of 5")
+    sentences = text.replace("\n\n", " ").split(". ")
+    started = time.perf_counter()
+    count_tokens_many(sentences)
+    print(f"counting {len(sentences)} sentences: {time.perf_counter() - started:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Bulk tag, archive and move of 10k notes against the configured database.
+Uses the user with the most notes; needs at least 10k of them. Each pair
+of operations leaves the notes as they were.
+
+Run from backend/: python -m benchmarks.note_bulk_ops
+"""
+import asyncio
+import time
+
+from sqlmodel import col, func, select
+
+from app.core.database import async_session_maker
+from app.models.note import NoteFolders, Notes, NoteTags
+from app.services.note_service import archive_notes, move_notes, tag_notes, untag_notes
+
+
+async def benchmark() -> None:
+    async with async_session_maker() as session:
+        user_id = (await session.exec(
+            select(Notes.user_id).group_by(Notes.user_id).order_by(func.count().desc()).limit(1)
+        )).one()
+        note_ids = list((await session.exec(
+            select(Notes.id).where(Notes.user_id == user_id, col(Notes.is_deleted).is_(False)).limit(10_000)
+        )).all())
+        name = f"bulk-benchmark-{time.time_ns()}"
+        tag, folder = NoteTags(user_id=user_id, name=name), NoteFolders(user_id=user_id, name=name)
+        session.add_all([tag, folder])
+        await session.commit()
+        operations = [
+            ("tag", tag_notes, {"tag_ids": [tag.id]}),
+            ("untag", untag_notes, {"tag_ids": [tag.id]}),
+            ("archive", archive_notes, {"archived": True}),
+            ("unarchive", archive_notes, {"archived": False}),
+            ("move", move_notes, {"folder_id": folder.id}),
+            ("move back", move_notes, {"folder_id": None}),
+        ]
+        for label, operation, arguments in operations:
+            started = time.perf_counter()
+            outcomes = await operation(session=session, user_id=user_id, note_ids=note_ids, **arguments)
+            updated = sum(outcome == "updated" for outcome in outcomes.values())
+            print(f"{label}: {len(note_ids)} notes, {updated} updated in {time.perf_counter() - started:.3f} s")
+        await session.delete(tag)
+        await session.delete(folder)
+        await session.commit()
+
+
+if __name__ == "__main__":
+    asyncio.run(benchmark())
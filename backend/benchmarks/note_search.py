@@ -0,0 +1,62 @@
+"""
+Note search latency, p50 and p95, for terms from very common to rare,
+against the configured database. Uses the user with the most notes; terms
+are picked by how many of their newest 10k notes contain them.
+
+Run from backend/: python -m benchmarks.note_search
+"""
+import asyncio
+import time
+
+from sqlmodel import func, select, text
+
+from app.core.database import async_session_maker
+from app.models.note import note_search
+from app.services.search_service import SearchFilters, search
+
+RUNS = 20
+# Share of notes containing the term
+BANDS = [("very common", 0.5, 1.0), ("common", 0.02, 0.1), ("uncommon", 0.001, 0.005), ("rare", 0.0, 0.0003)]
+
+
+async def benchmark() -> None:
+    async with async_session_maker() as session:
+        user_id, total = (await session.exec(
+            select(note_search.c.user_id, func.count())
+            .group_by(note_search.c.user_id)
+            .order_by(func.count().desc())
+            .limit(1)
+        )).one()
+        sample = min(total, 10_000)
+        stats = (await session.exec(
+            text(
+                "SELECT word, ndoc FROM ts_stat($$SELECT search_vector FROM note_search WHERE user_id = "
+                f"{int(user_id)} ORDER BY note_id DESC LIMIT {sample}$$)"
+            )
+        )).all()
+        print(f"user {user_id}: {total} notes")
+        # Opens the branch connections, so the first timed run does not pay for it
+        await search(session=session, user_id=user_id, query="warm", entities=["note"], filters=SearchFilters())
+        for band, low, high in BANDS:
+            terms = [word for word, ndoc in stats if low * sample < ndoc <= high * sample][:5]
+            if not terms:
+                print(f"{band}: no terms")
+                continue
+            timings, strategies = [], set()
+            for run in range(RUNS):
+                for term in terms:
+                    started = time.perf_counter()
+                    results = await search(
+                        session=session, user_id=user_id, query=term, entities=["note"], filters=SearchFilters()
+                    )
+                    timings.append((time.perf_counter() - started) * 1000)
+                    strategies.update(plan.strategy for plan in results.plan)
+            timings.sort()
+            print(
+                f"{band} ({', '.join(terms)}): p50 {timings[len(timings) // 2]:.1f} ms, "
+                f"p95 {timings[int(len(timings) * 0.95)]:.1f} ms, {'/'.join(sorted(strategies))}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(benchmark())
@@ -0,0 +1,32 @@
+"""
+Storage and reconstruction cost of note history: one snapshot plus a diff
+per edit, against keeping every version in full.
+
+Run from backend/: python -m benchmarks.note_versions
+"""
+import random
+import time
+
+from app.core.config import settings
+from app.services.version_service import _pack, apply_delta, encode_delta
+
+
+def main() -> None:
+    rng = random.Random(0)
+    lines = [f"line {i} " + "lorem ipsum " * rng.randint(1, 12) + "\n" for i in range(400)]
+    versions = ["".join(lines)]
+    for _ in range(200):
+        lines[rng.randrange(len(lines))] = f"edited {rng.random()}\n"
+        versions.append("".join(lines))
+    deltas = [encode_delta(a, b) for a, b in zip(versions, versions[1:])]
+    stored = len(_pack(versions[0])) + sum(map(len, deltas))
+    print(f"full copies {sum(map(len, versions)) / 1e6:.2f} MB, snapshot + diffs {stored / 1e3:.1f} kB")
+    started = time.perf_counter()
+    content = versions[0]
+    for delta in deltas[:settings.NOTE_VERSION_SNAPSHOT_INTERVAL]:
+        content = apply_delta(content, delta)
+    print(f"worst-case reconstruction: {(time.perf_counter() - started) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
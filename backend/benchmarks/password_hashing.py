@@ -0,0 +1,39 @@
+"""
+Login throughput of the password hashing executor.
+
+Run from backend/: python -m benchmarks.password_hashing
+"""
+import asyncio
+import os
+import time
+
+from app.core.config import settings
+from app.core.security import get_password_hash, verify_password, verify_password_async
+
+PASSWORD = "correct horse battery staple"
+
+
+async def burst(hashed: str, n: int) -> float:
+    started = time.perf_counter()
+    await asyncio.gather(*(verify_password_async(PASSWORD, hashed) for _ in range(n)))
+    return n / (time.perf_counter() - started)
+
+
+def main() -> None:
+    hashed = get_password_hash(PASSWORD)
+    rounds = 20
+    started = time.perf_counter()
+    for _ in range(rounds):
+        verify_password(PASSWORD, hashed)
+    single = rounds / (time.perf_counter() - started)
+    print(f"1 thread: {single:.1f} logins/s")
+
+    workers = settings.PASSWORD_HASH_WORKERS
+    # The largest burst the executor accepts without answering 429
+    pooled = asyncio.run(burst(hashed, workers + settings.PASSWORD_HASH_QUEUE_SIZE))
+    cores = min(workers, os.cpu_count() or 1)
+    print(f"{workers} workers: {pooled:.1f} logins/s, {pooled / cores:.1f} logins/s per core")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Build, lookup and insert times of the search-as-you-type prefix index for
+50k random titles.
+
+Run from backend/: python -m benchmarks.suggest_index
+"""
+import random
+import string
+import time
+
+from app.services.suggest_service import PrefixIndex
+
+
+def main() -> None:
+    rng = random.Random(0)
+    vocabulary = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10))) for _ in range(5000)]
+    titles = [" ".join(rng.choices(vocabulary, k=rng.randint(1, 6))) for _ in range(50_000)]
+    started = time.perf_counter()
+    index = PrefixIndex(("note", i, title) for i, title in enumerate(titles))
+    print(f"built {len(index)} labels ({len(index.entries)} keys) in {time.perf_counter() - started:.2f} s")
+    long_words = [word for word in vocabulary if len(word) > 5]
+    for name, queries in (
+        ("prefix", [rng.choice(vocabulary)[:rng.randint(1, 4)] for _ in range(2000)]),
+        ("typo", [word[0] + word[2] + word[1] + word[3:] for word in rng.choices(long_words, k=500)]),
+    ):
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            index.search(query, 10)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        print(f"{name}: p50 {timings[len(timings) // 2]:.3f} ms, p99 {timings[int(len(timings) * 0.99)]:.3f} ms")
+    started = time.perf_counter()
+    for i in range(1000):
+        index.add("note", 100_000 + i, rng.choice(titles))
+    print(f"insert: {(time.perf_counter() - started):.3f} ms per label")
+
+
+if __name__ == "__main__":
+    main()
@@ -23,6 +23,7 @@ CREATE TABLE IF NOT EXISTS users (
     created_at TIMESTAMP DEFAULT NOW(),
     updated_at TIMESTAMP DEFAULT NOW(),
     last_login_at TIMESTAMP,
+    corpus_version INTEGER NOT NULL DEFAULT 0,
     
     -- Constraints
     CONSTRAINT email_format CHECK (email ~* '^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$')
@@ -56,6 +57,7 @@ CREATE TABLE IF NOT EXISTS documents (
     processing_started_at TIMESTAMP,
     processing_completed_at TIMESTAMP,
     processing_error TEXT,
+    processing_attempts INTEGER DEFAULT 0,
     
     -- Statistics
     word_count INTEGER,
@@ -66,7 +68,7 @@ CREATE TABLE IF NOT EXISTS documents (
     created_at TIMESTAMP DEFAULT NOW(),
     updated_at TIMESTAMP DEFAULT NOW(),
     last_accessed_at TIMESTAMP DEFAULT NOW()
-);
+) WITH (fillfactor = 90); -- free space for HOT updates of the access-tracking columns
 
 -- DOCUMENT CHUNK TABLE
 CREATE TABLE IF NOT EXISTS document_chunks (
@@ -139,7 +141,11 @@ CREATE TABLE IF NOT EXISTS chat_sessions (
     -- Timestamps
     created_at TIMESTAMP DEFAULT NOW(),
     updated_at TIMESTAMP DEFAULT NOW(),
-    last_message_at TIMESTAMP DEFAULT NOW()
+    last_message_at TIMESTAMP DEFAULT NOW(),
+    
+    -- Rolling summary of the messages older than the context window
+    summary TEXT,
+    summary_until TIMESTAMP
 );
 
 -- NOTES TABLE
@@ -163,6 +169,7 @@ CREATE TABLE IF NOT EXISTS notes (
     is_favorite BOOLEAN DEFAULT FALSE,
     is_archived BOOLEAN DEFAULT FALSE,
     is_pinned BOOLEAN DEFAULT FALSE,
+    is_deleted BOOLEAN DEFAULT FALSE,
     color VARCHAR(20),
     emoji VARCHAR(10),
     
@@ -190,7 +197,20 @@ CREATE TABLE IF NOT EXISTS notes (
     created_at TIMESTAMP DEFAULT NOW(),
     updated_at TIMESTAMP DEFAULT NOW(),
     last_accessed_at TIMESTAMP DEFAULT NOW(),
-    last_edited_at TIMESTAMP DEFAULT NOW()
+    last_edited_at TIMESTAMP DEFAULT NOW(),
+    embedded_at TIMESTAMP
+) WITH (fillfactor = 90); -- free space for HOT updates of the access-tracking columns
+-- Soft deletion came after the table; added to databases created before it
+ALTER TABLE notes ADD COLUMN IF NOT EXISTS is_deleted BOOLEAN DEFAULT FALSE;
+
+-- NOTE SEARCH TABLE
+-- Search vectors of live notes (title weighted above body), kept off the notes
+-- rows so moving, archiving or deleting notes neither copies them nor touches
+-- their GIN index. Maintained by the note_search_refresh trigger below.
+CREATE TABLE IF NOT EXISTS note_search (
+    note_id UUID PRIMARY KEY REFERENCES notes(id) ON DELETE CASCADE,
+    user_id UUID NOT NULL,
+    search_vector TSVECTOR NOT NULL
 );
 
 -- NOTE TAGS TABLE
@@ -257,6 +277,7 @@ CREATE TABLE IF NOT EXISTS chat_messages (
     model_used VARCHAR(100),
     tokens_used INTEGER,
     response_time_ms INTEGER,
+    time_to_first_token_ms INTEGER,
     
     -- Feedback
     rating INTEGER CHECK (rating >= 1 AND rating <= 5),
@@ -326,6 +347,8 @@ CREATE TABLE IF NOT EXISTS note_links (
     -- Link metadata
     link_type VARCHAR(50) DEFAULT 'related' CHECK (link_type IN ('related', 'reference', 'parent', 'child')),
     description TEXT,
+    is_auto BOOLEAN DEFAULT FALSE,
+    similarity REAL,
     
     -- Timestamps
     created_at TIMESTAMP DEFAULT NOW(),
@@ -335,9 +358,29 @@ CREATE TABLE IF NOT EXISTS note_links (
     CHECK (source_note_id != target_note_id)
 );
 
--- ACTIVITY LOG TABLE (for audit trail)
-CREATE TABLE IF NOT EXISTS activity_logs (
+-- NOTE VERSIONS TABLE (snapshots every few versions, compressed diffs in between)
+CREATE TABLE IF NOT EXISTS note_versions (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    note_id UUID NOT NULL REFERENCES notes(id) ON DELETE CASCADE,
+    version INTEGER NOT NULL,
+    is_snapshot BOOLEAN DEFAULT FALSE,
+    payload BYTEA NOT NULL, -- zlib: full content for snapshots, line diff otherwise
+    title VARCHAR(500) NOT NULL,
+    char_count INTEGER DEFAULT 0,
+    edited_by UUID REFERENCES users(id) ON DELETE SET NULL,
+    
+    -- Timestamps
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW(),
+    
+    -- Constraints
+    UNIQUE(note_id, version)
+);
+
+-- ACTIVITY LOG TABLE (for audit trail; monthly partitions are created and
+-- dropped by the application, see app/services/activity_service.py)
+CREATE TABLE IF NOT EXISTS activity_logs (
+    id UUID DEFAULT uuid_generate_v4(),
     user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
     
     -- Activity information
@@ -351,7 +394,16 @@ CREATE TABLE IF NOT EXISTS activity_logs (
     user_agent TEXT,
     
     -- Timestamps
-    created_at TIMESTAMP DEFAULT NOW()
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    
+    -- The partition key must be part of the primary key
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- RATE LIMITS TABLE (shared limiter state; unlogged, it is safe to lose on a crash)
+CREATE UNLOGGED TABLE IF NOT EXISTS rate_limits (
+    key VARCHAR(128) PRIMARY KEY, -- 'user:<id>' or 'ip:<address>'
+    tat DOUBLE PRECISION NOT NULL -- theoretical arrival time, epoch seconds
 );
 
 -- INDICES FOR PERFORMANCE
@@ -377,11 +429,10 @@ CREATE INDEX IF NOT EXISTS idx_note_folders_user_id ON note_folders(user_id);
 CREATE INDEX IF NOT EXISTS idx_note_folders_parent_id ON note_folders(parent_folder_id);
 
 -- Notes
-CREATE INDEX IF NOT EXISTS idx_notes_user_created ON notes(user_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_notes_user_created ON notes(user_id, created_at DESC, id DESC);
 CREATE INDEX IF NOT EXISTS idx_notes_folder_id ON notes(folder_id);
 CREATE INDEX IF NOT EXISTS idx_notes_favorite ON notes(user_id, updated_at DESC) WHERE is_favorite = true;
 CREATE INDEX IF NOT EXISTS idx_notes_archived ON notes(user_id, updated_at DESC) WHERE is_archived = true;
-CREATE INDEX IF NOT EXISTS idx_notes_search ON notes USING gin(to_tsvector('english', title || ' ' || content));
 CREATE INDEX IF NOT EXISTS idx_notes_linked_document ON notes(linked_document_id);
 CREATE INDEX IF NOT EXISTS idx_notes_linked_chat ON notes(linked_chat_session_id);
 
@@ -398,6 +449,7 @@ CREATE INDEX IF NOT EXISTS idx_chat_sessions_user_last_message ON chat_sessions(
 
 -- Chat Messages
 CREATE INDEX IF NOT EXISTS idx_chat_messages_session_created ON chat_messages(session_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_search ON chat_messages USING gin(to_tsvector('english', content));
 
 -- Activity Logs
 CREATE INDEX IF NOT EXISTS idx_activity_logs_user_created ON activity_logs(user_id, created_at DESC);
@@ -409,8 +461,11 @@ CREATE INDEX IF NOT EXISTS idx_documents_full_text ON documents
 USING gin(to_tsvector('english', coalesce(title, '') || ' ' || coalesce(content, '') || ' ' || coalesce(summary, '')));
 
 -- Combined search across notes
-CREATE INDEX IF NOT EXISTS idx_notes_full_text ON notes 
-USING gin(to_tsvector('english', coalesce(title, '') || ' ' || coalesce(content, '') || ' ' || coalesce(summary, '')));
+CREATE INDEX IF NOT EXISTS idx_note_search_vector ON note_search USING gin(search_vector);
+CREATE INDEX IF NOT EXISTS idx_note_search_user_note ON note_search(user_id, note_id DESC);
+-- Replaced by idx_note_search_vector; dropped from databases created before it
+DROP INDEX IF EXISTS idx_notes_search;
+DROP INDEX IF EXISTS idx_notes_full_text;
 
 -- Function to update updated_at timestamp
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -425,11 +480,15 @@ $$ language 'plpgsql';
 CREATE TRIGGER update_users_updated_at BEFORE UPDATE ON users
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
-CREATE TRIGGER update_documents_updated_at BEFORE UPDATE ON documents
-    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+-- Recording a read is not a modification: the access tracker's writes of
+-- last_accessed_at alone leave updated_at, and the list order, as they were
+CREATE OR REPLACE TRIGGER update_documents_updated_at BEFORE UPDATE ON documents
+    FOR EACH ROW WHEN (OLD.last_accessed_at IS NOT DISTINCT FROM NEW.last_accessed_at)
+    EXECUTE FUNCTION update_updated_at_column();
 
-CREATE TRIGGER update_notes_updated_at BEFORE UPDATE ON notes
-    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+CREATE OR REPLACE TRIGGER update_notes_updated_at BEFORE UPDATE ON notes
+    FOR EACH ROW WHEN (OLD.last_accessed_at IS NOT DISTINCT FROM NEW.last_accessed_at)
+    EXECUTE FUNCTION update_updated_at_column();
 
 CREATE TRIGGER update_note_folders_updated_at BEFORE UPDATE ON note_folders
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
@@ -451,7 +510,7 @@ BEGIN
 END;
 $$ language 'plpgsql';
 
-CREATE TRIGGER update_note_last_edited BEFORE UPDATE ON notes
+CREATE OR REPLACE TRIGGER update_note_last_edited BEFORE UPDATE OF content ON notes
     FOR EACH ROW EXECUTE FUNCTION update_note_last_edited();
 
 -- Function to update chat session last_message_at
@@ -480,10 +539,47 @@ BEGIN
 END;
 $$ language 'plpgsql';
 
-CREATE TRIGGER calculate_note_word_count BEFORE INSERT OR UPDATE ON notes
+CREATE OR REPLACE TRIGGER calculate_note_word_count BEFORE INSERT ON notes
     FOR EACH ROW WHEN (NEW.content IS NOT NULL)
     EXECUTE FUNCTION calculate_word_count();
 
+-- Only updates that change the content re-split it
+CREATE OR REPLACE TRIGGER recalculate_note_word_count BEFORE UPDATE OF content ON notes
+    FOR EACH ROW WHEN (NEW.content IS NOT NULL AND OLD.content IS DISTINCT FROM NEW.content)
+    EXECUTE FUNCTION calculate_word_count();
+
+-- Function to keep note_search in step with live notes
+CREATE OR REPLACE FUNCTION note_search_refresh()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.is_deleted THEN
+        DELETE FROM note_search WHERE note_id = NEW.id;
+    ELSE
+        INSERT INTO note_search (note_id, user_id, search_vector)
+        VALUES (
+            NEW.id, NEW.user_id,
+            setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(NEW.content, '') || ' ' || coalesce(NEW.summary, '')), 'B')
+        )
+        ON CONFLICT (note_id) DO UPDATE SET search_vector = EXCLUDED.search_vector;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- Only statements that set these columns refresh the vector
+CREATE OR REPLACE TRIGGER note_search_refresh AFTER INSERT OR UPDATE OF title, content, summary, is_deleted ON notes
+    FOR EACH ROW EXECUTE FUNCTION note_search_refresh();
+
+-- Vectors of the notes written before note_search existed
+INSERT INTO note_search (note_id, user_id, search_vector)
+SELECT id, user_id,
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(content, '') || ' ' || coalesce(summary, '')), 'B')
+FROM notes
+WHERE NOT is_deleted
+ON CONFLICT DO NOTHING;
+
 -- Function to update template usage count
 CREATE OR REPLACE FUNCTION increment_template_usage()
 RETURNS TRIGGER AS $$
@@ -0,0 +1,81 @@
+import uuid
+from collections.abc import Iterator
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def client() -> Iterator:
+    """
+    The app against the configured database (DATABASE_URL, FIRST_SUPERUSER,
+    FIRST_SUPERUSER_PASSWORD); tests using it are skipped when there is none
+    """
+    try:
+        from fastapi.testclient import TestClient
+        from sqlalchemy import text
+
+        from app.core.database import engine
+        from app.main import app
+
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    except Exception as exc:
+        pytest.skip(f"needs a configured database: {exc}")
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope="module")
+def user(client) -> Iterator[tuple[int, dict[str, str]]]:
+    """
+    A new user's id and auth headers; the user and everything they own are
+    deleted afterwards
+    """
+    from sqlmodel import Session, delete
+
+    from app.core.database import engine
+    from app.models.user import User
+
+    email, password = f"test-{uuid.uuid4().hex}@example.com", "password123"
+    client.post("/api/v1/users/signup", json={"email": email, "password": password})
+    token = client.post(
+        "/api/v1/login/access-token", data={"username": email, "password": password}
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    user_id = client.get("/api/v1/users/me", headers=headers).json()["id"]
+    yield user_id, headers
+    with Session(engine) as session:
+        session.exec(delete(User).where(User.id == user_id))  # type: ignore
+        session.commit()
+
+
+@pytest.fixture(scope="module")
+def notes(user) -> list[int]:
+    """
+    Twenty notes in a folder, each with two tags, links to its neighbours
+    and a collaborator: every relationship the list and detail views load
+    """
+    from sqlmodel import Session
+
+    from app.core.database import engine
+    from app.models.note import NoteCollaborators, NoteFolders, NoteLinks, Notes, NoteTagRelations, NoteTags
+
+    user_id, _ = user
+    with Session(engine) as session:
+        folder = NoteFolders(user_id=user_id, name="folder")
+        tags = [NoteTags(user_id=user_id, name=f"tag-{i}") for i in range(2)]
+        session.add(folder)
+        session.add_all(tags)
+        session.flush()
+        notes = [
+            Notes(user_id=user_id, folder_id=folder.id, title=f"note {i}", content=f"content {i}") for i in range(20)
+        ]
+        session.add_all(notes)
+        session.flush()
+        for previous, note in zip(notes, notes[1:]):
+            session.add(NoteLinks(source_note_id=previous.id, target_note_id=note.id))
+        for note in notes:
+            session.add_all([NoteTagRelations(note_id=note.id, tag_id=tag.id) for tag in tags])
+            session.add(NoteCollaborators(note_id=note.id, user_id=user_id))
+        session.commit()
+        return [note.id for note in notes]
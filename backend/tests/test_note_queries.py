@@ -0,0 +1,40 @@
+import pytest
+
+try:
+    # Importing the app reads its settings, which need the database configuration
+    from app.core.metrics import QueryBudgetExceeded, query_budget
+except Exception as exc:
+    pytest.skip(f"needs a configured database: {exc}", allow_module_level=True)
+
+# Statements a request may issue whatever the number of notes: the current
+# user's lookup, then the note_service profile (notes, tags; detail adds
+# links both ways and collaborators)
+LIST_BUDGET = 3
+DETAIL_BUDGET = 6
+
+
+def test_list_notes_within_query_budget(client, user, notes):
+    _, headers = user
+    with query_budget(LIST_BUDGET):
+        response = client.get("/api/v1/notes/", headers=headers)
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert len(data) == len(notes)
+    assert all(len(note["tags"]) == 2 for note in data)
+
+
+@pytest.mark.parametrize("position", [0, 10, 19])
+def test_read_note_within_query_budget(client, user, notes, position):
+    _, headers = user
+    with query_budget(DETAIL_BUDGET):
+        response = client.get(f"/api/v1/notes/{notes[position]}", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["id"] == notes[position]
+
+
+def test_query_budget_catches_a_query_per_note(client, user, notes):
+    _, headers = user
+    with pytest.raises(QueryBudgetExceeded, match=f"budget {DETAIL_BUDGET}"):
+        with query_budget(DETAIL_BUDGET):
+            for note_id in notes[:3]:
+                client.get(f"/api/v1/notes/{note_id}", headers=headers)
@@ -0,0 +1,42 @@
+import pytest
+
+try:
+    # Importing the app reads its settings, which need the database configuration
+    from app.core.database import async_session_maker
+    from app.core.metrics import query_budget
+    from app.services.note_service import get_notes, list_notes
+except Exception as exc:
+    pytest.skip(f"needs a configured database: {exc}", allow_module_level=True)
+
+
+def _load(client, profile: str, budget: int, user_id: int, note_ids: list[int]):
+    # On the app's event loop, where the async engine's connections live
+    async def load():
+        async with async_session_maker() as session:
+            with query_budget(budget):
+                if profile == "list":
+                    return (await list_notes(session=session, user_id=user_id, limit=200)).items
+                return await get_notes(session=session, user_id=user_id, note_ids=note_ids, profile=profile)
+
+    return client.portal.call(load)
+
+
+def test_list_profile_within_query_budget(client, user, notes):
+    user_id, _ = user
+    loaded = _load(client, "list", 2, user_id, notes)
+    assert sorted(note.id for note in loaded) == notes
+    assert all(note.folder and len(note.tags) == 2 for note in loaded)
+
+
+def test_detail_profile_within_query_budget(client, user, notes):
+    user_id, _ = user
+    loaded = _load(client, "detail", 5, user_id, notes)
+    assert [note.id for note in loaded] == notes
+    assert all(len(note.tags) == 2 and len(note.collaborators) == 1 for note in loaded)
+    assert sum(len(note.source_links) for note in loaded) == sum(len(note.target_links) for note in loaded) == 19
+
+
+def test_graph_profile_within_query_budget(client, user, notes):
+    user_id, _ = user
+    loaded = _load(client, "graph", 2, user_id, notes)
+    assert [[link.target_note_id for link in note.source_links] for note in loaded] == [[i] for i in notes[1:]] + [[]]
@@ -0,0 +1,72 @@
+import pytest
+
+try:
+    # Importing the service reads the app settings
+    from app.services.suggest_service import PrefixIndex, normalize
+except Exception as exc:
+    pytest.skip(f"needs the app settings: {exc}", allow_module_level=True)
+
+
+def _labels(index: PrefixIndex, query: str, limit: int = 10, kinds: set[str] | None = None) -> list[str]:
+    return [suggestion.label for suggestion in index.search(query, limit, kinds)]
+
+
+def test_normalize_folds_case_accents_and_punctuation():
+    assert normalize("  Café—Crème, BRÛLÉE! ") == "cafe creme brulee"
+
+
+def test_title_starts_rank_before_later_words():
+    index = PrefixIndex([("note", 1, "Intro to kubernetes"), ("note", 2, "Kubernetes basics")])
+    assert _labels(index, "kub") == ["Kubernetes basics", "Intro to kubernetes"]
+
+
+def test_exact_words_rank_before_longer_words():
+    index = PrefixIndex([("note", 1, "Pythonic idioms"), ("note", 2, "Python packaging tools")])
+    assert _labels(index, "python") == ["Python packaging tools", "Pythonic idioms"]
+
+
+def test_shorter_labels_break_ties():
+    index = PrefixIndex([("note", 1, "Rust async runtimes"), ("note", 2, "Rust ownership")])
+    assert _labels(index, "rust") == ["Rust ownership", "Rust async runtimes"]
+
+
+def test_query_matches_across_words_and_accents():
+    index = PrefixIndex([("note", 1, "Crème brûlée recipe"), ("note", 2, "Creme fraiche")])
+    assert _labels(index, "creme bru") == ["Crème brûlée recipe"]
+    assert _labels(index, "BRULEE") == ["Crème brûlée recipe"]
+
+
+@pytest.mark.parametrize("typo", ["kuberentes", "kubernets", "kubernetess", "kubernxtes"])
+def test_one_typo_away_is_found_and_marked_fuzzy(typo: str):
+    index = PrefixIndex([("note", 1, "Kubernetes basics"), ("note", 2, "Docker compose")])
+    suggestions = index.search(typo, 10)
+    assert [(suggestion.label, suggestion.fuzzy) for suggestion in suggestions] == [("Kubernetes basics", True)]
+
+
+def test_prefix_matches_rank_before_fuzzy_ones():
+    index = PrefixIndex([("note", 1, "Gravy"), ("note", 2, "Grape harvest season")])
+    suggestions = index.search("grap", 10)
+    assert [(suggestion.label, suggestion.fuzzy) for suggestion in suggestions] == [
+        ("Grape harvest season", False), ("Gravy", True),
+    ]
+
+
+def test_short_queries_are_matched_exactly():
+    index = PrefixIndex([("note", 1, "Gravy")])
+    assert _labels(index, "gx") == []
+
+
+def test_kinds_and_limit():
+    index = PrefixIndex([("note", 1, "Travel plans"), ("tag", 1, "travel"), ("document", 1, "Travel insurance")])
+    assert _labels(index, "trav", kinds={"tag"}) == ["travel"]
+    assert len(index.search("trav", 2)) == 2
+
+
+def test_add_replaces_and_remove_forgets_a_label():
+    index = PrefixIndex([("note", 1, "Old title")])
+    index.add("note", 1, "New title")
+    assert _labels(index, "old") == []
+    assert _labels(index, "new") == ["New title"]
+    index.remove("note", 1)
+    assert _labels(index, "title") == []
+    assert len(index) == 0 and index.entries == []
@@ -0,0 +1,65 @@
+import pytest
+
+from app.utils.text_processing import count_tokens, count_tokens_many, iter_chunks
+
+
+def _chunks(text: str, chunk_size: int = 100, chunk_overlap: int = 0):
+    return list(iter_chunks([(1, text)], chunk_size, chunk_overlap))
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "-" * 150,
+        "https://example.com/" + "a/" * 400,
+        "QUJD" * 2000,
+        "x" * 150 + " tail",
+    ],
+)
+def test_oversized_word_is_cut_by_characters(text: str):
+    chunks = _chunks(text)
+    assert len(chunks) > 1 or count_tokens(text) <= 100
+    assert all(chunk.token_count <= 100 for chunk in chunks)
+    assert "".join(chunk.content.replace(" ", "") for chunk in chunks) == text.replace(" ", "")
+
+
+def test_long_sentence_splits_between_words():
+    text = " ".join(f"word{i}" for i in range(250))
+    chunks = _chunks(text)
+    assert len(chunks) == 3
+    assert all(chunk.token_count <= 100 for chunk in chunks)
+    assert " ".join(chunk.content for chunk in chunks) == text
+
+
+def test_chunks_respect_size_and_overlap():
+    text = " ".join(f"Sentence number {i} ends here." for i in range(60))
+    chunks = _chunks(text, chunk_size=50, chunk_overlap=10)
+    assert all(chunk.token_count <= 50 for chunk in chunks)
+    # Each chunk after the first repeats the last sentence of the previous one
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.content.startswith(previous.content.rsplit(". ", 1)[-1])
+
+
+def test_headings_start_new_chunks():
+    chunks = _chunks("# Intro\n\nFirst part.\n\n# Details\n\nSecond part.")
+    assert [chunk.section_title for chunk in chunks] == ["Intro", "Details"]
+    assert [chunk.chunk_index for chunk in chunks] == [0, 1]
+
+
+def test_count_tokens_many_matches_count_tokens():
+    texts = ["", "plain words", "Punctuation, (lots) of it!", "tab\tand\x1cseparators", "naïve café.", "a" * 5000]
+    assert count_tokens_many(texts) == [count_tokens(text) for text in texts]
+    assert count_tokens_many([text for text in texts if text.isascii()]) == [
+        count_tokens(text) for text in texts if text.isascii()
+    ]
+
+
+def test_paragraphs_keep_their_breaks_inside_a_chunk():
+    chunks = _chunks("One. Two.\n\nThree.\n\n\nFour!")
+    assert [chunk.content for chunk in chunks] == ["One. Two.\n\nThree.\n\nFour!"]
+
+
+def test_segment_larger_than_any_chunk_goes_alone():
+    # A lone mark counts two tokens, more than a chunk of one can hold
+    chunks = _chunks("# a b", chunk_size=1)
+    assert [chunk.content for chunk in chunks] == ["#", "a", "b"]
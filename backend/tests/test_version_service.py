@@ -0,0 +1,75 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+try:
+    # Importing the service reads the app settings
+    from app.services.version_service import _pack, apply_delta, encode_delta, replay
+except Exception as exc:
+    pytest.skip(f"needs the app settings: {exc}", allow_module_level=True)
+
+
+def _row(version: int, payload: bytes, is_snapshot: bool = False) -> SimpleNamespace:
+    # The NoteVersions fields replay reads
+    return SimpleNamespace(note_id=1, version=version, is_snapshot=is_snapshot, payload=payload)
+
+
+def _edits(seed: int, count: int = 50) -> list[str]:
+    # Replaced, inserted and deleted lines, sometimes without a final newline
+    rng = random.Random(seed)
+    lines = [f"line {i}\n" for i in range(40)]
+    versions = ["".join(lines)]
+    for _ in range(count):
+        position = rng.randrange(len(lines) + 1)
+        action = rng.choice(["replace", "insert", "delete"])
+        if action == "insert" or not lines:
+            lines.insert(position, f"new {rng.random()}\n")
+        elif action == "delete":
+            del lines[min(position, len(lines) - 1)]
+        else:
+            lines[min(position, len(lines) - 1)] = f"edited {rng.random()}\n"
+        content = "".join(lines)
+        versions.append(content.rstrip("\n") if rng.random() < 0.2 else content)
+    return versions
+
+
+@pytest.mark.parametrize(
+    ("old", "new"),
+    [
+        ("", ""),
+        ("", "first line\nsecond"),
+        ("only line", ""),
+        ("a\nb\nc\n", "a\nc\n"),
+        ("a\nb", "a\nb\n"),
+        ("a\r\nb\r\n", "a\r\nx\r\nb\r\n"),
+        ("same\n" * 3, "same\n" * 3),
+    ],
+)
+def test_delta_round_trip(old: str, new: str):
+    assert apply_delta(old, encode_delta(old, new)) == new
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_delta_round_trip_over_edit_history(seed: int):
+    versions = _edits(seed)
+    for old, new in zip(versions, versions[1:]):
+        assert apply_delta(old, encode_delta(old, new)) == new
+
+
+def test_replay_rebuilds_every_version_from_snapshot():
+    versions = _edits(0, count=20)
+    rows = [_row(1, _pack(versions[0]), is_snapshot=True)]
+    rows += [_row(number, encode_delta(old, new)) for number, (old, new) in enumerate(zip(versions, versions[1:]), start=2)]
+    assert replay(rows) == versions  # type: ignore[arg-type]
+
+
+def test_replay_requires_a_snapshot_first():
+    with pytest.raises(ValueError, match="snapshot"):
+        replay([_row(2, encode_delta("a\n", "b\n"))])  # type: ignore[list-item]
+
+
+def test_small_edit_stores_less_than_a_copy():
+    old = "".join(f"line {i} lorem ipsum dolor\n" for i in range(400))
+    new = old.replace("line 200 ", "line two hundred ")
+    assert len(encode_delta(old, new)) < len(_pack(new)) / 10